@@ -0,0 +1,359 @@
+"""
+Scraper des lectures du jour (aelf.org) partagé par les assistants
+Les lectures d'une date ne changent jamais: elles sont gardées en mémoire par date
+et préchargées en arrière-plan pour les prochains jours de chaque fuseau servi.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from html import unescape
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import pytz
+import requests
+import requests.adapters
+from bs4 import BeautifulSoup
+
+from text_utils import collapse_whitespace
+
+try:
+    from lxml import etree  # dépendance optionnelle: analyse en une passe, bien plus rapide
+except ImportError:
+    etree = None
+
+# Éléments dont le texte n'est pas affiché (ignorés aussi par get_text de BeautifulSoup)
+HIDDEN_TAGS = frozenset(('script', 'style', 'template'))
+
+TITLE_XPATH = '//*[@id="middle-col"]/div[1]/p/strong'
+LECTURE_XPATH = '//div[contains(concat(" ", normalize-space(@class), " "), " lecture ")]'
+
+
+def get_aelf_url(date_str: str) -> str:
+    """URL de la page des lectures du jour sur aelf.org"""
+    return f'https://www.aelf.org/{date_str}/romain/prière'
+
+
+def extract_paragraph_improved(tag):
+    """Extraction améliorée des paragraphes avec gestion des sauts de ligne"""
+    raw_html = str(tag)
+    raw_html = raw_html.replace('<br>', '\n').replace('<br/>', '\n').replace('<br />', '\n')
+    clean_text = BeautifulSoup(raw_html, "html.parser").get_text()
+    return unescape(clean_text.strip())
+
+
+def parse_text_of_the_day_bs4(content: bytes, date_str: str) -> Dict:
+    """Extrait le titre et les lectures d'une page aelf.org (BeautifulSoup, html.parser)"""
+    soup = BeautifulSoup(content, 'html.parser')
+    result = {
+        'date': date_str,
+        'title': None,
+        'lectures': []
+    }
+
+    # Extraction améliorée du titre
+    title_tag = soup.select_one('#middle-col > div:nth-of-type(1) > p > strong')
+    if title_tag:
+        result['title'] = collapse_whitespace(title_tag.get_text())
+
+    # Extraction améliorée des lectures avec meilleure gestion des paragraphes
+    for block in soup.select('div.lecture'):
+        titre = block.select_one('h4')
+        reference = block.select_one('h5')
+        titre_text = titre.get_text(strip=True) if titre else None
+        reference_text = reference.get_text(strip=True) if reference else None
+
+        contenu = ""
+        for p in block.select('p'):
+            texte = extract_paragraph_improved(p)
+            if texte:
+                contenu += texte + "\n\n"
+
+        result['lectures'].append({
+            'type': titre_text,
+            'reference': reference_text,
+            'contenu': contenu.strip()
+        })
+
+    return result
+
+
+def _iter_text(element, br_newlines: bool = False) -> Iterator[str]:
+    """Textes d'un sous-arbre lxml dans l'ordre du document, <br> en saut de ligne si demandé"""
+    if element.text:
+        yield element.text
+    for child in element:
+        # Les commentaires et instructions ont un tag non textuel: seul leur texte de queue compte
+        if isinstance(child.tag, str) and child.tag not in HIDDEN_TAGS:
+            if br_newlines and child.tag == 'br':
+                yield '\n'
+            yield from _iter_text(child, br_newlines)
+        if child.tail:
+            yield child.tail
+
+
+def _stripped_text(element) -> str:
+    """Équivalent de get_text(strip=True)"""
+    return ''.join(text.strip() for text in _iter_text(element))
+
+
+def parse_text_of_the_day_lxml(content: bytes, date_str: str) -> Dict:
+    """Extrait le titre et les lectures d'une page aelf.org en une seule analyse lxml
+
+    Même résultat que parse_text_of_the_day_bs4, sans resérialiser ni réanalyser
+    chaque paragraphe: le texte est construit en parcourant l'arbre.
+    """
+    result = {
+        'date': date_str,
+        'title': None,
+        'lectures': []
+    }
+
+    if isinstance(content, bytes):
+        try:
+            content = content.decode('utf-8')
+        except UnicodeDecodeError:
+            pass  # lxml détecte l'encodage d'après la balise meta
+    root = etree.HTML(content)
+    if root is None:
+        return result
+
+    title_tags = root.xpath(TITLE_XPATH)
+    if title_tags:
+        result['title'] = collapse_whitespace(''.join(_iter_text(title_tags[0])))
+
+    for block in root.xpath(LECTURE_XPATH):
+        titre = block.find('.//h4')
+        reference = block.find('.//h5')
+
+        paragraphs = []
+        for p in block.iter('p'):
+            texte = unescape(''.join(_iter_text(p, br_newlines=True)).strip())
+            if texte:
+                paragraphs.append(texte)
+
+        result['lectures'].append({
+            'type': _stripped_text(titre) if titre is not None else None,
+            'reference': _stripped_text(reference) if reference is not None else None,
+            'contenu': '\n\n'.join(paragraphs)
+        })
+
+    return result
+
+
+def parse_text_of_the_day(content: bytes, date_str: str) -> Dict:
+    """Extrait le titre et les lectures d'une page aelf.org (lxml si installé)"""
+    if etree is not None:
+        return parse_text_of_the_day_lxml(content, date_str)
+    return parse_text_of_the_day_bs4(content, date_str)
+
+
+def create_http_session(pool_maxsize: int = 10) -> requests.Session:
+    """Session HTTP partagée: connexions persistantes (keep-alive) réutilisées entre requêtes"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class AelfClient:
+    """Client aelf.org: session persistante et revalidation conditionnelle (ETag / Last-Modified)"""
+
+    def __init__(self, timeout: float = 10, pool_maxsize: int = 10, max_pages: int = 32):
+        self.session = create_http_session(pool_maxsize)
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self._validated = OrderedDict()  # date -> (etag, last_modified, résultat analysé)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+
+    def fetch(self, date_str: str) -> Optional[Dict]:
+        """Lectures d'une date; une réponse 304 réutilise le résultat déjà analysé"""
+        headers = {}
+        previous = self._validated.get(date_str)
+        if previous:
+            etag, last_modified, _ = previous
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        self.requests += 1
+        resp = self.session.get(get_aelf_url(date_str), headers=headers, timeout=self.timeout)
+        if resp.status_code == 304 and previous:
+            self.not_modified += 1
+            return previous[2]
+        if resp.status_code != 200:
+            return None
+
+        result = parse_text_of_the_day(resp.content, date_str)
+        etag = resp.headers.get('ETag')
+        last_modified = resp.headers.get('Last-Modified')
+        if etag or last_modified:
+            with self._lock:
+                self._validated[date_str] = (etag, last_modified, result)
+                self._validated.move_to_end(date_str)
+                while len(self._validated) > self.max_pages:
+                    self._validated.popitem(last=False)
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'not_modified': self.not_modified,
+            'validated_pages': len(self._validated)
+        }
+
+
+aelf_client = AelfClient()
+
+
+def fetch_text_of_the_day(date_str: str) -> Optional[Dict]:
+    """Télécharge et analyse les lectures d'une date (None si la page n'existe pas)"""
+    return aelf_client.fetch(date_str)
+
+
+def local_date(tz_name: str, days_ahead: int = 0) -> str:
+    """Date (AAAA-MM-JJ) dans le fuseau donné, décalée de days_ahead jours"""
+    now = datetime.now(pytz.timezone(tz_name)) + timedelta(days=days_ahead)
+    return now.strftime('%Y-%m-%d')
+
+
+class TextOfTheDayCache:
+    """Lectures analysées, indexées par date, avec préchargement en arrière-plan"""
+
+    def __init__(self, fetch: Callable[[str], Optional[Dict]] = fetch_text_of_the_day,
+                 timezones: Iterable[str] = ('Africa/Dakar', 'Europe/Paris'),
+                 days_ahead: int = 7, refresh_interval: float = 3600, retry_interval: float = 300):
+        self.fetch = fetch
+        self.timezones = list(timezones)
+        self.days_ahead = days_ahead
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self._results = {}  # date -> résultat analysé
+        self._date_locks = {}
+        self._lock = threading.Lock()
+        self._prefetcher_pid = None
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.last_prefetch = None
+
+    def get(self, date_str: str) -> Optional[Dict]:
+        """Lecture en mémoire uniquement"""
+        result = self._results.get(date_str)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def put(self, date_str: str, result: Dict) -> None:
+        self._results[date_str] = result
+
+    def get_or_fetch(self, date_str: str) -> Optional[Dict]:
+        """Retourne les lectures en cache, sinon les télécharge (une seule fois par date)"""
+        result = self.get(date_str)
+        if result is not None:
+            return result
+        with self._lock:
+            date_lock = self._date_locks.setdefault(date_str, threading.Lock())
+        with date_lock:
+            # Une autre requête a pu télécharger la même date pendant l'attente
+            result = self._results.get(date_str)
+            if result is None:
+                self.fetches += 1
+                result = self.fetch(date_str)
+                if result is not None:
+                    self.put(date_str, result)
+        return result
+
+    def upcoming_dates(self) -> List[str]:
+        """Aujourd'hui et les prochains jours dans chacun des fuseaux servis"""
+        dates = set()
+        for tz_name in self.timezones:
+            for days in range(self.days_ahead + 1):
+                dates.add(local_date(tz_name, days))
+        return sorted(dates)
+
+    def refresh(self, date_str: str) -> None:
+        """Revalide une date déjà en cache (corrections publiées par aelf.org)"""
+        try:
+            result = self.fetch(date_str)
+        except Exception as e:
+            self.fetch_errors += 1
+            print(f"❌ Revalidation aelf.org {date_str}: {e}")
+            return
+        if result is not None:
+            self.put(date_str, result)
+
+    def prefetch(self) -> int:
+        """Télécharge les dates à venir absentes du cache; retourne le nombre d'échecs"""
+        failures = 0
+        for date_str in self.upcoming_dates():
+            if date_str in self._results:
+                # Requête conditionnelle: un 304 ne retélécharge ni ne réanalyse la page
+                self.refresh(date_str)
+                continue
+            try:
+                if self.get_or_fetch(date_str) is None:
+                    failures += 1
+            except Exception as e:
+                failures += 1
+                self.fetch_errors += 1
+                print(f"❌ Préchargement aelf.org {date_str}: {e}")
+        self.prune()
+        self.last_prefetch = datetime.now().isoformat()
+        return failures
+
+    def prune(self) -> None:
+        """Oublie les dates passées dans tous les fuseaux (avant la veille)"""
+        oldest = min(local_date(tz_name, -1) for tz_name in self.timezones)
+        for date_str in list(self._results):
+            if date_str < oldest:
+                self._results.pop(date_str, None)
+                self._date_locks.pop(date_str, None)
+
+    def start_prefetcher(self) -> None:
+        """Démarre le préchargement en arrière-plan (une fois par processus, après un fork)"""
+        if self._prefetcher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._prefetcher_pid == os.getpid():
+                return
+            self._prefetcher_pid = os.getpid()
+        thread = threading.Thread(target=self._prefetch_loop, name='aelf-prefetcher', daemon=True)
+        thread.start()
+
+    def _prefetch_loop(self) -> None:
+        while True:
+            failures = self.prefetch()
+            # Réessaie plus tôt si aelf.org n'a pas encore publié ou ne répond pas
+            time.sleep(self.retry_interval if failures else self.refresh_interval)
+
+    def stats(self) -> Dict:
+        return {
+            'dates': sorted(self._results),
+            'timezones': self.timezones,
+            'days_ahead': self.days_ahead,
+            'hits': self.hits,
+            'misses': self.misses,
+            'fetches': self.fetches,
+            'fetch_errors': self.fetch_errors,
+            'last_prefetch': self.last_prefetch,
+            'http': aelf_client.stats() if self.fetch is fetch_text_of_the_day else None
+        }
+
+
+def create_text_of_the_day_cache() -> TextOfTheDayCache:
+    """Cache configuré par les variables TEXT_OF_THE_DAY_*"""
+    return TextOfTheDayCache(
+        timezones=[tz.strip() for tz in os.getenv('TEXT_OF_THE_DAY_TIMEZONES', 'Africa/Dakar,Europe/Paris').split(',') if tz.strip()],
+        days_ahead=int(os.getenv('TEXT_OF_THE_DAY_DAYS_AHEAD', '7')),
+        refresh_interval=float(os.getenv('TEXT_OF_THE_DAY_REFRESH_INTERVAL', '3600'))
+    )
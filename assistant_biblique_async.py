@@ -0,0 +1,422 @@
+"""
+Version asynchrone (ASGI) de l'assistant biblique optimisé
+Mêmes routes et mêmes réponses JSON que assistant_biblique_optimized.py, mais les
+appels Claude/GPT-4o et aelf.org ne bloquent plus de thread pendant l'attente:
+un seul worker sert des milliers de requêtes simultanées.
+
+Lancement: python assistant_biblique_async.py
+       ou: hypercorn assistant_biblique_async:app --bind 0.0.0.0:8000
+"""
+
+import asyncio
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+import openai
+import pytz
+from anthropic import AsyncAnthropic
+from quart import Quart, g, request, jsonify
+from quart_cors import cors
+
+import assistant_biblique_optimized as base
+from aelf_scraper import get_aelf_url, parse_text_of_the_day
+from assistant_cache import AsyncSingleFlight
+from metrics import CONTENT_TYPE, REQUEST_SECONDS, registry, server_timing, start_timer, stop_timer, timed_stage
+
+app = cors(Quart(__name__))
+
+# Clients asynchrones (mêmes clés API que la version synchrone)
+async_anthropic_client = AsyncAnthropic(api_key=base.ANTHROPIC_API_KEY) if base.ANTHROPIC_API_KEY else None
+async_openai_client = openai.AsyncOpenAI(api_key=base.OPENAI_API_KEY) if base.OPENAI_API_KEY else None
+
+# Client HTTP partagé (aelf.org), créé au démarrage du serveur
+http_client: Optional[httpx.AsyncClient] = None
+
+# Déduplication des questions identiques en cours de génération
+inflight_requests = AsyncSingleFlight()
+
+@app.before_serving
+async def open_http_client():
+    global http_client
+    http_client = httpx.AsyncClient(
+        timeout=10,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    )
+    # Préchargement dans un thread: mêmes caches que la version synchrone
+    if base.WARMUP_ON_STARTUP:
+        base.start_warmup()
+
+@app.after_serving
+async def close_http_client():
+    await http_client.aclose()
+
+async def ask_claude_async(question: str, context: str) -> Dict:
+    """Claude sans bloquer la boucle d'événements"""
+    if not async_anthropic_client:
+        raise Exception("Claude API key not configured")
+
+    try:
+        with timed_stage('prompt'):
+            request_args = base.build_claude_request(question, context)
+        with timed_stage('llm_claude'):
+            response = await async_anthropic_client.messages.create(**request_args)
+        usage = base.claude_usage(response.usage, base.estimate_prompt_tokens(base.CLAUDE_INSTRUCTIONS, question, context))
+        # Recherche SQLite des versets cités: dans le pool de threads
+        return await asyncio.to_thread(base.format_llm_response, response.content[0].text,
+                                       "Claude 3.5 Sonnet (Optimisé)", 0.95, context, usage)
+    except Exception as e:
+        raise Exception(f"Erreur Claude: {str(e)}")
+
+async def ask_gpt4_async(question: str, context: str) -> Dict:
+    """GPT-4o sans bloquer la boucle d'événements"""
+    if not async_openai_client:
+        raise Exception("OpenAI API key not configured")
+
+    try:
+        with timed_stage('prompt'):
+            request_args = base.build_gpt4_request(question, context)
+        with timed_stage('llm_gpt4'):
+            response = await async_openai_client.chat.completions.create(**request_args)
+        usage = base.openai_usage(response.usage, base.estimate_prompt_tokens(base.GPT4_INSTRUCTIONS, question, context))
+        return await asyncio.to_thread(base.format_llm_response, response.choices[0].message.content,
+                                       "GPT-4o (Fallback)", 0.85, context, usage)
+    except Exception as e:
+        raise Exception(f"Erreur GPT-4: {str(e)}")
+
+# Claude en priorité, GPT-4o en couverture; le perdant d'une course est annulé
+llm_router = base.build_llm_router(
+    claude_acall=ask_claude_async if async_anthropic_client else None,
+    gpt4_acall=ask_gpt4_async if async_openai_client else None
+)
+
+async def generate_llm_response_async(question: str, context: str) -> Dict:
+    """Équivalent asynchrone de generate_llm_response"""
+    # SQLite reste synchrone: exécuté dans le pool de threads
+    bible_context = await asyncio.to_thread(base.get_contextual_bible_data, question)
+    bible_context = base.budget_context(question, bible_context)
+
+    try:
+        if not llm_router.providers:
+            raise Exception("Aucun LLM configuré")
+        response = await llm_router.ask_async(question, bible_context)
+
+        await asyncio.to_thread(base.store_answer, question, context, response)
+        return response
+
+    except Exception as e:
+        return base.build_fallback_response(bible_context, e)
+
+async def ask_llm_async(question: str, context: str = "general") -> Dict:
+    """Équivalent asynchrone de ask_llm_optimized (mêmes caches)"""
+    cached = await asyncio.to_thread(base.lookup_cached_answer, question, context)
+    if cached:
+        return cached
+
+    response, shared = await inflight_requests.do(
+        base.get_cache_key(question, context),
+        lambda: generate_llm_response_async(question, context)
+    )
+    response = dict(response)
+    if shared:
+        base.mark_cache_hit(response, 'inflight')
+    return response
+
+async def answer_batch_async(questions: List[str], context: str = "general") -> Dict:
+    """Équivalent asynchrone de answer_batch (au plus BATCH_CONCURRENCY générations à la fois)"""
+    keys, unique = base.group_batch(questions, context)
+    answers = {}
+    misses = []
+    for key, question in unique.items():
+        cached = await asyncio.to_thread(base.lookup_cached_answer, question, context)
+        if cached:
+            answers[key] = cached
+        else:
+            misses.append((key, question))
+
+    semaphore = asyncio.Semaphore(base.BATCH_CONCURRENCY)
+
+    async def ask(question: str) -> Dict:
+        async with semaphore:
+            return await ask_llm_async(question, context)
+
+    responses = await asyncio.gather(*(ask(question) for _, question in misses))
+    for (key, _), response in zip(misses, responses):
+        answers[key] = response
+
+    return base.build_batch_response(questions, keys, answers, len(misses))
+
+async def stream_claude_async(question: str, context: str, usage: Optional[Dict] = None) -> AsyncIterator[str]:
+    """Claude en streaming sans bloquer la boucle d'événements (usage complété en fin de flux)"""
+    if not async_anthropic_client:
+        raise Exception("Claude API key not configured")
+
+    try:
+        stream = await async_anthropic_client.messages.create(**base.build_claude_request(question, context), stream=True)
+        start_usage, output_tokens = None, 0
+        async for event in stream:
+            if event.type == 'content_block_delta' and getattr(event.delta, 'text', None):
+                yield event.delta.text
+            elif event.type == 'message_start':
+                start_usage = event.message.usage
+            elif event.type == 'message_delta' and getattr(event, 'usage', None):
+                output_tokens = event.usage.output_tokens
+        if usage is not None and start_usage is not None:
+            estimated = base.estimate_prompt_tokens(base.CLAUDE_INSTRUCTIONS, question, context)
+            usage.update(base.claude_usage(start_usage, estimated), output_tokens=output_tokens)
+    except Exception as e:
+        raise Exception(f"Erreur Claude: {str(e)}")
+
+async def stream_gpt4_async(question: str, context: str, usage: Optional[Dict] = None) -> AsyncIterator[str]:
+    """GPT-4o en streaming sans bloquer la boucle d'événements (usage complété en fin de flux)"""
+    if not async_openai_client:
+        raise Exception("OpenAI API key not configured")
+
+    try:
+        stream = await async_openai_client.chat.completions.create(
+            **base.build_gpt4_request(question, context),
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if getattr(chunk, 'usage', None) and usage is not None:
+                estimated = base.estimate_prompt_tokens(base.GPT4_INSTRUCTIONS, question, context)
+                usage.update(base.openai_usage(chunk.usage, estimated))
+    except Exception as e:
+        raise Exception(f"Erreur GPT-4: {str(e)}")
+
+async def stream_llm_async(question: str, context: str = "general") -> AsyncIterator[Tuple[str, Dict]]:
+    """Équivalent asynchrone de stream_llm_optimized"""
+    cached = await asyncio.to_thread(base.lookup_cached_answer, question, context)
+    if cached:
+        yield 'token', {'text': cached['answer']}
+        yield 'done', cached
+        return
+
+    bible_context = await asyncio.to_thread(base.get_contextual_bible_data, question)
+    bible_context = base.budget_context(question, bible_context)
+    parts = []
+    usage = {}
+    try:
+        if async_anthropic_client:
+            tokens = stream_claude_async(question, bible_context, usage)
+            model, confidence, stage = "Claude 3.5 Sonnet (Optimisé)", 0.95, 'llm_claude'
+        elif async_openai_client:
+            tokens = stream_gpt4_async(question, bible_context, usage)
+            model, confidence, stage = "GPT-4o (Fallback)", 0.85, 'llm_gpt4'
+        else:
+            raise Exception("Aucun LLM configuré")
+
+        # Durée du flux complet, envoi des tokens au client compris
+        with timed_stage(stage):
+            async for text in tokens:
+                parts.append(text)
+                yield 'token', {'text': text}
+
+        response = await asyncio.to_thread(base.format_llm_response, ''.join(parts), model, confidence,
+                                           bible_context, usage)
+        await asyncio.to_thread(base.store_answer, question, context, response)
+    except Exception as e:
+        response = base.build_fallback_response(bible_context, e)
+
+    yield 'done', response
+
+def wants_timings() -> bool:
+    """Détail des durées par étape demandé par l'en-tête DEBUG_TIMING_HEADER"""
+    return request.headers.get(base.DEBUG_TIMING_HEADER, '').lower() in ('1', 'true', 'yes')
+
+def timed_json_response(data: Dict):
+    """Équivalent asynchrone de base.timed_json_response (jsonify de Quart)"""
+    with timed_stage('serialization'):
+        response = jsonify(data)
+    if wants_timings():
+        response = jsonify(dict(data, timings=g.timer.breakdown()))
+    return response
+
+@app.route('/api/text-of-the-day')
+async def text_of_the_day():
+    """Textes du jour (aelf.org) récupérés sans bloquer"""
+    tz = request.args.get('tz', 'Europe/Paris')
+    try:
+        user_tz = pytz.timezone(tz)
+    except Exception:
+        return jsonify({'error': 'Invalid timezone'}), 400
+    now = datetime.now(user_tz)
+    date_str = now.strftime('%Y-%m-%d')
+
+    # Lectures déjà en mémoire (préchargées par le thread du cache par date)
+    if base.TEXT_OF_THE_DAY_PREFETCH:
+        base.text_of_the_day_cache.start_prefetcher()
+    result = base.text_of_the_day_cache.get(date_str)
+
+    try:
+        if result is None:
+            with timed_stage('scraper'):
+                resp = await http_client.get(get_aelf_url(date_str))
+                if resp.status_code != 200:
+                    return jsonify({'error': 'Page not found'}), 404
+
+                # Le parsing HTML est coûteux en CPU: hors de la boucle d'événements
+                result = await asyncio.to_thread(parse_text_of_the_day, resp.content, date_str)
+            base.text_of_the_day_cache.put(date_str, result)
+
+        return app.response_class(
+            response=json.dumps(result, ensure_ascii=False),
+            status=200,
+            mimetype='application/json'
+        )
+    except httpx.TimeoutException:
+        return jsonify({'error': 'Timeout lors de la récupération des données'}), 504
+    except httpx.HTTPError as e:
+        return jsonify({'error': f'Erreur de connexion: {str(e)}'}), 503
+    except Exception as e:
+        return jsonify({'error': f'Erreur lors du traitement: {str(e)}'}), 500
+
+@app.route('/api/assistant/query', methods=['POST'])
+async def assistant_query():
+    """Endpoint optimisé pour l'assistant IA biblique"""
+    try:
+        data = await request.get_json()
+        question = data.get('question', '').strip()
+        context = data.get('context', 'general')
+
+        if not question:
+            return jsonify({'error': 'Question requise'}), 400
+
+        if len(question) < 5:
+            return jsonify({'error': 'Question trop courte'}), 400
+
+        await asyncio.to_thread(base.log_question, question, context)
+        response = await ask_llm_async(question, context)
+
+        # Ajouter des métadonnées
+        response['timestamp'] = datetime.now().isoformat()
+        response['question'] = question
+        response['processing_time'] = round(g.timer.elapsed(), 4)
+
+        return timed_json_response(response)
+
+    except Exception as e:
+        return jsonify({
+            'error': 'Erreur interne du serveur',
+            'message': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+@app.route('/api/assistant/query/stream', methods=['POST'])
+async def assistant_query_stream():
+    """Variante streaming (SSE) de /api/assistant/query"""
+    data = await request.get_json()
+    question = data.get('question', '').strip()
+    context = data.get('context', 'general')
+
+    if not question:
+        return jsonify({'error': 'Question requise'}), 400
+
+    if len(question) < 5:
+        return jsonify({'error': 'Question trop courte'}), 400
+
+    await asyncio.to_thread(base.log_question, question, context)
+
+    timer = g.timer
+    debug = wants_timings()
+    g.streamed = True
+
+    async def events():
+        start_timer(timer)
+        async for event, payload in stream_llm_async(question, context):
+            if event == 'done':
+                payload['timestamp'] = datetime.now().isoformat()
+                payload['question'] = question
+                payload['processing_time'] = round(timer.elapsed(), 4)
+                if debug:
+                    payload['timings'] = timer.breakdown()
+            yield base.format_sse(event, payload)
+        # Réponse en flux: durée enregistrée à la fin de l'envoi (ignorée par after_request)
+        REQUEST_SECONDS.observe(timer.elapsed(), route='/api/assistant/query/stream', method='POST', status=200)
+
+    response = app.response_class(
+        events(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Une génération peut dépasser le délai de réponse par défaut de Quart
+    response.timeout = None
+    return response
+
+@app.route('/api/assistant/query/batch', methods=['POST'])
+async def assistant_query_batch():
+    """Plusieurs questions en une requête (outils d'administration, préchargement du cache)"""
+    try:
+        questions, context = base.parse_batch_request(await request.get_json())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        return timed_json_response(await answer_batch_async(questions, context))
+    except Exception as e:
+        return jsonify({
+            'error': 'Erreur interne du serveur',
+            'message': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+@app.route('/api/assistant/suggestions')
+async def get_suggestions():
+    """Suggestions optimisées pour votre contexte"""
+    return jsonify({
+        'suggestions': base.SUGGESTIONS,
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/assistant/stats')
+async def get_stats():
+    """Statistiques détaillées"""
+    stats = await asyncio.to_thread(base.build_stats)
+    stats['inflight'] = inflight_requests.stats()
+    stats['llm_router'] = llm_router.stats()
+    return jsonify(stats)
+
+@app.route('/health')
+async def health():
+    return jsonify({'status': 'ok', 'message': 'API optimisée (asynchrone) en cours d\'exécution'})
+
+@app.route('/metrics')
+async def metrics():
+    """Histogrammes de latence au format texte Prometheus (propres à ce worker)"""
+    return app.response_class(registry.render(), content_type=CONTENT_TYPE)
+
+@app.before_request
+async def start_request_timer():
+    g.timer = start_timer()
+
+@app.after_request
+async def record_request_duration(response):
+    timer = getattr(g, 'timer', None)
+    if timer is not None and not getattr(g, 'streamed', False):
+        route = request.url_rule.rule if request.url_rule else 'inconnue'
+        REQUEST_SECONDS.observe(timer.elapsed(), route=route, method=request.method, status=response.status_code)
+        if wants_timings():
+            response.headers['Server-Timing'] = server_timing(timer.breakdown())
+    return response
+
+@app.teardown_request
+async def clear_request_timer(error=None):
+    stop_timer()
+
+if __name__ == '__main__':
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    print("🚀 Assistant Biblique IA Optimisé (mode asynchrone)")
+    print(f"   - Claude 3.5 Sonnet: {'✅' if async_anthropic_client else '❌'}")
+    print(f"   - GPT-4o Fallback: {'✅' if async_openai_client else '❌'}")
+    print("\n🌐 Serveur: http://localhost:8000")
+
+    config = Config()
+    config.bind = ['0.0.0.0:8000']
+    asyncio.run(serve(app, config))
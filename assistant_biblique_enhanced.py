@@ -1,17 +1,17 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
 import pytz
-import re
 import json
 import os
 from typing import Dict, List, Optional
 import openai
 from anthropic import Anthropic
-import time
 import hashlib
+from aelf_scraper import create_text_of_the_day_cache
+from assistant_cache import create_response_cache
+from text_utils import clean_text as normalize_text, normalize_question
 
 app = Flask(__name__)
 CORS(app)
@@ -24,40 +24,30 @@ ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
 openai_client = openai.OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY) if ANTHROPIC_API_KEY else None
 
-# Cache pour les réponses
-response_cache = {}
+# Cache pour les réponses (backend choisi par RESPONSE_CACHE_BACKEND: memory, sqlite, redis)
+response_cache = create_response_cache()
+
+# Lectures du jour par date, préchargées en arrière-plan
+TEXT_OF_THE_DAY_PREFETCH = os.getenv('TEXT_OF_THE_DAY_PREFETCH', 'true').lower() == 'true'
+text_of_the_day_cache = create_text_of_the_day_cache()
 
 def clean_text(text):
-    """Nettoie le texte extrait"""
-    if not text:
-        return ''
-    text = text.replace('\u00a0', ' ').replace('\xa0', ' ')
-    text = text.replace('\n', ' ').replace('\r', ' ')
-    text = text.replace('\t', ' ')
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'\s+([.,;:!\?])', r'\1', text)
-    text = re.sub(r'([.,;:!\?])(\S)', r'\1 \2', text)
-    return text.strip()
+    """Nettoie le texte extrait (avec une espace après la ponctuation)"""
+    return normalize_text(text, space_after_punctuation=True)
 
 def get_cache_key(question: str, context: str) -> str:
-    """Génère une clé de cache pour la question"""
-    return hashlib.md5(f"{question}_{context}".encode()).hexdigest()
+    """Génère une clé de cache pour la question (forme canonique, voir normalize_question)"""
+    return hashlib.md5(f"{normalize_question(question)}_{context.strip().lower()}".encode()).hexdigest()
 
 def get_cached_response(question: str, context: str) -> Optional[Dict]:
     """Récupère une réponse du cache si disponible"""
     cache_key = get_cache_key(question, context)
-    cached = response_cache.get(cache_key)
-    if cached and (time.time() - cached['timestamp']) < 3600:  # Cache valide 1h
-        return cached['response']
-    return None
+    return response_cache.get(cache_key)
 
 def cache_response(question: str, context: str, response: Dict):
     """Met en cache une réponse"""
     cache_key = get_cache_key(question, context)
-    response_cache[cache_key] = {
-        'response': response,
-        'timestamp': time.time()
-    }
+    response_cache.set(cache_key, response)
 
 def get_bible_context(question: str) -> str:
     """Récupère le contexte biblique pour la question"""
@@ -180,17 +170,9 @@ def ask_llm(question: str, context: str = "general") -> Dict:
             "sources": []
         }
 
-def extract_paragraph_improved(tag):
-    """Extraction améliorée des paragraphes avec gestion des sauts de ligne"""
-    from html import unescape
-    raw_html = str(tag)
-    raw_html = raw_html.replace('<br>', '\n').replace('<br/>', '\n').replace('<br />', '\n')
-    clean_text = BeautifulSoup(raw_html, "html.parser").get_text()
-    return unescape(clean_text.strip())
-
 @app.route('/api/text-of-the-day')
 def text_of_the_day():
-    """Endpoint amélioré pour les textes du jour avec scraper optimisé"""
+    """Endpoint amélioré pour les textes du jour (servis depuis le cache par date)"""
     tz = request.args.get('tz', 'Europe/Paris')
     try:
         user_tz = pytz.timezone(tz)
@@ -198,44 +180,14 @@ def text_of_the_day():
         return jsonify({'error': 'Invalid timezone'}), 400
     now = datetime.now(user_tz)
     date_str = now.strftime('%Y-%m-%d')
-    url = f'https://www.aelf.org/{date_str}/romain/prière'
-    
-    try:
-        resp = requests.get(url, timeout=10)
-        if resp.status_code != 200:
-            return jsonify({'error': 'Page not found'}), 404
-        
-        soup = BeautifulSoup(resp.content, 'html.parser')
-        result = {
-            'date': date_str,
-            'title': None,
-            'lectures': []
-        }
-
-        # Extraction améliorée du titre
-        title_tag = soup.select_one('#middle-col > div:nth-of-type(1) > p > strong')
-        if title_tag:
-            title = title_tag.get_text().replace('\xa0', ' ').replace('\n', ' ').strip()
-            result['title'] = re.sub(r"\s+", " ", title)
 
-        # Extraction améliorée des lectures avec meilleure gestion des paragraphes
-        for block in soup.select('div.lecture'):
-            titre = block.select_one('h4')
-            reference = block.select_one('h5')
-            titre_text = titre.get_text(strip=True) if titre else None
-            reference_text = reference.get_text(strip=True) if reference else None
+    if TEXT_OF_THE_DAY_PREFETCH:
+        text_of_the_day_cache.start_prefetcher()
 
-            contenu = ""
-            for p in block.select('p'):
-                texte = extract_paragraph_improved(p)
-                if texte:
-                    contenu += texte + "\n\n"
-
-            result['lectures'].append({
-                'type': titre_text,
-                'reference': reference_text,
-                'contenu': contenu.strip()
-            })
+    try:
+        result = text_of_the_day_cache.get_or_fetch(date_str)
+        if result is None:
+            return jsonify({'error': 'Page not found'}), 404
 
         return app.response_class(
             response=json.dumps(result, ensure_ascii=False),
@@ -302,6 +254,8 @@ def get_stats():
     """Statistiques de l'assistant"""
     return jsonify({
         'cached_responses': len(response_cache),
+        'cache': response_cache.stats(),
+        'text_of_the_day': text_of_the_day_cache.stats(),
         'models_available': {
             'claude': anthropic_client is not None,
             'gpt4': openai_client is not None
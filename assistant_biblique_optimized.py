@@ -1,19 +1,29 @@
-from flask import Flask, request, jsonify
+from flask import Flask, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
 import pytz
-import re
 import json
 import os
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import openai
 from anthropic import Anthropic
-import time
 import hashlib
 import sqlite3
+import tempfile
+import threading
 from pathlib import Path
+from aelf_scraper import create_text_of_the_day_cache
+from assistant_cache import SingleFlight, create_response_cache
+from bible_search import BibleConnectionPool, ensure_fts_index
+from bible_references import find_references, load_book_names, lookup_references
+from bible_retrieval import create_bible_retriever, merge_adjacent, pack_context
+from llm_router import LLMRouter, Provider
+from metrics import CONTENT_TYPE, REQUEST_SECONDS, registry, server_timing, start_timer, stop_timer, timed_stage
+from question_log import create_question_log
+from text_utils import estimate_tokens, normalize_question
+from warmup import claim_warmup, collect_questions, format_report, warm_up
 
 app = Flask(__name__)
 CORS(app)
@@ -26,119 +36,169 @@ ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
 openai_client = openai.OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY) if ANTHROPIC_API_KEY else None
 
-# Cache pour les réponses
-response_cache = {}
+# Routage entre fournisseurs: délai max par fournisseur et couverture (hedging) après
+# LLM_HEDGE_DELAY secondes, ou au p95 des latences de Claude si la variable est absente
+# (sans couverture tant que ces latences ne sont pas assez nombreuses)
+LLM_HEDGE_DELAY = float(os.getenv('LLM_HEDGE_DELAY')) if os.getenv('LLM_HEDGE_DELAY') else None
+CLAUDE_TIMEOUT = float(os.getenv('CLAUDE_TIMEOUT', '30'))
+GPT4_TIMEOUT = float(os.getenv('GPT4_TIMEOUT', '30'))
+
+# Cache pour les réponses (backend choisi par RESPONSE_CACHE_BACKEND: memory, sqlite, redis)
+response_cache = create_response_cache()
+
+# Cache sémantique optionnel: réutilise la réponse d'une question reformulée
+SEMANTIC_CACHE_ENABLED = os.getenv('SEMANTIC_CACHE_ENABLED', 'false').lower() == 'true'
+semantic_cache = None
+if SEMANTIC_CACHE_ENABLED:
+    from semantic_cache import HashingEmbedder, SemanticCache, SentenceTransformerEmbedder
+    SEMANTIC_CACHE_MODEL = os.getenv('SEMANTIC_CACHE_MODEL')
+    semantic_cache = SemanticCache(
+        embedder=SentenceTransformerEmbedder(SEMANTIC_CACHE_MODEL) if SEMANTIC_CACHE_MODEL else HashingEmbedder(),
+        threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.9')),
+        max_entries=int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '1000')),
+        ttl=float(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+    )
+
+# Déduplication des questions identiques en cours de génération
+inflight_requests = SingleFlight()
+
+# Requêtes groupées (/api/assistant/query/batch): taille maximale d'un lot et nombre
+# de générations LLM menées en parallèle pour un même lot
+BATCH_MAX_QUESTIONS = int(os.getenv('BATCH_MAX_QUESTIONS', '50'))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))
+
+# En-tête de requête qui ajoute à la réponse le détail des durées par étape ("timings", ms)
+DEBUG_TIMING_HEADER = os.getenv('DEBUG_TIMING_HEADER', 'X-Debug-Timing')
+
+# Journal des questions posées (questions fréquentes à précharger)
+question_log = create_question_log()
+
+# Préchargement du cache au démarrage du serveur: suggestions + WARMUP_TOP_N questions
+# les plus fréquentes, WARMUP_CONCURRENCY à la fois (voir aussi warmup.py). Un seul
+# processus par machine le fait (fichier WARMUP_LOCK_PATH, valable WARMUP_LOCK_TTL
+# secondes): à utiliser avec un cache partagé (RESPONSE_CACHE_BACKEND=sqlite/redis)
+WARMUP_ON_STARTUP = os.getenv('WARMUP_ON_STARTUP', 'false').lower() == 'true'
+WARMUP_TOP_N = int(os.getenv('WARMUP_TOP_N', '50'))
+WARMUP_CONCURRENCY = int(os.getenv('WARMUP_CONCURRENCY', '4'))
+WARMUP_LOCK_PATH = os.getenv('WARMUP_LOCK_PATH', os.path.join(tempfile.gettempdir(), 'assistant_warmup.lock'))
+WARMUP_LOCK_TTL = float(os.getenv('WARMUP_LOCK_TTL', '3600'))
+warmup_state = {'pid': None, 'report': None}
+warmup_lock = threading.Lock()
+
+# Lectures du jour par date, préchargées en arrière-plan (aujourd'hui et les 7 jours
+# suivants dans chaque fuseau de TEXT_OF_THE_DAY_TIMEZONES)
+TEXT_OF_THE_DAY_PREFETCH = os.getenv('TEXT_OF_THE_DAY_PREFETCH', 'true').lower() == 'true'
+text_of_the_day_cache = create_text_of_the_day_cache()
 
 # Configuration de la base de données biblique
 BIBLE_DB_PATH = os.getenv('BIBLE_DB_PATH', 'bible_database.db')
-
-def clean_text(text):
-    """Nettoie le texte extrait"""
-    if not text:
-        return ''
-    text = text.replace('\u00a0', ' ').replace('\xa0', ' ')
-    text = text.replace('\n', ' ').replace('\r', ' ')
-    text = text.replace('\t', ' ')
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'\s+([.,;:!\?])', r'\1', text)
-    return text.strip()
+BIBLE_DB_IMMUTABLE = os.getenv('BIBLE_DB_IMMUTABLE', 'false').lower() == 'true'
+BIBLE_DB_MMAP_SIZE = int(os.getenv('BIBLE_DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+BIBLE_DB_CACHE_KB = int(os.getenv('BIBLE_DB_CACHE_KB', str(32 * 1024)))
+
+# Connexions en lecture seule réutilisées entre les requêtes (une par thread)
+bible_db_pool = BibleConnectionPool(
+    BIBLE_DB_PATH,
+    immutable=BIBLE_DB_IMMUTABLE,
+    mmap_size=BIBLE_DB_MMAP_SIZE,
+    cache_size_kb=BIBLE_DB_CACHE_KB
+)
+
+# Contexte envoyé aux LLM: versets candidats demandés à la recherche (BIBLE_RETRIEVAL),
+# puis passages ajoutés tant que le total tient dans BIBLE_CONTEXT_MAX_TOKENS
+BIBLE_CONTEXT_CANDIDATES = int(os.getenv('BIBLE_CONTEXT_CANDIDATES', '10'))
+BIBLE_CONTEXT_MAX_TOKENS = int(os.getenv('BIBLE_CONTEXT_MAX_TOKENS', '400'))
+
+# Nom de référence -> orthographe des livres dans bible_verses (rempli par init_bible_database)
+bible_book_names: Dict[str, str] = {}
 
 def get_cache_key(question: str, context: str) -> str:
-    """Génère une clé de cache pour la question"""
-    return hashlib.md5(f"{question}_{context}".encode()).hexdigest()
+    """Génère une clé de cache pour la question (forme canonique, voir normalize_question)"""
+    return hashlib.md5(f"{normalize_question(question)}_{context.strip().lower()}".encode()).hexdigest()
 
 def get_cached_response(question: str, context: str) -> Optional[Dict]:
     """Récupère une réponse du cache si disponible"""
     cache_key = get_cache_key(question, context)
-    cached = response_cache.get(cache_key)
-    if cached and (time.time() - cached['timestamp']) < 3600:  # Cache valide 1h
-        return cached['response']
-    return None
+    return response_cache.get(cache_key)
 
 def cache_response(question: str, context: str, response: Dict):
     """Met en cache une réponse"""
     cache_key = get_cache_key(question, context)
-    response_cache[cache_key] = {
-        'response': response,
-        'timestamp': time.time()
-    }
+    response_cache.set(cache_key, response)
 
-def search_bible_database(question: str) -> Dict:
-    """Recherche dans votre base de données biblique"""
+def init_bible_database():
+    """Crée ou resynchronise l'index FTS5 de votre base de données biblique"""
+    if not os.path.exists(BIBLE_DB_PATH):
+        return
     try:
-        # Connexion à votre base de données
-        conn = sqlite3.connect(BIBLE_DB_PATH)
-        cursor = conn.cursor()
-        
-        # Extraction des mots-clés de la question
-        keywords = re.findall(r'\b\w+\b', question.lower())
-        
-        # Recherche dans les passages bibliques
-        query = """
-        SELECT book, chapter, verse, text, reference 
-        FROM bible_verses 
-        WHERE text LIKE ? OR reference LIKE ?
-        ORDER BY 
-            CASE 
-                WHEN text LIKE ? THEN 1
-                WHEN reference LIKE ? THEN 2
-                ELSE 3
-            END
-        LIMIT 5
-        """
-        
-        search_term = f"%{' '.join(keywords)}%"
-        cursor.execute(query, (search_term, search_term, search_term, search_term))
-        results = cursor.fetchall()
-        
+        conn = sqlite3.connect(BIBLE_DB_PATH, timeout=30)
+        ensure_fts_index(conn)
+        bible_book_names.update(load_book_names(conn))
         conn.close()
-        
-        # Formatage des résultats
-        passages = []
-        for row in results:
-            passages.append({
-                'book': row[0],
-                'chapter': row[1],
-                'verse': row[2],
-                'text': row[3],
-                'reference': row[4]
-            })
-        
-        return {
-            'passages': passages,
-            'keywords_found': keywords,
-            'total_results': len(passages)
-        }
+    except sqlite3.Error as e:
+        print(f"Erreur index FTS: {e}")
+
+def search_bible_database(question: str) -> Dict:
+    """Recherche dans votre base de données biblique (stratégie BIBLE_RETRIEVAL: FTS5 ou vecteurs)"""
+    try:
+        # Connexion en lecture seule du pool
+        conn = bible_db_pool.get()
+        return bible_retriever.search(conn, question, limit=BIBLE_CONTEXT_CANDIDATES)
         
     except Exception as e:
+        # La connexion sera rouverte au prochain appel
+        bible_db_pool.discard()
         print(f"Erreur base de données: {e}")
         return {'passages': [], 'keywords_found': [], 'total_results': 0}
 
+def lookup_bible_references(references: List) -> List[Dict]:
+    """Versets des références citées, en une requête sur l'index (book, chapter, verse)"""
+    if not references:
+        return []
+    try:
+        return lookup_references(bible_db_pool.get(), references, bible_book_names)
+    except Exception as e:
+        bible_db_pool.discard()
+        print(f"Erreur base de données: {e}")
+        return []
+
+@timed_stage('db')
 def get_contextual_bible_data(question: str) -> str:
-    """Récupère le contexte biblique pertinent depuis votre BDD"""
+    """Récupère le contexte biblique pertinent depuis votre BDD, dans un budget de tokens"""
+    # Passages cités dans la question (« Que veut dire Jean 3:16 ? ») en premier
+    references = find_references(question)
+    cited = {}
+    for verse in lookup_bible_references(references):
+        cited.setdefault(verse['ref_index'], []).append(verse)
+    passages = [{
+        'reference': references[ref_index].label,
+        'text': ' '.join(verse['text'] for verse in verses)
+    } for ref_index, verses in cited.items()]
+    seen = {(verse['book'], verse['chapter'], verse['verse']) for verses in cited.values() for verse in verses}
+
+    # Puis les versets trouvés par la recherche, regroupés en passages consécutifs
     bible_data = search_bible_database(question)
+    found = [passage for passage in bible_data['passages']
+             if (passage['book'], passage['chapter'], passage['verse']) not in seen]
+    passages += merge_adjacent(found)
     
-    if not bible_data['passages']:
+    if not passages:
         # Fallback vers des passages généraux
         return "Bible générale - Ancien et Nouveau Testament"
     
-    # Construction du contexte
-    context_parts = []
-    for passage in bible_data['passages'][:3]:  # Limiter à 3 passages
-        context_parts.append(f"{passage['reference']}: {passage['text'][:200]}...")
-    
-    return " | ".join(context_parts)
+    return pack_context(passages, BIBLE_CONTEXT_MAX_TOKENS)
 
-def ask_claude_optimized(question: str, context: str) -> Dict:
-    """Version optimisée de Claude pour votre base de données"""
-    if not anthropic_client:
-        raise Exception("Claude API key not configured")
-    
-    # Prompt spécialisé pour la précision biblique
-    system_prompt = f"""Tu es un assistant spirituel catholique spécialisé dans l'enseignement biblique pour SamaQuete.
+init_bible_database()
 
-CONTEXTE BIBLIQUE DISPONIBLE:
-{context}
+# Recherche des passages: plein texte (fts, par défaut), index vectoriel (vector) ou fusion des deux (hybrid)
+bible_retriever = create_bible_retriever(bible_db_pool.get() if os.path.exists(BIBLE_DB_PATH) else None)
+
+# Instructions fixes, envoyées telles quelles à chaque requête: elles forment un préfixe
+# stable que les fournisseurs peuvent mettre en cache. Le contexte biblique, variable,
+# est placé dans le message utilisateur, après ce préfixe.
+CLAUDE_INSTRUCTIONS = """Tu es un assistant spirituel catholique spécialisé dans l'enseignement biblique pour SamaQuete.
+
+Le message de l'utilisateur contient le CONTEXTE BIBLIQUE DISPONIBLE puis sa QUESTION.
 
 INSTRUCTIONS PRÉCISES:
 1. Réponds UNIQUEMENT en te basant sur les passages bibliques fournis
@@ -156,26 +216,139 @@ FORMAT DE RÉPONSE:
 
 Réponds en français, de manière claire et respectueuse."""
 
+GPT4_INSTRUCTIONS = """Tu es un assistant spirituel catholique. Utilise le contexte biblique fourni avec la question.
+
+Réponds précisément en citant les références. Maximum 300 mots."""
+
+CLAUDE_MODEL = "claude-3-5-sonnet-20241022"
+GPT4_MODEL = "gpt-4o"
+
+# Budget de tokens d'entrée (estimation locale, voir text_utils.estimate_tokens): au-delà,
+# les derniers passages du contexte sont retirés
+PROMPT_MAX_INPUT_TOKENS = int(os.getenv('PROMPT_MAX_INPUT_TOKENS', '1500'))
+# Cache de prompt côté Anthropic (cache_control sur les instructions). Anthropic ne met en
+# cache qu'à partir d'une longueur minimale de préfixe; en dessous, l'option est sans effet.
+PROMPT_CACHE_ENABLED = os.getenv('PROMPT_CACHE_ENABLED', 'true').lower() == 'true'
+
+def build_user_prompt(question: str, context: str) -> str:
+    """Partie variable du prompt: contexte biblique puis question"""
+    return f"""CONTEXTE BIBLIQUE DISPONIBLE:
+{context}
+
+QUESTION:
+{question}"""
+
+def estimate_prompt_tokens(instructions: str, question: str, context: str) -> int:
+    return estimate_tokens(instructions) + estimate_tokens(build_user_prompt(question, context))
+
+@timed_stage('prompt')
+def budget_context(question: str, context: str) -> str:
+    """Contexte réduit pour que le prompt le plus long tienne dans PROMPT_MAX_INPUT_TOKENS
+
+    Les passages (séparés par « | ») sont retirés en partant de la fin, les moins
+    pertinents; le dernier restant est coupé à la fin d'un mot si nécessaire.
+    """
+    instructions = max(CLAUDE_INSTRUCTIONS, GPT4_INSTRUCTIONS, key=len)
+    available = PROMPT_MAX_INPUT_TOKENS - estimate_prompt_tokens(instructions, question, '')
+    if estimate_tokens(context) <= available:
+        return context
+    passages = context.split(' | ')
+    while len(passages) > 1 and estimate_tokens(' | '.join(passages)) > available:
+        passages.pop()
+    context = ' | '.join(passages)
+    if estimate_tokens(context) > available:
+        context = context[:max(0, available * 4 - 4)].rsplit(' ', 1)[0] + '...'
+    return context
+
+def build_claude_request(question: str, context: str) -> Dict:
+    """Arguments de messages.create: instructions en cache, contexte et question en message"""
+    system = {"type": "text", "text": CLAUDE_INSTRUCTIONS}
+    if PROMPT_CACHE_ENABLED:
+        system["cache_control"] = {"type": "ephemeral"}
+    return {
+        "model": CLAUDE_MODEL,
+        "max_tokens": 800,  # Limité pour la précision
+        "temperature": 0.3,  # Plus déterministe pour la précision
+        "system": [system],
+        "messages": [{"role": "user", "content": build_user_prompt(question, context)}]
+    }
+
+def build_gpt4_request(question: str, context: str) -> Dict:
+    """Arguments de chat.completions.create (OpenAI met en cache les préfixes communs d'office)"""
+    return {
+        "model": GPT4_MODEL,
+        "messages": [
+            {"role": "system", "content": GPT4_INSTRUCTIONS},
+            {"role": "user", "content": build_user_prompt(question, context)}
+        ],
+        "max_tokens": 600,
+        "temperature": 0.3
+    }
+
+def claude_usage(usage, estimated_input_tokens: int) -> Dict:
+    """Tokens d'une réponse Claude: entrée totale (dont lus en cache et écrits en cache), sortie"""
+    cached = getattr(usage, 'cache_read_input_tokens', None) or 0
+    cache_creation = getattr(usage, 'cache_creation_input_tokens', None) or 0
+    return {
+        'input_tokens': (getattr(usage, 'input_tokens', None) or 0) + cached + cache_creation,
+        'cached_input_tokens': cached,
+        'cache_creation_input_tokens': cache_creation,
+        'output_tokens': getattr(usage, 'output_tokens', None) or 0,
+        'estimated_input_tokens': estimated_input_tokens
+    }
+
+def openai_usage(usage, estimated_input_tokens: int) -> Dict:
+    """Tokens d'une réponse OpenAI (prompt_tokens inclut les tokens lus en cache)"""
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return {
+        'input_tokens': getattr(usage, 'prompt_tokens', None) or 0,
+        'cached_input_tokens': (getattr(details, 'cached_tokens', None) or 0) if details else 0,
+        'cache_creation_input_tokens': 0,
+        'output_tokens': getattr(usage, 'completion_tokens', None) or 0,
+        'estimated_input_tokens': estimated_input_tokens
+    }
+
+def format_llm_response(answer: str, model: str, confidence: float, context: str,
+                        usage: Optional[Dict] = None) -> Dict:
+    """Met en forme la réponse d'un LLM avec les références bibliques citées et les tokens consommés"""
+    # Références citées dans la réponse, vérifiées et complétées par le texte des versets
+    with timed_stage('references'):
+        parsed = find_references(answer)
+        verses = lookup_bible_references(parsed)
+        if bible_book_names:
+            found = {verse['ref_index'] for verse in verses}
+            references = [reference.label for i, reference in enumerate(parsed) if i in found]
+        else:
+            # Base vide ou absente: les références ne peuvent pas être vérifiées
+            references = [reference.label for reference in parsed]
+    
+    response = {
+        "answer": answer,
+        "model": model,
+        "confidence": confidence,
+        "sources": references if references else [context.split('|')[0].strip()],
+        "bible_references": references,
+        "verses": [{'reference': verse['reference'], 'text': verse['text']} for verse in verses],
+        "context_used": context
+    }
+    if usage:
+        response["usage"] = usage
+    return response
+
+def ask_claude_optimized(question: str, context: str) -> Dict:
+    """Version optimisée de Claude pour votre base de données"""
+    if not anthropic_client:
+        raise Exception("Claude API key not configured")
+    
     try:
-        response = anthropic_client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=800,  # Limité pour la précision
-            temperature=0.3,  # Plus déterministe pour la précision
-            system=system_prompt,
-            messages=[{"role": "user", "content": question}]
-        )
+        with timed_stage('prompt'):
+            claude_request = build_claude_request(question, context)
+        with timed_stage('llm_claude'):
+            response = anthropic_client.messages.create(**claude_request)
+        usage = claude_usage(response.usage, estimate_prompt_tokens(CLAUDE_INSTRUCTIONS, question, context))
         
-        # Extraction des références bibliques de la réponse
-        references = re.findall(r'[A-Za-z]+ \d+:\d+(?:-\d+)?', response.content[0].text)
-        
-        return {
-            "answer": response.content[0].text,
-            "model": "Claude 3.5 Sonnet (Optimisé)",
-            "confidence": 0.95,  # Haute confiance avec contexte BDD
-            "sources": references if references else [context.split('|')[0].strip()],
-            "bible_references": references,
-            "context_used": context
-        }
+        # Haute confiance avec contexte BDD
+        return format_llm_response(response.content[0].text, "Claude 3.5 Sonnet (Optimisé)", 0.95, context, usage)
     except Exception as e:
         raise Exception(f"Erreur Claude: {str(e)}")
 
@@ -184,82 +357,305 @@ def ask_gpt4_fallback(question: str, context: str) -> Dict:
     if not openai_client:
         raise Exception("OpenAI API key not configured")
     
-    system_prompt = f"""Tu es un assistant spirituel catholique. Utilise ce contexte biblique:
+    try:
+        with timed_stage('prompt'):
+            gpt4_request = build_gpt4_request(question, context)
+        with timed_stage('llm_gpt4'):
+            response = openai_client.chat.completions.create(**gpt4_request)
+        usage = openai_usage(response.usage, estimate_prompt_tokens(GPT4_INSTRUCTIONS, question, context))
+        
+        return format_llm_response(response.choices[0].message.content, "GPT-4o (Fallback)", 0.85, context, usage)
+    except Exception as e:
+        raise Exception(f"Erreur GPT-4: {str(e)}")
 
-{context}
+def stream_claude_optimized(question: str, context: str, usage: Optional[Dict] = None) -> Iterator[str]:
+    """Claude en streaming: produit le texte au fur et à mesure de sa génération
 
-Réponds précisément en citant les références. Maximum 300 mots."""
+    usage, si fourni, est complété avec les tokens consommés à la fin du flux.
+    """
+    if not anthropic_client:
+        raise Exception("Claude API key not configured")
+    
+    try:
+        stream = anthropic_client.messages.create(**build_claude_request(question, context), stream=True)
+        start_usage, output_tokens = None, 0
+        for event in stream:
+            if event.type == 'content_block_delta' and getattr(event.delta, 'text', None):
+                yield event.delta.text
+            elif event.type == 'message_start':
+                start_usage = event.message.usage
+            elif event.type == 'message_delta' and getattr(event, 'usage', None):
+                output_tokens = event.usage.output_tokens
+        if usage is not None and start_usage is not None:
+            usage.update(claude_usage(start_usage, estimate_prompt_tokens(CLAUDE_INSTRUCTIONS, question, context)),
+                         output_tokens=output_tokens)
+    except Exception as e:
+        raise Exception(f"Erreur Claude: {str(e)}")
 
+def stream_gpt4_fallback(question: str, context: str, usage: Optional[Dict] = None) -> Iterator[str]:
+    """GPT-4o en streaming si Claude n'est pas disponible (usage: comme stream_claude_optimized)"""
+    if not openai_client:
+        raise Exception("OpenAI API key not configured")
+    
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": question}
-            ],
-            max_tokens=600,
-            temperature=0.3
+        stream = openai_client.chat.completions.create(
+            **build_gpt4_request(question, context),
+            stream=True,
+            stream_options={"include_usage": True}
         )
-        
-        references = re.findall(r'[A-Za-z]+ \d+:\d+(?:-\d+)?', response.choices[0].message.content)
-        
-        return {
-            "answer": response.choices[0].message.content,
-            "model": "GPT-4o (Fallback)",
-            "confidence": 0.85,
-            "sources": references if references else [context.split('|')[0].strip()],
-            "bible_references": references,
-            "context_used": context
-        }
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if getattr(chunk, 'usage', None) and usage is not None:
+                usage.update(openai_usage(chunk.usage, estimate_prompt_tokens(GPT4_INSTRUCTIONS, question, context)))
     except Exception as e:
         raise Exception(f"Erreur GPT-4: {str(e)}")
 
-def ask_llm_optimized(question: str, context: str = "general") -> Dict:
-    """Version optimisée avec priorité Claude"""
+def mark_cache_hit(response: Dict, source: str, **details) -> Dict:
+    """Réponse servie sans appel au LLM: la consommation de tokens de la génération
+    d'origine (usage, routing) n'est pas attribuée à cette requête"""
+    response['cache'] = {'hit': True, 'source': source, **details}
+    if response.get('usage'):
+        response['usage'] = {key: 0 for key in response['usage']}
+    response.pop('routing', None)
+    return response
+
+@timed_stage('cache')
+def lookup_cached_answer(question: str, context: str) -> Optional[Dict]:
+    """Cherche une réponse déjà générée: cache exact puis cache sémantique"""
     # Vérifier le cache d'abord
     cached = get_cached_response(question, context)
+    if cached:
+        return mark_cache_hit(cached, 'exact')
+    
+    # Puis une question similaire déjà posée (cache sémantique)
+    if semantic_cache is not None:
+        match = semantic_cache.lookup(question, context.strip().lower())
+        if match:
+            response, similarity = match
+            return mark_cache_hit(response, 'semantic', similarity=round(similarity, 4))
+    return None
+
+def store_answer(question: str, context: str, response: Dict):
+    """Met en cache une réponse générée (cache exact et sémantique)"""
+    cache_response(question, context, response)
+    if semantic_cache is not None:
+        semantic_cache.add(question, context.strip().lower(), response)
+    response['cache'] = {'hit': False, 'source': None}
+
+def ask_llm_optimized(question: str, context: str = "general") -> Dict:
+    """Version optimisée avec priorité Claude"""
+    cached = lookup_cached_answer(question, context)
     if cached:
         return cached
     
-    # Obtenir le contexte biblique depuis votre BDD
-    bible_context = get_contextual_bible_data(question)
+    # Une seule génération par question identique en cours: les requêtes simultanées l'attendent
+    response, shared = inflight_requests.do(
+        get_cache_key(question, context),
+        lambda: generate_llm_response(question, context)
+    )
+    # Copie: chaque appelant ajoute ses propres métadonnées
+    response = dict(response)
+    if shared:
+        mark_cache_hit(response, 'inflight')
+    return response
+
+def validate_question(question: str) -> Optional[str]:
+    """Message d'erreur si la question n'est pas acceptable, sinon None"""
+    if not question:
+        return 'Question requise'
+    if len(question) < 5:
+        return 'Question trop courte'
+    return None
+
+def parse_batch_request(data: Optional[Dict]) -> Tuple[List[str], str]:
+    """Questions et contexte d'une requête groupée; ValueError si le lot est invalide"""
+    questions = (data or {}).get('questions')
+    if not isinstance(questions, list) or not questions:
+        raise ValueError('Liste de questions requise')
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise ValueError(f'Maximum {BATCH_MAX_QUESTIONS} questions par lot')
+    return [str(question).strip() for question in questions], data.get('context', 'general')
+
+def group_batch(questions: List[str], context: str) -> Tuple[List[Optional[str]], Dict[str, str]]:
+    """Clé de cache de chaque question (None si invalide) et questions uniques par clé"""
+    keys = [None if validate_question(question) else get_cache_key(question, context) for question in questions]
+    unique = {}
+    for question, key in zip(questions, keys):
+        if key is not None:
+            unique.setdefault(key, question)
+    return keys, unique
+
+def build_batch_response(questions: List[str], keys: List[Optional[str]], answers: Dict[str, Dict],
+                         generated: int) -> Dict:
+    """Résultats dans l'ordre des questions reçues (les doublons partagent la même réponse)"""
+    timestamp = datetime.now().isoformat()
+    results = []
+    for question, key in zip(questions, keys):
+        if key is None:
+            results.append({'question': question, 'error': validate_question(question)})
+            continue
+        response = dict(answers[key])
+        response['question'] = question
+        response['timestamp'] = timestamp
+        results.append(response)
+    return {
+        'results': results,
+        'count': len(results),
+        'unique': len(answers),
+        'cache_hits': len(answers) - generated,
+        'timestamp': timestamp
+    }
+
+def answer_batch(questions: List[str], context: str = "general") -> Dict:
+    """Répond à un lot de questions: cache d'abord, puis ask_llm_optimized pour les
+    questions manquantes, au plus BATCH_CONCURRENCY à la fois"""
+    keys, unique = group_batch(questions, context)
+    answers = {}
+    misses = []
+    for key, question in unique.items():
+        cached = lookup_cached_answer(question, context)
+        if cached:
+            answers[key] = cached
+        else:
+            misses.append((key, question))
+
+    if misses:
+        with ThreadPoolExecutor(max_workers=min(BATCH_CONCURRENCY, len(misses))) as pool:
+            responses = pool.map(lambda miss: ask_llm_optimized(miss[1], context), misses)
+            for (key, _), response in zip(misses, responses):
+                answers[key] = response
+
+    return build_batch_response(questions, keys, answers, len(misses))
+
+def log_question(question: str, context: str):
+    """Compte la question dans le journal (si activé)"""
+    if question_log is not None:
+        question_log.record(question, context)
+
+def run_warmup() -> Dict:
+    """Précharge le cache avec les suggestions et les questions fréquentes"""
+    questions = collect_questions(SUGGESTIONS, question_log, WARMUP_TOP_N)
+    report = warm_up(ask_llm_optimized, questions, WARMUP_CONCURRENCY, CLAUDE_INSTRUCTIONS)
+    report['finished_at'] = datetime.now().isoformat()
+    warmup_state['report'] = report
+    print(format_report(report))
+    return report
+
+def start_warmup():
+    """Lance le préchargement en arrière-plan, depuis le point d'entrée du serveur: une
+    seule fois par machine, quel que soit le nombre de workers qui l'appellent"""
+    with warmup_lock:
+        if warmup_state['pid'] == os.getpid():
+            return
+        warmup_state['pid'] = os.getpid()
+    if not claim_warmup(WARMUP_LOCK_PATH, WARMUP_LOCK_TTL):
+        return
+    if response_cache.stats().get('backend') == 'memory':
+        print("⚠️  Préchargement dans un cache en mémoire: seul ce worker en profite "
+              "(RESPONSE_CACHE_BACKEND=sqlite/redis pour un cache partagé)")
+    threading.Thread(target=run_warmup, name='cache-warmup', daemon=True).start()
+
+def build_llm_router(claude_call=None, gpt4_call=None, claude_acall=None, gpt4_acall=None) -> LLMRouter:
+    """Claude en priorité, GPT-4o en couverture, parmi les fournisseurs configurés"""
+    providers = []
+    if claude_call or claude_acall:
+        providers.append(Provider('claude', call=claude_call, acall=claude_acall, timeout=CLAUDE_TIMEOUT))
+    if gpt4_call or gpt4_acall:
+        providers.append(Provider('gpt4', call=gpt4_call, acall=gpt4_acall, timeout=GPT4_TIMEOUT))
+    return LLMRouter(providers, hedge_delay=LLM_HEDGE_DELAY)
+
+llm_router = build_llm_router(
+    claude_call=ask_claude_optimized if anthropic_client else None,
+    gpt4_call=ask_gpt4_fallback if openai_client else None
+)
+
+def generate_llm_response(question: str, context: str) -> Dict:
+    """Génère la réponse du LLM à partir de votre BDD et la met en cache"""
+    # Obtenir le contexte biblique depuis votre BDD (dans le budget de tokens du prompt)
+    bible_context = budget_context(question, get_contextual_bible_data(question))
+    
+    # Stratégie: Claude en priorité, GPT-4 en couverture si Claude échoue ou tarde
+    try:
+        if not llm_router.providers:
+            raise Exception("Aucun LLM configuré")
+        response = llm_router.ask(question, bible_context)
+        
+        # Mettre en cache la réponse
+        store_answer(question, context, response)
+        return response
+        
+    except Exception as e:
+        # Fallback vers une réponse basique avec contexte BDD
+        return build_fallback_response(bible_context, e)
+
+def stream_llm_optimized(question: str, context: str = "general") -> Iterator[Tuple[str, Dict]]:
+    """Version streaming de ask_llm_optimized: événements ('token', {'text': ...}) puis ('done', réponse)"""
+    cached = lookup_cached_answer(question, context)
+    if cached:
+        yield 'token', {'text': cached['answer']}
+        yield 'done', cached
+        return
     
-    # Stratégie: Claude en priorité, GPT-4 en fallback
+    bible_context = budget_context(question, get_contextual_bible_data(question))
+    parts = []
+    usage = {}
     try:
         if anthropic_client:
-            response = ask_claude_optimized(question, bible_context)
+            tokens = stream_claude_optimized(question, bible_context, usage)
+            model, confidence, stage = "Claude 3.5 Sonnet (Optimisé)", 0.95, 'llm_claude'
         elif openai_client:
-            response = ask_gpt4_fallback(question, bible_context)
+            tokens = stream_gpt4_fallback(question, bible_context, usage)
+            model, confidence, stage = "GPT-4o (Fallback)", 0.85, 'llm_gpt4'
         else:
             raise Exception("Aucun LLM configuré")
         
-        # Mettre en cache la réponse
-        cache_response(question, context, response)
-        return response
+        # Durée du flux complet, envoi des tokens au client compris
+        with timed_stage(stage):
+            for text in tokens:
+                parts.append(text)
+                yield 'token', {'text': text}
         
+        # La réponse complète alimente le cache comme en mode non streaming
+        response = format_llm_response(''.join(parts), model, confidence, bible_context, usage)
+        store_answer(question, context, response)
     except Exception as e:
-        # Fallback vers une réponse basique avec contexte BDD
-        return {
-            "answer": f"Je ne peux pas répondre à cette question pour le moment. Contexte disponible: {bible_context[:100]}...",
-            "model": "Fallback",
-            "confidence": 0.1,
-            "sources": [bible_context.split('|')[0].strip()] if bible_context else [],
-            "bible_references": [],
-            "context_used": bible_context,
-            "error": str(e)
-        }
-
-def extract_paragraph_improved(tag):
-    """Extraction améliorée des paragraphes avec gestion des sauts de ligne"""
-    from html import unescape
-    raw_html = str(tag)
-    raw_html = raw_html.replace('<br>', '\n').replace('<br/>', '\n').replace('<br />', '\n')
-    clean_text = BeautifulSoup(raw_html, "html.parser").get_text()
-    return unescape(clean_text.strip())
+        response = build_fallback_response(bible_context, e)
+    
+    yield 'done', response
+
+def wants_timings() -> bool:
+    """Détail des durées par étape demandé par l'en-tête DEBUG_TIMING_HEADER"""
+    return request.headers.get(DEBUG_TIMING_HEADER, '').lower() in ('1', 'true', 'yes')
+
+def timed_json_response(data: Dict):
+    """Réponse JSON dont la sérialisation est mesurée; avec l'en-tête de débogage, le
+    détail des étapes est ajouté (et la réponse resérialisée pour l'inclure)"""
+    with timed_stage('serialization'):
+        response = jsonify(data)
+    if wants_timings():
+        response = jsonify(dict(data, timings=g.timer.breakdown()))
+    return response
+
+def format_sse(event: str, data: Dict) -> str:
+    """Sérialise un événement Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def build_fallback_response(bible_context: str, error: Exception) -> Dict:
+    """Réponse basique quand aucun LLM n'a pu répondre"""
+    return {
+        "answer": f"Je ne peux pas répondre à cette question pour le moment. Contexte disponible: {bible_context[:100]}...",
+        "model": "Fallback",
+        "confidence": 0.1,
+        "sources": [bible_context.split('|')[0].strip()] if bible_context else [],
+        "bible_references": [],
+        "context_used": bible_context,
+        "error": str(error)
+    }
 
 @app.route('/api/text-of-the-day')
 def text_of_the_day():
-    """Endpoint amélioré pour les textes du jour avec scraper optimisé"""
+    """Endpoint amélioré pour les textes du jour (servis depuis le cache par date)"""
     tz = request.args.get('tz', 'Europe/Paris')
     try:
         user_tz = pytz.timezone(tz)
@@ -267,44 +663,15 @@ def text_of_the_day():
         return jsonify({'error': 'Invalid timezone'}), 400
     now = datetime.now(user_tz)
     date_str = now.strftime('%Y-%m-%d')
-    url = f'https://www.aelf.org/{date_str}/romain/prière'
-    
+
+    if TEXT_OF_THE_DAY_PREFETCH:
+        text_of_the_day_cache.start_prefetcher()
+
     try:
-        resp = requests.get(url, timeout=10)
-        if resp.status_code != 200:
+        with timed_stage('scraper'):
+            result = text_of_the_day_cache.get_or_fetch(date_str)
+        if result is None:
             return jsonify({'error': 'Page not found'}), 404
-        
-        soup = BeautifulSoup(resp.content, 'html.parser')
-        result = {
-            'date': date_str,
-            'title': None,
-            'lectures': []
-        }
-
-        # Extraction améliorée du titre
-        title_tag = soup.select_one('#middle-col > div:nth-of-type(1) > p > strong')
-        if title_tag:
-            title = title_tag.get_text().replace('\xa0', ' ').replace('\n', ' ').strip()
-            result['title'] = re.sub(r"\s+", " ", title)
-
-        # Extraction améliorée des lectures avec meilleure gestion des paragraphes
-        for block in soup.select('div.lecture'):
-            titre = block.select_one('h4')
-            reference = block.select_one('h5')
-            titre_text = titre.get_text(strip=True) if titre else None
-            reference_text = reference.get_text(strip=True) if reference else None
-
-            contenu = ""
-            for p in block.select('p'):
-                texte = extract_paragraph_improved(p)
-                if texte:
-                    contenu += texte + "\n\n"
-
-            result['lectures'].append({
-                'type': titre_text,
-                'reference': reference_text,
-                'contenu': contenu.strip()
-            })
 
         return app.response_class(
             response=json.dumps(result, ensure_ascii=False),
@@ -332,15 +699,17 @@ def assistant_query():
         if len(question) < 5:
             return jsonify({'error': 'Question trop courte'}), 400
         
+        log_question(question, context)
+
         # Obtenir la réponse optimisée
         response = ask_llm_optimized(question, context)
         
         # Ajouter des métadonnées
         response['timestamp'] = datetime.now().isoformat()
         response['question'] = question
-        response['processing_time'] = time.time()
+        response['processing_time'] = round(g.timer.elapsed(), 4)
         
-        return jsonify(response)
+        return timed_json_response(response)
         
     except Exception as e:
         return jsonify({
@@ -349,47 +718,139 @@ def assistant_query():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.route('/api/assistant/query/stream', methods=['POST'])
+def assistant_query_stream():
+    """Variante streaming (SSE) de /api/assistant/query: tokens au fil de l'eau puis réponse complète"""
+    data = request.get_json()
+    question = data.get('question', '').strip()
+    context = data.get('context', 'general')
+    
+    if not question:
+        return jsonify({'error': 'Question requise'}), 400
+    
+    if len(question) < 5:
+        return jsonify({'error': 'Question trop courte'}), 400
+    
+    log_question(question, context)
+
+    timer = g.timer
+    debug = wants_timings()
+
+    def events():
+        start_timer(timer)
+        for event, payload in stream_llm_optimized(question, context):
+            if event == 'done':
+                payload['timestamp'] = datetime.now().isoformat()
+                payload['question'] = question
+                payload['processing_time'] = round(timer.elapsed(), 4)
+                if debug:
+                    payload['timings'] = timer.breakdown()
+            yield format_sse(event, payload)
+        # Réponse en flux: durée enregistrée à la fin de l'envoi (ignorée par after_request)
+        REQUEST_SECONDS.observe(timer.elapsed(), route='/api/assistant/query/stream', method='POST', status=200)
+    
+    return app.response_class(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        # Pas de mise en tampon par les proxys: le premier token part immédiatement
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/assistant/query/batch', methods=['POST'])
+def assistant_query_batch():
+    """Plusieurs questions en une requête (outils d'administration, préchargement du cache)"""
+    try:
+        questions, context = parse_batch_request(request.get_json())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        return timed_json_response(answer_batch(questions, context))
+    except Exception as e:
+        return jsonify({
+            'error': 'Erreur interne du serveur',
+            'message': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+# Suggestions optimisées pour votre contexte
+SUGGESTIONS = [
+    "Que dit Jésus sur l'amour du prochain ?",
+    "Comment prier selon la Bible ?",
+    "Qu'est-ce que la charité chrétienne ?",
+    "Que dit la Bible sur le pardon ?",
+    "Comment vivre sa foi au quotidien ?",
+    "Que dit Jésus sur la prière ?",
+    "Qu'est-ce que l'espérance chrétienne ?",
+    "Comment préparer un baptême ?",
+    "Que dit la Bible sur la famille ?",
+    "Qu'est-ce que la Pentecôte ?"
+]
+
 @app.route('/api/assistant/suggestions')
 def get_suggestions():
     """Suggestions optimisées pour votre contexte"""
-    suggestions = [
-        "Que dit Jésus sur l'amour du prochain ?",
-        "Comment prier selon la Bible ?",
-        "Qu'est-ce que la charité chrétienne ?",
-        "Que dit la Bible sur le pardon ?",
-        "Comment vivre sa foi au quotidien ?",
-        "Que dit Jésus sur la prière ?",
-        "Qu'est-ce que l'espérance chrétienne ?",
-        "Comment préparer un baptême ?",
-        "Que dit la Bible sur la famille ?",
-        "Qu'est-ce que la Pentecôte ?"
-    ]
-    
     return jsonify({
-        'suggestions': suggestions,
+        'suggestions': SUGGESTIONS,
         'timestamp': datetime.now().isoformat()
     })
 
-@app.route('/api/assistant/stats')
-def get_stats():
-    """Statistiques détaillées"""
-    return jsonify({
+def build_stats() -> Dict:
+    """Statistiques détaillées (caches, modèles, base de données)"""
+    return {
         'cached_responses': len(response_cache),
+        'cache': response_cache.stats(),
+        'semantic_cache': semantic_cache.stats() if semantic_cache is not None else None,
+        'inflight': inflight_requests.stats(),
+        'question_log': question_log.stats() if question_log is not None else None,
+        'warmup': warmup_state['report'],
+        'text_of_the_day': text_of_the_day_cache.stats(),
+        'llm_router': llm_router.stats(),
         'models_available': {
             'claude': anthropic_client is not None,
             'gpt4': openai_client is not None
         },
         'bible_database': {
             'connected': os.path.exists(BIBLE_DB_PATH),
-            'path': BIBLE_DB_PATH
+            'path': BIBLE_DB_PATH,
+            'pool': bible_db_pool.stats(),
+            'retrieval': bible_retriever.stats()
         },
         'timestamp': datetime.now().isoformat()
-    })
+    }
+
+@app.route('/api/assistant/stats')
+def get_stats():
+    """Statistiques détaillées"""
+    return jsonify(build_stats())
 
 @app.route('/health')
 def health():
     return jsonify({'status': 'ok', 'message': 'API optimisée en cours d\'exécution'})
 
+@app.route('/metrics')
+def metrics():
+    """Histogrammes de latence au format texte Prometheus (propres à ce worker)"""
+    return app.response_class(registry.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+@app.before_request
+def start_request_timer():
+    g.timer = start_timer()
+
+@app.after_request
+def record_request_duration(response):
+    timer = getattr(g, 'timer', None)
+    if timer is not None and not response.is_streamed:
+        route = request.url_rule.rule if request.url_rule else 'inconnue'
+        REQUEST_SECONDS.observe(timer.elapsed(), route=route, method=request.method, status=response.status_code)
+        if wants_timings():
+            response.headers['Server-Timing'] = server_timing(timer.breakdown())
+    return response
+
+@app.teardown_request
+def clear_request_timer(error=None):
+    stop_timer()
+
 if __name__ == '__main__':
     print("🚀 Assistant Biblique IA Optimisé")
     print("📚 Configuration:")
@@ -401,5 +862,8 @@ if __name__ == '__main__':
     print("   - Citations bibliques exactes")
     print("   - Contexte sénégalais catholique")
     print("\n🌐 Serveur: http://localhost:8000")
-    
+
+    # Le rechargeur de debug relance ce script: préchargement dans le processus qui sert
+    if WARMUP_ON_STARTUP and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warmup()
     app.run(host='0.0.0.0', port=8000, debug=True)
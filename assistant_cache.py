@@ -0,0 +1,393 @@
+"""
+Cache des réponses de l'assistant biblique
+Backends interchangeables derrière la même interface get/set/delete/clear/stats:
+- ResponseCache: LRU en mémoire, borné en entrées et en octets, avec TTL
+- SQLiteResponseCache: fichier partagé par tous les workers d'une machine
+- RedisResponseCache: serveur Redis (ou tout client compatible)
+SingleFlight regroupe les générations identiques lancées en même temps.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+def estimate_size(value: Dict) -> int:
+    """Estime l'empreinte mémoire d'une réponse (taille de sa sérialisation JSON)"""
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+
+class ResponseCache:
+    """Cache LRU + TTL thread-safe avec budget mémoire"""
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 50 * 1024 * 1024,
+                 ttl: float = 3600, sweep_interval: float = 60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._entries = OrderedDict()  # clé -> (réponse, expiration, taille)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._sweeper_pid = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Retourne une copie de la réponse en cache, ou None si absente ou expirée"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            response, expires_at, _ = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Copie: les appelants ajoutent des métadonnées à la réponse
+        return dict(response)
+
+    def set(self, key: str, response: Dict) -> None:
+        """Ajoute une réponse et évince les moins récemment utilisées au-delà des limites"""
+        size = estimate_size(response)
+        if size > self.max_bytes:
+            return
+        self._ensure_sweeper()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (dict(response), time.time() + self.ttl, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def sweep(self) -> int:
+        """Supprime les entrées expirées et retourne leur nombre"""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, expires_at, _) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+        return len(expired)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'memory',
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _ensure_sweeper(self) -> None:
+        # Démarré à la première écriture, et redémarré dans chaque worker après un fork
+        if self.sweep_interval <= 0 or self._sweeper_pid == os.getpid():
+            return
+        with self._lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            self._sweeper_pid = os.getpid()
+        thread = threading.Thread(target=self._sweep_loop, name='response-cache-sweeper', daemon=True)
+        thread.start()
+
+    def _sweep_loop(self) -> None:
+        while True:
+            time.sleep(self.sweep_interval)
+            self.sweep()
+
+
+class SQLiteResponseCache:
+    """Cache persistant dans un fichier SQLite, partagé entre workers et redémarrages"""
+
+    def __init__(self, db_path: str, max_entries: int = 10000, ttl: float = 3600):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()  # compteurs partagés par les threads du worker
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS response_cache_created ON response_cache(created_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # Autocommit + WAL: les écritures d'un worker ne bloquent pas les lectures des autres
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT count(*) FROM response_cache").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT response FROM response_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, response: Dict) -> None:
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO response_cache (key, response, created_at, expires_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(response, ensure_ascii=False, default=str), now, now + self.ttl)
+        )
+        with self._lock:
+            self._writes += 1
+            sweep = self._writes % 100 == 0
+        if sweep:
+            self.sweep()
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM response_cache")
+
+    def sweep(self) -> int:
+        """Supprime les entrées expirées puis les plus anciennes au-delà de max_entries"""
+        conn = self._connection()
+        expired = conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+        evicted = conn.execute("""
+            DELETE FROM response_cache WHERE key IN (
+                SELECT key FROM response_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,)).rowcount
+        with self._lock:
+            self.evictions += evicted
+        return expired
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits, misses, evictions = self.hits, self.misses, self.evictions
+        lookups = hits + misses
+        return {
+            'backend': 'sqlite',
+            'path': self.db_path,
+            'entries': len(self),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'evictions': evictions
+        }
+
+
+class RedisResponseCache:
+    """Cache partagé via Redis; accepte tout client exposant get/set(ex=)/delete/scan_iter"""
+
+    def __init__(self, client, ttl: float = 3600, prefix: str = 'samaquete:response:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()  # compteurs partagés par les threads du worker
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=f"{self.prefix}*"))
+
+    def get(self, key: str) -> Optional[Dict]:
+        raw = self.client.get(self.prefix + key)
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: str, response: Dict) -> None:
+        # L'expiration est gérée par Redis
+        self.client.set(
+            self.prefix + key,
+            json.dumps(response, ensure_ascii=False, default=str),
+            ex=max(1, int(self.ttl))
+        )
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'backend': 'redis',
+            'ttl': self.ttl,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class SingleFlight:
+    """Déduplication des appels identiques en cours: un seul appel par clé, résultat partagé"""
+
+    class _Call:
+        def __init__(self):
+            self.event = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key: str, fn) -> Tuple[object, bool]:
+        """Exécute fn() ou attend l'appel déjà lancé pour la même clé; retourne (résultat, partagé)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+                self.leaders += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, False
+
+    def stats(self) -> Dict:
+        return {
+            'in_flight': len(self._calls),
+            'leaders': self.leaders,
+            'shared': self.shared
+        }
+
+
+class AsyncSingleFlight:
+    """Équivalent asyncio de SingleFlight pour le mode ASGI"""
+
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: str, coro_fn) -> Tuple[object, bool]:
+        """Attend la coroutine déjà lancée pour la même clé, sinon la lance; retourne (résultat, partagé)"""
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            self.shared += 1
+        else:
+            # Tâche indépendante: l'annulation du premier client n'interrompt pas les autres
+            task = asyncio.ensure_future(coro_fn())
+            self._calls[key] = task
+            self.leaders += 1
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task), shared
+
+    def stats(self) -> Dict:
+        return {
+            'in_flight': len(self._calls),
+            'leaders': self.leaders,
+            'shared': self.shared
+        }
+
+
+def create_response_cache():
+    """Instancie le backend choisi par RESPONSE_CACHE_BACKEND (memory, sqlite ou redis)"""
+    backend = os.getenv('RESPONSE_CACHE_BACKEND', 'memory').lower()
+    ttl = float(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+    max_entries = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1000'))
+
+    if backend == 'sqlite':
+        return SQLiteResponseCache(
+            os.getenv('RESPONSE_CACHE_PATH', 'response_cache.db'),
+            max_entries=max_entries,
+            ttl=ttl
+        )
+    if backend == 'redis':
+        import redis  # dépendance optionnelle, uniquement pour ce backend
+        client = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+        return RedisResponseCache(client, ttl=ttl)
+
+    return ResponseCache(
+        max_entries=max_entries,
+        max_bytes=int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(50 * 1024 * 1024))),
+        ttl=ttl,
+        sweep_interval=float(os.getenv('RESPONSE_CACHE_SWEEP_INTERVAL', '60'))
+    )
@@ -0,0 +1,69 @@
+"""
+Benchmark de l'extraction des lectures aelf.org
+Compare parse_text_of_the_day_bs4 (html.parser) et parse_text_of_the_day_lxml sur les
+pages de benchmarks/fixtures/aelf/, vérifie que les deux résultats sont identiques et
+affiche le temps d'analyse par page.
+
+Ces pages sont synthétiques, pas des captures d'aelf.org: structure reprise du site
+(div.lecture, h4, menus et scripts autour) avec des lectures et un volume comparables.
+Pour mesurer sur le site réel, passer des pages enregistrées en arguments
+(adresse donnée par aelf_scraper.get_aelf_url).
+
+Lancement: python benchmarks/bench_aelf_parser.py [--iterations 50] [pages.html ...]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aelf_scraper import etree, parse_text_of_the_day_bs4, parse_text_of_the_day_lxml
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures' / 'aelf'
+
+
+def time_per_page(parse, content: bytes, date_str: str, iterations: int) -> float:
+    """Temps moyen d'analyse d'une page, en millisecondes"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse(content, date_str)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pages', nargs='*', type=Path, help="pages aelf.org enregistrées (défaut: fixtures)")
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    if etree is None:
+        sys.exit("❌ lxml n'est pas installé (pip install -r requirements_assistant.txt)")
+
+    pages = args.pages or sorted(FIXTURES_DIR.glob('*.html'))
+    total_bs4 = total_lxml = 0.0
+    print(f"{'page':<20} {'octets':>8} {'bs4 (ms)':>10} {'lxml (ms)':>10} {'gain':>7}")
+    for page in pages:
+        content = page.read_bytes()
+        date_str = page.stem
+
+        expected = parse_text_of_the_day_bs4(content, date_str)
+        if parse_text_of_the_day_lxml(content, date_str) != expected:
+            sys.exit(f"❌ {page.name}: résultat lxml différent de BeautifulSoup")
+
+        bs4_ms = time_per_page(parse_text_of_the_day_bs4, content, date_str, args.iterations)
+        lxml_ms = time_per_page(parse_text_of_the_day_lxml, content, date_str, args.iterations)
+        total_bs4 += bs4_ms
+        total_lxml += lxml_ms
+        print(f"{page.name:<20} {len(content):>8} {bs4_ms:>10.2f} {lxml_ms:>10.2f} {bs4_ms / lxml_ms:>6.1f}x")
+
+    if pages:
+        print(f"{'moyenne':<20} {'':>8} {total_bs4 / len(pages):>10.2f} {total_lxml / len(pages):>10.2f} "
+              f"{total_bs4 / total_lxml:>6.1f}x")
+        print("✅ Résultats identiques sur toutes les pages")
+
+
+if __name__ == '__main__':
+    main()
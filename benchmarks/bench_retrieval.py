@@ -0,0 +1,82 @@
+"""
+Comparaison des stratégies de recherche de passages (bible_retrieval.py)
+Pour chaque question: latence de chaque stratégie (fts, vector, hybrid), passages
+trouvés et recouvrement entre fts et vector, puis taille du contexte construit
+(passages regroupés, budget de tokens); enfin latence de l'index vectoriel par lots.
+
+Prérequis: une base importée (bible_import.py) et un index (python bible_vectors.py build).
+Lancement: python benchmarks/bench_retrieval.py [--db bible_database.db] [--index bible_vectors] [-k 10]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bible_retrieval import FtsRetriever, HybridRetriever, VectorRetriever, merge_adjacent, pack_context
+from bible_vectors import VerseVectorIndex
+from text_utils import estimate_tokens
+
+QUESTIONS = [
+    "Que dit la Bible sur le pardon ?",
+    "Comment remettre les dettes de mon frère ?",
+    "Qu'est-ce que l'amour selon saint Paul ?",
+    "Comment prier quand on est dans l'épreuve ?",
+    "Que signifie la paix du Seigneur ?",
+    "Pourquoi faut-il aimer ses ennemis ?",
+    "Qui est le bon berger ?",
+    "Que dit Jésus sur la foi et l'espérance ?",
+    "Comment vivre la charité envers les pauvres ?",
+    "Quelle est la lumière du monde ?",
+]
+
+
+def timed(fn, repeat: int):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.getenv('BIBLE_DB_PATH', 'bible_database.db'))
+    parser.add_argument('--index', default=os.getenv('BIBLE_VECTOR_INDEX', 'bible_vectors'))
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-tokens', type=int, default=400, help="budget du contexte")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    index = VerseVectorIndex(args.index)
+    fts, vector = FtsRetriever(), VectorRetriever(index)
+    retrievers = [fts, vector, HybridRetriever([fts, vector])]
+    print(f"Index: {index.stats()}")
+
+    names = ''.join(f"{retriever.name + ' ms':>11}" for retriever in retrievers)
+    print(f"\n{'question':<46}{names} {'commun':>7} {'tokens':>7}")
+    for question in QUESTIONS:
+        results = []
+        for retriever in retrievers:
+            results.append(timed(lambda: retriever.search(conn, question, args.k), args.repeat))
+        common = ({p['reference'] for p in results[0][0]['passages']}
+                  & {p['reference'] for p in results[1][0]['passages']})
+        context = pack_context(merge_adjacent(results[2][0]['passages']), args.max_tokens)
+        timings = ''.join(f"{duration:>11.2f}" for _, duration in results)
+        print(f"{question[:46]:<46}{timings} {len(common):>7} {estimate_tokens(context):>7}")
+
+    print(f"\n{'lot':>5} {'vec ms/lot':>11} {'ms/question':>12}")
+    for size in (1, 8, 32):
+        batch = (QUESTIONS * (size // len(QUESTIONS) + 1))[:size]
+        _, duration = timed(lambda: vector.search_many(conn, batch, args.k), args.repeat)
+        print(f"{size:>5} {duration:>11.2f} {duration / size:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
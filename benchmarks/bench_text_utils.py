@@ -0,0 +1,123 @@
+"""
+Micro-benchmark du nettoyage de texte (text_utils.clean_text)
+Compare l'ancienne version (replace enchaînés + re.sub recompilés à chaque appel) à la
+version en une passe sur un corpus de versets (Louis Segond 1910), des paragraphes des
+pages aelf.org synthétiques (voir bench_aelf_parser.py) et des réponses au format de celles des LLM; vérifie que
+les résultats sont identiques.
+
+Lancement: python benchmarks/bench_text_utils.py [--iterations 20] [--db bible_database.db]
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aelf_scraper import parse_text_of_the_day
+from text_utils import clean_text
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+def legacy_clean_text(text):
+    """clean_text de assistant_biblique_optimized.py avant le passage à text_utils"""
+    if not text:
+        return ''
+    text = text.replace('\u00a0', ' ').replace('\xa0', ' ')
+    text = text.replace('\n', ' ').replace('\r', ' ')
+    text = text.replace('\t', ' ')
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s+([.,;:!\?])', r'\1', text)
+    return text.strip()
+
+
+def legacy_clean_text_enhanced(text):
+    """clean_text de assistant_biblique_enhanced.py (espace ajoutée après la ponctuation)"""
+    if not text:
+        return ''
+    text = text.replace('\u00a0', ' ').replace('\xa0', ' ')
+    text = text.replace('\n', ' ').replace('\r', ' ')
+    text = text.replace('\t', ' ')
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s+([.,;:!\?])', r'\1', text)
+    text = re.sub(r'([.,;:!\?])(\S)', r'\1 \2', text)
+    return text.strip()
+
+
+def load_corpus(db_path: str = None) -> List[str]:
+    """Versets (base SQLite si fournie, sinon fixtures), paragraphes aelf.org et réponses type LLM"""
+    verses = []
+    if db_path and os.path.exists(db_path):
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            verses = [row[0] for row in conn.execute("SELECT text FROM bible_verses LIMIT 5000")]
+        except sqlite3.OperationalError:
+            verses = []
+        conn.close()
+    references = []
+    if not verses:
+        for line in (FIXTURES_DIR / 'verses_lsg.tsv').read_text(encoding='utf-8').splitlines():
+            reference, text = line.split('\t', 1)
+            references.append(reference)
+            verses.append(text)
+
+    paragraphs = []
+    for page in sorted((FIXTURES_DIR / 'aelf').glob('*.html')):
+        result = parse_text_of_the_day(page.read_bytes(), page.stem)
+        for lecture in result['lectures']:
+            paragraphs.extend(lecture['contenu'].split('\n\n'))
+
+    # Réponses au format des LLM: citation, explication sur plusieurs lignes, références
+    answers = []
+    for i in range(0, len(verses) - 3, 3):
+        cited = [ref.replace(' ', '\xa0', 1) if ref[0].isdigit() else ref for ref in references[i:i + 3]] or ['Jean 3:16']
+        answers.append(
+            f"**Citation biblique** : « {verses[i]} » ({cited[0]})\n\n"
+            f"**Explication** :\t{verses[i + 1]}\n"
+            f"Voir aussi {', '.join(cited[1:])} .\n\n"
+            f"**Application** : {verses[i + 2]}  \r\n"
+        )
+    return verses + paragraphs + answers
+
+
+def time_per_call(fn: Callable, corpus: List[str], iterations: int) -> float:
+    """Temps moyen par texte, en microsecondes"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text in corpus:
+            fn(text)
+    return (time.perf_counter() - start) / (iterations * len(corpus)) * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--db', help="base biblique (table bible_verses) à utiliser comme corpus de versets")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.db)
+    cases = [
+        ('clean_text', legacy_clean_text, clean_text),
+        ('clean_text (enhanced)', legacy_clean_text_enhanced, lambda text: clean_text(text, space_after_punctuation=True)),
+    ]
+
+    print(f"Corpus: {len(corpus)} textes, {sum(len(text) for text in corpus)} caractères")
+    print(f"{'fonction':<24} {'avant (µs)':>11} {'après (µs)':>11} {'gain':>7}")
+    for name, legacy, current in cases:
+        for text in corpus:
+            if legacy(text) != current(text):
+                sys.exit(f"❌ {name}: résultat différent pour {text[:60]!r}")
+        before = time_per_call(legacy, corpus, args.iterations)
+        after = time_per_call(current, corpus, args.iterations)
+        print(f"{name:<24} {before:>11.2f} {after:>11.2f} {before / after:>6.1f}x")
+    print("✅ Résultats identiques sur tout le corpus")
+
+
+if __name__ == '__main__':
+    main()
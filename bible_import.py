@@ -0,0 +1,353 @@
+"""
+Import d'une traduction de la Bible dans la base SQLite de l'assistant (bible_verses)
+Formats: OSIS (.xml/.osis), USFM (.usfm/.sfm, un fichier par livre ou un dossier),
+JSON (liste de {book, chapter, verse, text} ou {livre: {chapitre: {verset: texte}}}),
+CSV/TSV (colonnes book, chapter, verse, text, ou reference, text).
+
+La base est construite dans un fichier temporaire puis mise en place d'un coup:
+chargement par executemany dans une seule transaction (journal et synchronisation
+désactivés), puis index (book, chapter, verse), index FTS5 reconstruit en une passe
+et statistiques ANALYZE. Les versets sont triés dans l'ordre canonique, donc un même
+fichier source donne toujours la même base (build Docker reproductible).
+
+La base en place est d'abord repassée en journal classique (son journal WAL est
+reporté dans le fichier, -wal et -shm supprimés par SQLite): l'import refuse de la
+remplacer tant qu'un processus l'a ouverte (assistant démarré).
+
+Une base contient une seule traduction: bible_verses n'a pas de colonne de traduction,
+les versets sont dédoublonnés sur (livre, chapitre, verset) et chaque import remplace
+la base entière. Pour plusieurs traductions, une base par traduction (--output), choisie
+par BIBLE_DB_PATH au démarrage de l'assistant.
+
+Lancement: python bible_import.py traduction.usfm [autres fichiers...] [--output bible_database.db]
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from bible_references import BOOKS, canonical_book, find_references
+from bible_search import SCHEMA_SQL, VERSES_TABLE_SQL
+
+Verse = Tuple[str, int, int, str]  # (livre, chapitre, verset, texte)
+
+# Codes OSIS et USFM des livres, dans l'ordre de bible_references.BOOKS
+BOOK_CODES = [
+    ('Gen', 'GEN'), ('Exod', 'EXO'), ('Lev', 'LEV'), ('Num', 'NUM'), ('Deut', 'DEU'),
+    ('Josh', 'JOS'), ('Judg', 'JDG'), ('Ruth', 'RUT'), ('1Sam', '1SA'), ('2Sam', '2SA'),
+    ('1Kgs', '1KI'), ('2Kgs', '2KI'), ('1Chr', '1CH'), ('2Chr', '2CH'), ('Ezra', 'EZR'),
+    ('Neh', 'NEH'), ('Tob', 'TOB'), ('Jdt', 'JDT'), ('Esth', 'EST'), ('1Macc', '1MA'),
+    ('2Macc', '2MA'), ('Job', 'JOB'), ('Ps', 'PSA'), ('Prov', 'PRO'), ('Eccl', 'ECC'),
+    ('Song', 'SNG'), ('Wis', 'WIS'), ('Sir', 'SIR'), ('Isa', 'ISA'), ('Jer', 'JER'),
+    ('Lam', 'LAM'), ('Bar', 'BAR'), ('Ezek', 'EZK'), ('Dan', 'DAN'), ('Hos', 'HOS'),
+    ('Joel', 'JOL'), ('Amos', 'AMO'), ('Obad', 'OBA'), ('Jonah', 'JON'), ('Mic', 'MIC'),
+    ('Nah', 'NAM'), ('Hab', 'HAB'), ('Zeph', 'ZEP'), ('Hag', 'HAG'), ('Zech', 'ZEC'),
+    ('Mal', 'MAL'), ('Matt', 'MAT'), ('Mark', 'MRK'), ('Luke', 'LUK'), ('John', 'JHN'),
+    ('Acts', 'ACT'), ('Rom', 'ROM'), ('1Cor', '1CO'), ('2Cor', '2CO'), ('Gal', 'GAL'),
+    ('Eph', 'EPH'), ('Phil', 'PHP'), ('Col', 'COL'), ('1Thess', '1TH'), ('2Thess', '2TH'),
+    ('1Tim', '1TI'), ('2Tim', '2TI'), ('Titus', 'TIT'), ('Phlm', 'PHM'), ('Heb', 'HEB'),
+    ('Jas', 'JAS'), ('1Pet', '1PE'), ('2Pet', '2PE'), ('1John', '1JN'), ('2John', '2JN'),
+    ('3John', '3JN'), ('Jude', 'JUD'), ('Rev', 'REV'),
+]
+assert len(BOOK_CODES) == len(BOOKS)
+
+OSIS_BOOKS = {osis: name for (osis, _), (name, _) in zip(BOOK_CODES, BOOKS)}
+USFM_BOOKS = {usfm: name for (_, usfm), (name, _) in zip(BOOK_CODES, BOOKS)}
+BOOK_ORDER = {name: i for i, (name, _) in enumerate(BOOKS)}
+
+# PRAGMAs de chargement: la base est jetable tant qu'elle n'a pas été mise en place
+LOAD_PRAGMAS = (
+    "PRAGMA journal_mode=OFF",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA locking_mode=EXCLUSIVE",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-262144",
+)
+
+# Éléments OSIS dont le texte ne fait pas partie du verset (notes, titres, variantes)
+OSIS_SKIPPED = {'note', 'title', 'rdg', 'reference'}
+
+USFM_NOTE_RE = re.compile(r'\\(f|fe|x|ef|ex)\s.*?\\\1\*', re.DOTALL)
+USFM_ATTRIBUTES_RE = re.compile(r'\|[^\\]*(?=\\\+?\w+\*)')
+USFM_MARKER_RE = re.compile(r'\\\+?[a-z]+\d*\*?\s?')
+USFM_VERSE_RE = re.compile(r'\\v\s+(\d+)[a-z]?(?:-\d+[a-z]?)?\s*')
+# Lignes hors texte biblique: en-têtes, titres de section, remarques
+USFM_SKIPPED_RE = re.compile(r'\\(?:h|toc\d?|toca\d?|mt\d?|mte\d?|ms\d?|mr|s\d?|sr|r|rem|ide|sts|cl|sp|usfm|d)$')
+
+
+def _resolve_book(name: str) -> str:
+    book = canonical_book(name) or USFM_BOOKS.get(name.upper()) or OSIS_BOOKS.get(name)
+    if not book:
+        raise ValueError(f"livre inconnu: {name!r}")
+    return book
+
+
+def _clean(text: str) -> str:
+    return ' '.join(text.split())
+
+
+def read_osis(source) -> Iterator[Verse]:
+    """Versets d'un fichier OSIS, en éléments <verse osisID> ou en jalons sID/eID"""
+    root = ET.parse(source).getroot()
+    current = None  # osisID du verset en jalon ouvert
+    parts: List[str] = []
+
+    def emit(osis_id: str, text: str) -> Iterator[Verse]:
+        # « Gen.1.1 Gen.1.2 » (versets fusionnés): le texte va au premier
+        book, chapter, verse = osis_id.split()[0].split('.')[:3]
+        text = _clean(text)
+        if text:
+            yield OSIS_BOOKS[book], int(chapter), int(verse), text
+
+    def walk(element) -> Iterator[Verse]:
+        nonlocal current, parts
+        tag = element.tag.rsplit('}', 1)[-1]
+        if tag == 'verse' and (element.get('sID') or element.get('eID')):
+            if current:
+                yield from emit(current, ''.join(parts))
+            current, parts = None, []
+            if element.get('sID'):
+                current = element.get('osisID') or element.get('sID')
+        elif tag == 'verse' and element.get('osisID'):
+            yield from emit(element.get('osisID'), ''.join(_osis_text(element)))
+        elif tag not in OSIS_SKIPPED:
+            if current and element.text:
+                parts.append(element.text)
+            for child in element:
+                yield from walk(child)
+        if current and element.tail:
+            parts.append(element.tail)
+
+    yield from walk(root)
+    if current:
+        yield from emit(current, ''.join(parts))
+
+
+def _osis_text(element) -> Iterator[str]:
+    """Texte d'un élément sans celui des notes et titres (les queues restent)"""
+    if element.text:
+        yield element.text
+    for child in element:
+        if child.tag.rsplit('}', 1)[-1] not in OSIS_SKIPPED:
+            yield from _osis_text(child)
+        if child.tail:
+            yield child.tail
+
+
+def read_usfm(text: str) -> Iterator[Verse]:
+    """Versets d'un texte USFM (\\id, \\c, \\v; notes, attributs de mots et marqueurs retirés)"""
+    text = USFM_NOTE_RE.sub('', text)
+    text = USFM_ATTRIBUTES_RE.sub('', text)
+    book, chapter = None, 0
+    verse, parts = None, []
+
+    for line in text.splitlines():
+        marker, _, rest = line.strip().partition(' ')
+        if marker in ('\\id', '\\c'):
+            if verse is not None:
+                yield book, chapter, verse, _clean(' '.join(parts))
+            verse, parts = None, []
+            if marker == '\\id':
+                book, chapter = _resolve_book(rest.split()[0]), 0
+            else:
+                chapter = int(rest.split()[0])
+            continue
+        if not book or not chapter or USFM_SKIPPED_RE.match(marker):
+            continue
+        # Une ligne peut contenir plusieurs versets: « \\q1 \\v 3 ... \\v 4 ... »
+        pieces = USFM_VERSE_RE.split(line)
+        if verse is not None:
+            parts.append(USFM_MARKER_RE.sub(' ', pieces[0]))
+        for number, content in zip(pieces[1::2], pieces[2::2]):
+            if verse is not None:
+                yield book, chapter, verse, _clean(' '.join(parts))
+            verse, parts = int(number), [USFM_MARKER_RE.sub(' ', content)]
+
+    if verse is not None:
+        yield book, chapter, verse, _clean(' '.join(parts))
+
+
+def read_json(text: str) -> Iterator[Verse]:
+    """Liste de {book, chapter, verse, text} ou {livre: {chapitre: {verset: texte}}}"""
+    data = json.loads(text)
+    if isinstance(data, dict) and 'verses' in data:
+        data = data['verses']
+    if isinstance(data, list):
+        for item in data:
+            yield _resolve_book(item['book']), int(item['chapter']), int(item['verse']), _clean(item['text'])
+    else:
+        for book, chapters in data.items():
+            book = _resolve_book(book)
+            for chapter, verses in chapters.items():
+                for verse, verse_text in verses.items():
+                    yield book, int(chapter), int(verse), _clean(verse_text)
+
+
+def read_csv(text: str, delimiter: str) -> Iterator[Verse]:
+    """Colonnes book, chapter, verse, text (en-tête facultatif) ou reference, text"""
+    rows = csv.reader(io.StringIO(text), delimiter=delimiter)
+    for row in rows:
+        if not row or not ''.join(row).strip():
+            continue
+        if len(row) >= 4:
+            if not row[1].strip().isdigit():
+                continue  # en-tête
+            yield _resolve_book(row[0]), int(row[1]), int(row[2]), _clean(delimiter.join(row[3:]))
+        elif len(row) >= 2:
+            references = find_references(row[0])
+            if not references or references[0].verse_start is None:
+                if row[0].strip().lower() in ('reference', 'référence'):
+                    continue
+                raise ValueError(f"référence invalide: {row[0]!r}")
+            reference = references[0]
+            yield reference.book, reference.chapter, reference.verse_start, _clean(delimiter.join(row[1:]))
+
+
+def read_source(path: Path) -> Iterator[Verse]:
+    """Versets d'un fichier (format déduit de l'extension) ou des fichiers d'un dossier"""
+    if path.is_dir():
+        for child in sorted(path.iterdir()):
+            if child.suffix.lower() in READERS:
+                yield from read_source(child)
+        return
+    suffix = path.suffix.lower()
+    if suffix not in READERS:
+        raise ValueError(f"format non reconnu: {path.name} (attendu: {', '.join(sorted(READERS))})")
+    if suffix in ('.xml', '.osis'):
+        yield from read_osis(str(path))
+    else:
+        yield from READERS[suffix](path.read_text(encoding='utf-8-sig'))
+
+
+READERS = {
+    '.xml': read_osis,
+    '.osis': read_osis,
+    '.usfm': read_usfm,
+    '.sfm': read_usfm,
+    '.json': read_json,
+    '.csv': lambda text: read_csv(text, ','),
+    '.tsv': lambda text: read_csv(text, '\t'),
+}
+
+
+def collect_verses(verses: Iterable[Verse]) -> Tuple[List[Verse], int]:
+    """Versets dédoublonnés (le dernier l'emporte) et triés dans l'ordre canonique"""
+    unique: Dict[Tuple[str, int, int], str] = {}
+    duplicates = 0
+    for book, chapter, verse, text in verses:
+        if not text:
+            continue
+        key = (book, chapter, verse)
+        if key in unique:
+            duplicates += 1
+        unique[key] = text
+    ordered = sorted(unique, key=lambda key: (BOOK_ORDER[key[0]], key[1], key[2]))
+    return [(book, chapter, verse, unique[(book, chapter, verse)]) for book, chapter, verse in ordered], duplicates
+
+
+def release_output(output: str):
+    """Ferme proprement la base remplacée: journal WAL reporté dans le fichier et
+    -wal/-shm supprimés par SQLite (jamais à la main: un lecteur les utilise peut-être).
+    RuntimeError si un autre processus l'a ouverte."""
+    if not os.path.exists(output):
+        return
+    conn = sqlite3.connect(output, timeout=1.0, isolation_level=None)
+    try:
+        # Sortie du mode WAL: exige d'être seul sur la base
+        mode = conn.execute("PRAGMA journal_mode=DELETE").fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        raise RuntimeError(f"{output} est en cours d'utilisation ou illisible ({e})") from e
+    finally:
+        conn.close()
+    if mode.lower() != 'delete':
+        raise RuntimeError(f"{output} est en cours d'utilisation (journal {mode})")
+
+
+def build_database(output: str, verses: List[Verse]) -> Dict:
+    """Construit la base dans output.tmp puis la met en place (remplacement atomique);
+    RuntimeError si la base à remplacer est ouverte par un autre processus"""
+    started = time.monotonic()
+    tmp_path = f"{output}.tmp"
+    for path in (tmp_path, f"{tmp_path}-wal", f"{tmp_path}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+    conn = sqlite3.connect(tmp_path, isolation_level=None)
+    try:
+        for pragma in LOAD_PRAGMAS:
+            conn.execute(pragma)
+        # Table seule: l'index et le FTS sont construits en une passe après le chargement,
+        # bien plus vite que par les triggers ligne à ligne
+        conn.executescript(VERSES_TABLE_SQL)
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO bible_verses (book, chapter, verse, text, reference) VALUES (?, ?, ?, ?, ?)",
+            ((book, chapter, verse, text, f"{book} {chapter}:{verse}") for book, chapter, verse, text in verses)
+        )
+        conn.execute("COMMIT")
+        loaded = time.monotonic()
+
+        conn.executescript(SCHEMA_SQL)
+        conn.execute("INSERT INTO bible_verses_fts(bible_verses_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO bible_verses_fts(bible_verses_fts) VALUES ('optimize')")
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+        # Mode attendu par le serveur (lecteurs non bloqués par une mise à jour)
+        conn.execute("PRAGMA locking_mode=NORMAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        books = conn.execute("SELECT count(DISTINCT book) FROM bible_verses").fetchone()[0]
+    finally:
+        conn.close()
+
+    try:
+        release_output(output)
+    except RuntimeError:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output)
+    return {
+        'verses': len(verses),
+        'books': books,
+        'load_s': round(loaded - started, 2),
+        'total_s': round(time.monotonic() - started, 2),
+        'size_mb': round(os.path.getsize(output) / 1024 / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', type=Path,
+                        help="fichiers ou dossiers d'une même traduction (livres complémentaires)")
+    parser.add_argument('--output', default=os.getenv('BIBLE_DB_PATH', 'bible_database.db'),
+                        help="base créée ou remplacée entièrement (une base par traduction)")
+    args = parser.parse_args()
+
+    try:
+        verses, duplicates = collect_verses(verse for source in args.sources for verse in read_source(source))
+    except (OSError, ValueError, KeyError, ET.ParseError) as e:
+        sys.exit(f"❌ Import impossible: {e}")
+    if not verses:
+        sys.exit("❌ Aucun verset trouvé")
+    if duplicates:
+        print(f"⚠️  {duplicates} versets en double (le dernier a été conservé); "
+              f"une base ne contient qu'une traduction: importer chaque traduction avec son --output")
+
+    try:
+        report = build_database(args.output, verses)
+    except RuntimeError as e:
+        sys.exit(f"❌ Import impossible: {e}; arrêter l'assistant ou importer dans un autre --output")
+    print(f"✅ {report['verses']} versets ({report['books']} livres) importés dans {args.output} "
+          f"en {report['total_s']}s (chargement {report['load_s']}s, {report['size_mb']} Mo)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""
+Références bibliques en français: analyse et recherche des versets
+- find_references: repère « Jean 3:16 », « Jn 3, 16-18 », « 1 Corinthiens 13 »,
+  « Gn 1-2 », « Ps 22 (23), 1-4 », « Isaïe 53:5.7 »... dans un texte libre
+- lookup_references: récupère le texte de toutes les références en une seule requête,
+  par l'index (book, chapter, verse) de bible_verses
+"""
+
+import re
+import sqlite3
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from text_utils import fold_accents
+
+# Livres du canon catholique: nom de référence, puis noms et abréviations acceptés
+# (abréviations de la Bible de Jérusalem / AELF). La casse est libre pour les noms,
+# les abréviations de 3 lettres ou moins doivent commencer par une majuscule.
+BOOKS = [
+    ('Genèse', ['Gn', 'Gen']),
+    ('Exode', ['Ex']),
+    ('Lévitique', ['Lv', 'Lev']),
+    ('Nombres', ['Nb', 'Nomb']),
+    ('Deutéronome', ['Dt', 'Deut']),
+    ('Josué', ['Jos']),
+    ('Juges', ['Jg']),
+    ('Ruth', ['Rt']),
+    ('1 Samuel', ['1 S', '1 Sam']),
+    ('2 Samuel', ['2 S', '2 Sam']),
+    ('1 Rois', ['1 R']),
+    ('2 Rois', ['2 R']),
+    ('1 Chroniques', ['1 Ch', '1 Chr']),
+    ('2 Chroniques', ['2 Ch', '2 Chr']),
+    ('Esdras', ['Esd']),
+    ('Néhémie', ['Ne', 'Neh']),
+    ('Tobie', ['Tb']),
+    ('Judith', ['Jdt']),
+    ('Esther', ['Est']),
+    ('1 Maccabées', ['1 M', '1 Mac']),
+    ('2 Maccabées', ['2 M', '2 Mac']),
+    ('Job', ['Jb']),
+    ('Psaumes', ['Psaume', 'Ps']),
+    ('Proverbes', ['Pr', 'Prov']),
+    ('Ecclésiaste', ['Qohèleth', 'Qohéleth', 'Qo', 'Ecc']),
+    ('Cantique des cantiques', ['Cantique des Cantiques', 'Cantique', 'Ct']),
+    ('Sagesse', ['Sg']),
+    ('Siracide', ['Ecclésiastique', 'Si', 'Sir']),
+    ('Isaïe', ['Ésaïe', 'Is', 'Es']),
+    ('Jérémie', ['Jr', 'Jer']),
+    ('Lamentations', ['Lm', 'Lam']),
+    ('Baruch', ['Ba']),
+    ('Ézéchiel', ['Ez']),
+    ('Daniel', ['Dn', 'Dan']),
+    ('Osée', ['Os']),
+    ('Joël', ['Jl']),
+    ('Amos', ['Am']),
+    ('Abdias', ['Ab', 'Abd']),
+    ('Jonas', ['Jon']),
+    ('Michée', ['Mi']),
+    ('Nahoum', ['Na']),
+    ('Habacuc', ['Ha']),
+    ('Sophonie', ['So']),
+    ('Aggée', ['Ag']),
+    ('Zacharie', ['Za']),
+    ('Malachie', ['Ml']),
+    ('Matthieu', ['Mt', 'Mat']),
+    ('Marc', ['Mc']),
+    ('Luc', ['Lc']),
+    ('Jean', ['Jn']),
+    ('Actes', ['Actes des Apôtres', 'Ac']),
+    ('Romains', ['Rm', 'Rom']),
+    ('1 Corinthiens', ['1 Co', '1 Cor']),
+    ('2 Corinthiens', ['2 Co', '2 Cor']),
+    ('Galates', ['Ga', 'Gal']),
+    ('Éphésiens', ['Ep', 'Eph']),
+    ('Philippiens', ['Ph', 'Phil']),
+    ('Colossiens', ['Col']),
+    ('1 Thessaloniciens', ['1 Th']),
+    ('2 Thessaloniciens', ['2 Th']),
+    ('1 Timothée', ['1 Tm', '1 Tim']),
+    ('2 Timothée', ['2 Tm', '2 Tim']),
+    ('Tite', ['Tt']),
+    ('Philémon', ['Phm']),
+    ('Hébreux', ['He', 'Heb']),
+    ('Jacques', ['Jc', 'Jac']),
+    ('1 Pierre', ['1 P']),
+    ('2 Pierre', ['2 P']),
+    ('1 Jean', ['1 Jn']),
+    ('2 Jean', ['2 Jn']),
+    ('3 Jean', ['3 Jn']),
+    ('Jude', ['Jd']),
+    ('Apocalypse', ['Ap', 'Apoc']),
+]
+
+# Un seul chapitre: « Jude 3 » désigne le verset 3
+SINGLE_CHAPTER_BOOKS = frozenset(('Abdias', 'Philémon', '2 Jean', '3 Jean', 'Jude'))
+
+# Fin de plage pour une référence sans verset (chapitre entier)
+WHOLE_CHAPTER = 999
+
+# Noms de livres qui sont aussi des mots courants (« les nombres 7 », « deux rois 3 »):
+# en minuscules, ils ne forment une référence qu'avec des versets (« nombres 7:3 »)
+COMMON_WORD_BOOKS = ('nombres', 'actes', 'juges', 'rois', 'job', 'sagesse', 'proverbes', 'lamentations')
+
+ORDINALS = {'1': ('1', '1er', '1re', 'I', 'Premier', 'Première'),
+            '2': ('2', '2e', 'II', 'Deuxième', 'Second', 'Seconde'),
+            '3': ('3', '3e', 'III', 'Troisième')}
+
+
+class BibleReference(NamedTuple):
+    """Référence normalisée; verse_start None = chapitre(s) entier(s), end_chapter pour
+    « Jn 3:16-4:2 » ou « Gn 1-2 »"""
+    book: str
+    chapter: int
+    verse_start: Optional[int] = None
+    verse_end: Optional[int] = None
+    end_chapter: Optional[int] = None
+
+    @property
+    def label(self) -> str:
+        if self.verse_start is None:
+            if self.end_chapter is not None and self.end_chapter != self.chapter:
+                return f"{self.book} {self.chapter}-{self.end_chapter}"
+            return f"{self.book} {self.chapter}"
+        label = f"{self.book} {self.chapter}:{self.verse_start}"
+        if self.end_chapter is not None and self.end_chapter != self.chapter:
+            return f"{label}-{self.end_chapter}:{self.verse_end}"
+        if self.verse_end is not None and self.verse_end != self.verse_start:
+            return f"{label}-{self.verse_end}"
+        return label
+
+
+def book_key(name: str) -> str:
+    """Forme de comparaison d'un nom de livre: sans accents, minuscules, espaces simples"""
+    return ' '.join(fold_accents(name).casefold().replace('.', ' ').split())
+
+
+def _alias_pattern(alias: str) -> str:
+    """Motif d'un nom (sur texte sans accents): espaces souples, casse libre sauf abréviations"""
+    number, _, name = alias.partition(' ') if alias[0].isdigit() else ('', '', alias)
+    name = fold_accents(name)
+    words = r'\s+'.join(re.escape(word) for word in name.split())
+    if len(name) > 3:
+        words = f'(?i:{words})'
+    if not number:
+        return words
+    ordinals = '|'.join(re.escape(fold_accents(o)) for o in ORDINALS[number])
+    return rf'(?:{ordinals})\s*{words}'
+
+
+def _build_book_index():
+    aliases = {}
+    for canonical, names in BOOKS:
+        for alias in [canonical] + names:
+            aliases[alias] = canonical
+    # Les plus longs d'abord: « 1 Jean » avant « Jean », « Psaumes » avant « Ps »
+    ordered = sorted(aliases, key=lambda alias: -len(alias))
+    keys = {}
+    for alias, canonical in aliases.items():
+        keys[book_key(alias)] = canonical
+        if alias[0].isdigit():
+            for ordinal in ORDINALS[alias[0]]:
+                keys[book_key(f"{ordinal} {alias[2:]}")] = canonical
+    # Formes collées acceptées par REFERENCE_RE (« 1Co », « IJean »), sans masquer un
+    # nom existant (« Is » reste Isaïe)
+    for alias, canonical in aliases.items():
+        if alias[0].isdigit():
+            for ordinal in ORDINALS[alias[0]]:
+                keys.setdefault(book_key(f"{ordinal}{alias[2:]}"), canonical)
+    return ordered, keys
+
+
+_ORDERED_ALIASES, BOOK_KEYS = _build_book_index()
+
+_BOOK_RE = '|'.join(_alias_pattern(alias) for alias in _ORDERED_ALIASES)
+
+# Livre, chapitre, puis éventuellement « ( numérotation grecque ) » et versets:
+# « 3:16 », « 3, 16-18 », « 3,16.18 », « 3:16-4:2 »; ou plage de chapitres « 1-2 », « 1-2:3 »
+REFERENCE_RE = re.compile(
+    rf'(?<![\w])(?P<book>{_BOOK_RE})\.?\s+'
+    r'(?P<chapter>\d{1,3})(?!\d)'
+    r'(?:\s*\(\d{1,3}\))?'
+    r'(?:\s*[:,]\s*(?P<verses>\d{1,3}[a-d]?(?:\s*(?:[-–]\s*(?:\d{1,3}\s*[:,]\s*)?|\.)\d{1,3}[a-d]?)*)'
+    r'|\s*[-–]\s*(?P<end_chapter>\d{1,3})(?:\s*:\s*(?P<end_verse>\d{1,3}))?)?'
+    r'(?![\w:])'
+)
+
+_VERSE_RANGE_RE = re.compile(r'(\d+)[a-d]?(?:\s*[-–]\s*(?:(\d+)\s*[:,]\s*)?(\d+)[a-d]?)?')
+
+
+def canonical_book(name: str) -> Optional[str]:
+    """Nom de référence d'un livre à partir d'un nom ou d'une abréviation (None si inconnu)"""
+    return BOOK_KEYS.get(book_key(name))
+
+
+def _is_common_word(book: str) -> bool:
+    """Vrai si le nom trouvé est un mot courant écrit en minuscules (« nombres », « 2 rois »)"""
+    tail = book.split()[-1]
+    return any(tail.casefold().endswith(word) and tail[-len(word)].islower() for word in COMMON_WORD_BOOKS)
+
+
+def _parse_verses(book: str, chapter: int, verses: str) -> List[BibleReference]:
+    references = []
+    for part in verses.split('.'):
+        match = _VERSE_RANGE_RE.fullmatch(part.strip())
+        if not match:
+            continue
+        start = int(match.group(1))
+        end_chapter = int(match.group(2)) if match.group(2) else None
+        end = int(match.group(3)) if match.group(3) else None
+        if end_chapter is not None and end_chapter != chapter:
+            references.append(BibleReference(book, chapter, start, end, end_chapter))
+        else:
+            references.append(BibleReference(book, chapter, start, end if end is not None else start))
+    return references
+
+
+def find_references(text: str) -> List[BibleReference]:
+    """Toutes les références citées dans un texte, dans l'ordre et sans doublons"""
+    if not text:
+        return []
+    references = []
+    # Repliement des accents: « Ésaïe » et « Esaie » sont cherchés avec le même motif
+    for match in REFERENCE_RE.finditer(fold_accents(text)):
+        book = BOOK_KEYS.get(book_key(match.group('book')))
+        if book is None:
+            continue
+        if not match.group('verses') and _is_common_word(match.group('book')):
+            continue
+        chapter = int(match.group('chapter'))
+        end_chapter = int(match.group('end_chapter')) if match.group('end_chapter') else chapter
+        if match.group('verses'):
+            found = _parse_verses(book, chapter, match.group('verses'))
+        elif book in SINGLE_CHAPTER_BOOKS:
+            found = [BibleReference(book, 1, chapter, max(chapter, end_chapter))]
+        elif end_chapter > chapter and match.group('end_verse'):
+            found = [BibleReference(book, chapter, 1, int(match.group('end_verse')), end_chapter)]
+        elif end_chapter > chapter:
+            found = [BibleReference(book, chapter, end_chapter=end_chapter)]
+        else:
+            found = [BibleReference(book, chapter)]
+        for reference in found:
+            if reference not in references:
+                references.append(reference)
+    return references
+
+
+def load_book_names(conn: sqlite3.Connection) -> Dict[str, str]:
+    """Nom de référence -> orthographe utilisée dans bible_verses (« Ésaïe » ou « Isaïe »...)"""
+    names = {}
+    for (name,) in conn.execute("SELECT DISTINCT book FROM bible_verses"):
+        canonical = canonical_book(name)
+        if canonical:
+            names[canonical] = name
+    return names
+
+
+def _segments(reference: BibleReference):
+    """(chapitre, premier verset, dernier verset) couverts par une référence"""
+    if reference.verse_start is None:
+        for chapter in range(reference.chapter, (reference.end_chapter or reference.chapter) + 1):
+            yield chapter, 0, WHOLE_CHAPTER
+    elif reference.end_chapter is None:
+        yield reference.chapter, reference.verse_start, reference.verse_end or reference.verse_start
+    else:
+        yield reference.chapter, reference.verse_start, WHOLE_CHAPTER
+        for chapter in range(reference.chapter + 1, reference.end_chapter):
+            yield chapter, 0, WHOLE_CHAPTER
+        yield reference.end_chapter, 0, reference.verse_end or WHOLE_CHAPTER
+
+
+def lookup_references(conn: sqlite3.Connection, references: Sequence[BibleReference],
+                      book_names: Optional[Dict[str, str]] = None,
+                      max_verses_per_reference: int = 30) -> List[Dict]:
+    """Texte des versets de toutes les références, en une requête (index book, chapter, verse)
+
+    Chaque verset porte 'ref_index', la position de sa référence dans references;
+    une référence sans verset correspondant n'existe pas dans la base.
+    """
+    wanted = []
+    for index, reference in enumerate(references):
+        book = (book_names or {}).get(reference.book, reference.book)
+        for chapter, first, last in _segments(reference):
+            wanted.append((index, book, chapter, first, last))
+    if not wanted:
+        return []
+
+    placeholders = ', '.join(['(?, ?, ?, ?, ?)'] * len(wanted))
+    rows = conn.execute(f"""
+        WITH wanted(ref_index, book, chapter, first, last) AS (VALUES {placeholders})
+        SELECT w.ref_index, v.book, v.chapter, v.verse, v.text, v.reference
+        FROM wanted AS w
+        JOIN bible_verses AS v
+          ON v.book = w.book AND v.chapter = w.chapter AND v.verse BETWEEN w.first AND w.last
+        ORDER BY w.ref_index, v.chapter, v.verse
+    """, [value for row in wanted for value in row]).fetchall()
+
+    verses = []
+    per_reference = {}
+    for ref_index, book, chapter, verse, text, reference in rows:
+        count = per_reference.get(ref_index, 0)
+        if count >= max_verses_per_reference:
+            continue
+        per_reference[ref_index] = count + 1
+        verses.append({
+            'ref_index': ref_index,
+            'book': book,
+            'chapter': chapter,
+            'verse': verse,
+            'text': text,
+            'reference': reference or f"{book} {chapter}:{verse}"
+        })
+    return verses
@@ -0,0 +1,234 @@
+"""
+Stratégies de recherche des passages bibliques pour le contexte des LLM
+- fts: recherche plein texte SQLite (FTS5, BM25), voir bible_search.py
+- vector: plus proches voisins dans l'index d'embeddings des versets (bible_vectors.py)
+- hybrid: fusion des deux classements (reciprocal rank fusion)
+Toutes retournent le même format que bible_search.search_verses et prennent une
+connexion du pool, ce qui permet de les comparer (benchmarks/bench_retrieval.py).
+Les versets retenus sont ensuite regroupés en passages (versets consécutifs) et
+ajoutés au contexte tant qu'ils tiennent dans un budget de tokens.
+"""
+
+import os
+import sqlite3
+from typing import Dict, List
+
+from bible_search import search_verses
+from text_utils import estimate_tokens
+
+# Constante de la reciprocal rank fusion: score = somme des 1 / (RRF_K + rang)
+RRF_K = 60
+
+
+class FtsRetriever:
+    """Recherche par mots-clés (FTS5, classement BM25)"""
+
+    name = 'fts'
+
+    def search(self, conn: sqlite3.Connection, question: str, limit: int = 5) -> Dict:
+        return search_verses(conn, question, limit)
+
+    def search_many(self, conn: sqlite3.Connection, questions: List[str], limit: int = 5) -> List[Dict]:
+        return [self.search(conn, question, limit) for question in questions]
+
+    def stats(self) -> Dict:
+        return {'strategy': self.name}
+
+
+class VectorRetriever:
+    """Recherche sémantique: produit scalaire avec les embeddings des versets"""
+
+    name = 'vector'
+
+    def __init__(self, index, embedder=None):
+        from bible_vectors import create_embedder
+
+        self.index = index
+        self.embedder = embedder or create_embedder(index.meta)
+
+    def search(self, conn: sqlite3.Connection, question: str, limit: int = 5) -> Dict:
+        return self.search_many(conn, [question], limit)[0]
+
+    def search_many(self, conn: sqlite3.Connection, questions: List[str], limit: int = 5) -> List[Dict]:
+        """Toutes les questions en un produit matriciel, les versets en une requête"""
+        if not questions:
+            return []
+        hits = self.index.search(self.embedder.embed(questions), limit)
+        rowids = sorted({rowid for question_hits in hits for rowid, _ in question_hits})
+        verses = {}
+        if rowids:
+            placeholders = ', '.join('?' * len(rowids))
+            for row in conn.execute(
+                f"SELECT rowid, book, chapter, verse, text, reference FROM bible_verses WHERE rowid IN ({placeholders})",
+                rowids
+            ):
+                verses[row[0]] = row[1:]
+
+        results = []
+        for question_hits in hits:
+            passages = []
+            for rowid, score in question_hits:
+                if rowid not in verses:
+                    continue  # index construit sur une autre version de la base
+                book, chapter, verse, text, reference = verses[rowid]
+                passages.append({
+                    'book': book,
+                    'chapter': chapter,
+                    'verse': verse,
+                    'text': text,
+                    'reference': reference,
+                    'score': round(score, 4)
+                })
+            results.append({'passages': passages, 'keywords_found': [], 'total_results': len(passages)})
+        return results
+
+    def stats(self) -> Dict:
+        return {'strategy': self.name, 'index': self.index.stats()}
+
+
+def fuse_rankings(rankings: List[List[Dict]], rrf_k: int = RRF_K) -> List[Dict]:
+    """Reciprocal rank fusion: un verset bien classé par plusieurs stratégies passe devant"""
+    scores = {}
+    passages = {}
+    for ranking in rankings:
+        for rank, passage in enumerate(ranking, 1):
+            key = (passage['book'], passage['chapter'], passage['verse'])
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            passages.setdefault(key, passage)
+    ordered = sorted(scores, key=lambda key: -scores[key])
+    return [dict(passages[key], score=round(scores[key], 5)) for key in ordered]
+
+
+class HybridRetriever:
+    """Classements plein texte et vectoriel fusionnés (reciprocal rank fusion)"""
+
+    name = 'hybrid'
+
+    def __init__(self, retrievers: List, candidates: int = 20, rrf_k: int = RRF_K):
+        self.retrievers = retrievers
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+
+    def search(self, conn: sqlite3.Connection, question: str, limit: int = 5) -> Dict:
+        return self.search_many(conn, [question], limit)[0]
+
+    def search_many(self, conn: sqlite3.Connection, questions: List[str], limit: int = 5) -> List[Dict]:
+        candidates = max(limit, self.candidates)
+        rankings = [retriever.search_many(conn, questions, candidates) for retriever in self.retrievers]
+        results = []
+        for i in range(len(questions)):
+            passages = fuse_rankings([ranking[i]['passages'] for ranking in rankings], self.rrf_k)[:limit]
+            keywords = [word for ranking in rankings for word in ranking[i]['keywords_found']]
+            results.append({'passages': passages, 'keywords_found': keywords, 'total_results': len(passages)})
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            'strategy': self.name,
+            'candidates': self.candidates,
+            'rrf_k': self.rrf_k,
+            'retrievers': [retriever.stats() for retriever in self.retrievers]
+        }
+
+
+def merge_adjacent(passages: List[Dict]) -> List[Dict]:
+    """Regroupe les versets consécutifs d'un même chapitre (« Matthieu 5:3-5 »)
+
+    Les passages gardent l'ordre de pertinence de leur meilleur verset.
+    """
+    by_chapter = {}
+    for rank, passage in enumerate(passages):
+        by_chapter.setdefault((passage['book'], passage['chapter']), []).append((passage['verse'], rank, passage))
+
+    merged = []
+    for (book, chapter), verses in by_chapter.items():
+        verses.sort(key=lambda item: item[0])
+        group = []
+        for item in verses:
+            if group and item[0] > group[-1][0] + 1:
+                merged.append(_merge_group(book, chapter, group))
+                group = []
+            if not group or item[0] != group[-1][0]:
+                group.append(item)
+        merged.append(_merge_group(book, chapter, group))
+    merged.sort(key=lambda item: item[0])
+    return [passage for _, passage in merged]
+
+
+def _merge_group(book: str, chapter: int, group: List) -> tuple:
+    first, last = group[0][0], group[-1][0]
+    if first == last:
+        reference = group[0][2]['reference'] or f"{book} {chapter}:{first}"
+    else:
+        reference = f"{book} {chapter}:{first}-{last}"
+    passage = {
+        'book': book,
+        'chapter': chapter,
+        'verse': first,
+        'verse_end': last,
+        'text': ' '.join(item[2]['text'] for item in group),
+        'reference': reference
+    }
+    scores = [item[2]['score'] for item in group if 'score' in item[2]]
+    if scores:
+        passage['score'] = max(scores)
+    return min(item[1] for item in group), passage
+
+
+def pack_context(passages: List[Dict], max_tokens: int, separator: str = " | ") -> str:
+    """« Référence: texte » des passages, dans l'ordre, tant qu'ils tiennent dans max_tokens
+
+    Un passage trop long est sauté au profit des suivants; seul le premier est coupé
+    (à la fin d'un mot) s'il dépasse à lui seul le budget.
+    """
+    parts = []
+    used = 0
+    separator_tokens = estimate_tokens(separator)
+    for passage in passages:
+        part = f"{passage['reference']}: {passage['text']}"
+        cost = estimate_tokens(part) + (separator_tokens if parts else 0)
+        if used + cost <= max_tokens:
+            parts.append(part)
+            used += cost
+        elif not parts:
+            cut = part[:max(0, max_tokens * 4 - 4)].rsplit(' ', 1)[0]
+            parts.append(cut + '...')
+            break
+    return separator.join(parts)
+
+
+def create_retriever(strategy: str, index_path: str = 'bible_vectors', verse_count: int = None,
+                     candidates: int = 20):
+    """Stratégie demandée; retour à la recherche plein texte si l'index vectoriel manque"""
+    if strategy == 'fts':
+        return FtsRetriever()
+    if strategy not in ('vector', 'hybrid'):
+        print(f"❌ Stratégie de recherche inconnue: {strategy} (fts, vector, hybrid); recherche plein texte utilisée")
+        return FtsRetriever()
+    try:
+        from bible_vectors import VerseVectorIndex
+
+        index = VerseVectorIndex(index_path)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"❌ Index vectoriel {index_path} indisponible ({e}); recherche plein texte utilisée")
+        return FtsRetriever()
+    if verse_count is not None and index.meta['verses'] != verse_count:
+        print(f"⚠️  Index vectoriel construit sur {index.meta['verses']} versets, base: {verse_count} "
+              f"(relancer python bible_vectors.py build)")
+    if strategy == 'hybrid':
+        return HybridRetriever([FtsRetriever(), VectorRetriever(index)], candidates)
+    return VectorRetriever(index)
+
+
+def create_bible_retriever(conn: sqlite3.Connection = None):
+    """Stratégie configurée par BIBLE_RETRIEVAL (fts, vector, hybrid), BIBLE_VECTOR_INDEX
+    et BIBLE_HYBRID_CANDIDATES (versets demandés à chaque stratégie avant la fusion)"""
+    strategy = os.getenv('BIBLE_RETRIEVAL', 'fts').lower()
+    verse_count = None
+    if conn is not None and strategy in ('vector', 'hybrid'):
+        try:
+            verse_count = conn.execute("SELECT count(*) FROM bible_verses").fetchone()[0]
+        except sqlite3.Error:
+            pass
+    return create_retriever(strategy, os.getenv('BIBLE_VECTOR_INDEX', 'bible_vectors'), verse_count,
+                            int(os.getenv('BIBLE_HYBRID_CANDIDATES', '20')))
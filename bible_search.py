@@ -0,0 +1,221 @@
+"""
+Recherche plein texte dans la base biblique (SQLite FTS5)
+L'index bible_verses_fts est maintenu par triggers à côté de bible_verses
+et interrogé par MATCH avec un classement BM25.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import weakref
+from pathlib import Path
+from typing import Dict, List
+
+from text_utils import STOP_WORDS, fold_accents
+
+# Tokenizer insensible aux accents: "prière", "priere" et "PRIÈRE" donnent le même terme.
+# Les apostrophes sont des séparateurs, donc "l'amour" est indexé comme "l" + "amour".
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# Poids BM25 des colonnes (text, reference): une référence qui correspond compte davantage
+BM25_WEIGHTS = (1.0, 4.0)
+
+VERSES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS bible_verses (
+    book TEXT NOT NULL,
+    chapter INTEGER NOT NULL,
+    verse INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    reference TEXT
+);
+"""
+
+SCHEMA_SQL = VERSES_TABLE_SQL + f"""
+
+-- Recherche par référence (bible_references.lookup_references): parcours d'intervalle
+-- de versets dans un chapitre au lieu d'un LIKE sur toute la table
+CREATE INDEX IF NOT EXISTS bible_verses_location ON bible_verses(book, chapter, verse);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS bible_verses_fts USING fts5(
+    text,
+    reference,
+    content='bible_verses',
+    content_rowid='rowid',
+    tokenize='{FTS_TOKENIZER}'
+);
+
+CREATE TRIGGER IF NOT EXISTS bible_verses_fts_ai AFTER INSERT ON bible_verses BEGIN
+    INSERT INTO bible_verses_fts(rowid, text, reference)
+    VALUES (new.rowid, new.text, new.reference);
+END;
+
+CREATE TRIGGER IF NOT EXISTS bible_verses_fts_ad AFTER DELETE ON bible_verses BEGIN
+    INSERT INTO bible_verses_fts(bible_verses_fts, rowid, text, reference)
+    VALUES ('delete', old.rowid, old.text, old.reference);
+END;
+
+CREATE TRIGGER IF NOT EXISTS bible_verses_fts_au AFTER UPDATE ON bible_verses BEGIN
+    INSERT INTO bible_verses_fts(bible_verses_fts, rowid, text, reference)
+    VALUES ('delete', old.rowid, old.text, old.reference);
+    INSERT INTO bible_verses_fts(rowid, text, reference)
+    VALUES (new.rowid, new.text, new.reference);
+END;
+"""
+
+SEARCH_SQL = f"""
+SELECT v.book, v.chapter, v.verse, v.text, v.reference
+FROM bible_verses_fts
+JOIN bible_verses AS v ON v.rowid = bible_verses_fts.rowid
+WHERE bible_verses_fts MATCH ?
+ORDER BY bm25(bible_verses_fts, {BM25_WEIGHTS[0]}, {BM25_WEIGHTS[1]})
+LIMIT ?
+"""
+
+
+def extract_keywords(question: str) -> List[str]:
+    """Extrait les mots-clés significatifs d'une question (minuscules, sans accents ni mots vides)"""
+    words = re.findall(r'\w+', fold_accents(question.lower()))
+    keywords = []
+    for word in words:
+        if word in STOP_WORDS or len(word) < 2 or word in keywords:
+            continue
+        keywords.append(word)
+    return keywords
+
+
+def build_match_query(keywords: List[str]) -> str:
+    """Construit une requête FTS5 MATCH (OR des termes, préfixes pour les flexions)"""
+    terms = []
+    for word in keywords:
+        # Préfixe pour couvrir pluriels et conjugaisons: "pardon" trouve "pardonnez"
+        stem = word[:-1] if len(word) > 4 and word[-1] in 'sx' else word
+        if len(stem) >= 4:
+            terms.append(f'"{stem}"*')
+        else:
+            terms.append(f'"{stem}"')
+    return ' OR '.join(terms)
+
+
+def ensure_fts_index(conn: sqlite3.Connection) -> None:
+    """Crée la table, les index (référence, FTS5) et les triggers, puis reconstruit l'index s'il est désynchronisé"""
+    # WAL est persistant dans le fichier: les lecteurs ne bloquent plus pendant un import
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA_SQL)
+    verses = conn.execute("SELECT count(*) FROM bible_verses").fetchone()[0]
+    indexed = conn.execute("SELECT count(*) FROM bible_verses_fts_docsize").fetchone()[0]
+    if verses != indexed:
+        conn.execute("INSERT INTO bible_verses_fts(bible_verses_fts) VALUES ('rebuild')")
+    conn.commit()
+
+
+class _ThreadConnection:
+    """Connexion d'un thread, rangée dans le threading.local du pool: quand le thread se
+    termine, l'objet est libéré et son finaliseur ferme la connexion"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.pid = os.getpid()
+
+
+class BibleConnectionPool:
+    """Connexions SQLite en lecture seule, une par thread vivant, réutilisées d'une requête à l'autre
+
+    Les threads de courte durée (serveur Flask, pools des lots et du préchargement) ne
+    laissent pas de connexion ouverte: elle est fermée à la fin du thread.
+    """
+
+    def __init__(self, db_path: str, immutable: bool = False,
+                 mmap_size: int = 256 * 1024 * 1024, cache_size_kb: int = 32 * 1024):
+        self.db_path = db_path
+        self.immutable = immutable
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _open(self) -> sqlite3.Connection:
+        uri = Path(os.path.abspath(self.db_path)).as_uri() + '?mode=ro'
+        if self.immutable:
+            # Aucun verrou ni contrôle de modification: uniquement pour une base figée (image Docker)
+            uri += '&immutable=1'
+        # Utilisée par un seul thread, mais fermée par close_all ou à la fin du thread
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only=1")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection, pid: int) -> None:
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        # Connexion héritée d'un fork: celle du parent n'est pas fermée depuis l'enfant
+        if pid == os.getpid():
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def get(self) -> sqlite3.Connection:
+        """Retourne la connexion du thread courant (ouverte à la demande, rouverte après un fork)"""
+        holder = getattr(self._local, 'holder', None)
+        if holder is None or holder.pid != os.getpid():
+            holder = _ThreadConnection(self._open())
+            weakref.finalize(holder, self._release, holder.conn, holder.pid)
+            self._local.holder = holder
+        return holder.conn
+
+    def discard(self) -> None:
+        """Ferme la connexion du thread courant (après une erreur ou un remplacement du fichier)"""
+        holder = getattr(self._local, 'holder', None)
+        self._local.holder = None
+        if holder is not None:
+            self._release(holder.conn, holder.pid)
+
+    def close_all(self) -> None:
+        """Ferme toutes les connexions ouvertes par ce processus"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+    def stats(self) -> Dict:
+        return {
+            'open_connections': len(self._connections),
+            'immutable': self.immutable,
+            'mmap_size': self.mmap_size,
+            'cache_size_kb': self.cache_size_kb
+        }
+
+
+def search_verses(conn: sqlite3.Connection, question: str, limit: int = 5) -> Dict:
+    """Recherche les versets les plus pertinents (classement BM25)"""
+    keywords = extract_keywords(question)
+    if not keywords:
+        return {'passages': [], 'keywords_found': [], 'total_results': 0}
+
+    rows = conn.execute(SEARCH_SQL, (build_match_query(keywords), limit)).fetchall()
+
+    passages = []
+    for row in rows:
+        passages.append({
+            'book': row[0],
+            'chapter': row[1],
+            'verse': row[2],
+            'text': row[3],
+            'reference': row[4]
+        })
+
+    return {
+        'passages': passages,
+        'keywords_found': keywords,
+        'total_results': len(passages)
+    }
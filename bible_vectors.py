@@ -0,0 +1,197 @@
+"""
+Index vectoriel des versets de bible_verses (NumPy, projeté en mémoire)
+Les embeddings sont calculés hors ligne (python bible_vectors.py build) et écrits en
+float16 ou int8 dans des fichiers .npy ouverts en mmap: tous les workers partagent la
+même copie dans le cache de pages du système. La recherche est un produit scalaire
+par blocs, pour plusieurs questions à la fois, avec sélection des k meilleurs.
+
+Fichiers d'un index (préfixe bible_vectors par défaut):
+- bible_vectors.npy: matrice (versets x dim), float16 ou int8
+- bible_vectors.scales.npy: facteur de chaque ligne (int8 seulement)
+- bible_vectors.rowids.npy: rowid de bible_verses de chaque ligne
+- bible_vectors.json: embedder, dimension, type, nombre de versets
+
+Lancement: python bible_vectors.py build [--db bible_database.db] [--dtype int8|float16] [--model nom]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from semantic_cache import HashingEmbedder, SentenceTransformerEmbedder
+
+DTYPES = ('float16', 'int8')
+
+# Lignes de la matrice converties en float32 à la fois pendant une recherche (reste dans le cache CPU)
+SEARCH_BLOCK_ROWS = 2048
+
+
+def index_paths(prefix: str) -> Dict[str, str]:
+    return {
+        'vectors': f"{prefix}.npy",
+        'scales': f"{prefix}.scales.npy",
+        'rowids': f"{prefix}.rowids.npy",
+        'meta': f"{prefix}.json"
+    }
+
+
+def create_embedder(meta: Dict):
+    """Embedder décrit par les métadonnées d'un index (le même qu'à la construction)"""
+    if meta['embedder'] == 'sentence-transformers':
+        return SentenceTransformerEmbedder(meta['model'])
+    return HashingEmbedder(dim=meta['dim'])
+
+
+def describe_embedder(embedder) -> Dict:
+    if isinstance(embedder, SentenceTransformerEmbedder):
+        return {'embedder': 'sentence-transformers', 'model': embedder.model_name, 'dim': embedder.dim}
+    return {'embedder': 'hashing', 'dim': embedder.dim}
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """float16 tel quel; int8 symétrique par ligne (valeur = q * scale)"""
+    if dtype == 'float16':
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+class VerseVectorIndex:
+    """Matrice d'embeddings des versets ouverte en lecture seule (mmap)"""
+
+    def __init__(self, prefix: str):
+        paths = index_paths(prefix)
+        with open(paths['meta'], encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.prefix = prefix
+        self.vectors = np.load(paths['vectors'], mmap_mode='r')
+        self.rowids = np.load(paths['rowids'], mmap_mode='r')
+        self.scales = np.load(paths['scales'], mmap_mode='r') if self.meta['dtype'] == 'int8' else None
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def search(self, queries: np.ndarray, k: int = 10) -> List[List[Tuple[int, float]]]:
+        """k versets les plus proches de chaque question: [(rowid, score)], score décroissant"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, len(self))
+        if k <= 0:
+            return [[] for _ in queries]
+
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self), SEARCH_BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            scores = queries @ block.T
+            if self.scales is not None:
+                scores *= self.scales[start:start + SEARCH_BLOCK_ROWS]
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(
+                np.arange(start, start + block.shape[0]), (len(queries), block.shape[0]))], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_scores, best_rows = scores, rows
+
+        order = np.argsort(-best_scores, axis=1)
+        results = []
+        for query_scores, query_rows, query_order in zip(best_scores, best_rows, order):
+            results.append([(int(self.rowids[query_rows[i]]), float(query_scores[i])) for i in query_order])
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            'path': self.prefix,
+            'verses': len(self),
+            'dim': self.vectors.shape[1],
+            'dtype': self.meta['dtype'],
+            'embedder': self.meta['embedder'],
+            'size_mb': round(self.vectors.nbytes / 1024 / 1024, 1)
+        }
+
+
+def build_index(conn: sqlite3.Connection, embedder, prefix: str, dtype: str = 'int8',
+                batch_size: int = 512) -> Dict:
+    """Calcule les embeddings de tous les versets (par lots) et écrit l'index"""
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype inconnu: {dtype} (attendu: {', '.join(DTYPES)})")
+    started = time.monotonic()
+    paths = index_paths(prefix)
+    count = conn.execute("SELECT count(*) FROM bible_verses").fetchone()[0]
+
+    # Écriture directe dans les fichiers: la matrice complète n'est jamais en mémoire
+    vectors = np.lib.format.open_memmap(paths['vectors'] + '.tmp', mode='w+',
+                                        dtype=np.dtype(dtype), shape=(count, embedder.dim))
+    scales = np.ones(count, dtype=np.float32)
+    rowids = np.zeros(count, dtype=np.int64)
+
+    cursor = conn.execute("SELECT rowid, text FROM bible_verses ORDER BY rowid")
+    row = 0
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        quantized, batch_scales = quantize(embedder.embed([text for _, text in batch]), dtype)
+        vectors[row:row + len(batch)] = quantized
+        if batch_scales is not None:
+            scales[row:row + len(batch)] = batch_scales
+        rowids[row:row + len(batch)] = [rowid for rowid, _ in batch]
+        row += len(batch)
+    vectors.flush()
+    del vectors
+
+    meta = dict(describe_embedder(embedder), dtype=dtype, verses=count)
+    np.save(paths['rowids'], rowids)
+    if dtype == 'int8':
+        np.save(paths['scales'], scales)
+    elif os.path.exists(paths['scales']):
+        os.remove(paths['scales'])
+    os.replace(paths['vectors'] + '.tmp', paths['vectors'])
+    with open(paths['meta'], 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return dict(meta, duration_s=round(time.monotonic() - started, 2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="calculer l'index des versets")
+    build.add_argument('--db', default=os.getenv('BIBLE_DB_PATH', 'bible_database.db'))
+    build.add_argument('--output', default=os.getenv('BIBLE_VECTOR_INDEX', 'bible_vectors'))
+    build.add_argument('--dtype', choices=DTYPES, default='int8',
+                       help="int8: deux fois plus petit et plus rapide à parcourir; float16: plus précis")
+    build.add_argument('--model', default=os.getenv('BIBLE_VECTOR_MODEL'),
+                       help="modèle sentence-transformers (sinon: embeddings par hachage)")
+    build.add_argument('--dim', type=int, default=1024, help="dimension des embeddings par hachage")
+    query = subparsers.add_parser('query', help="chercher les versets proches d'une question")
+    query.add_argument('question')
+    query.add_argument('--db', default=os.getenv('BIBLE_DB_PATH', 'bible_database.db'))
+    query.add_argument('--index', default=os.getenv('BIBLE_VECTOR_INDEX', 'bible_vectors'))
+    query.add_argument('-k', type=int, default=5)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    if args.command == 'build':
+        embedder = SentenceTransformerEmbedder(args.model) if args.model else HashingEmbedder(dim=args.dim)
+        report = build_index(conn, embedder, args.output, args.dtype)
+        print(f"✅ {report['verses']} versets indexés ({report['embedder']}, {report['dim']} dimensions, "
+              f"{report['dtype']}) en {report['duration_s']}s -> {args.output}.npy")
+    else:
+        index = VerseVectorIndex(args.index)
+        embedder = create_embedder(index.meta)
+        for rowid, score in index.search(embedder.embed([args.question]), args.k)[0]:
+            reference, text = conn.execute(
+                "SELECT reference, text FROM bible_verses WHERE rowid = ?", (rowid,)).fetchone()
+            print(f"{score:.3f}  {reference}: {text}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""
+Routage des questions entre fournisseurs LLM (Claude, GPT-4o)
+Le fournisseur principal est appelé en premier; si sa réponse tarde au-delà du
+délai de couverture (fixe, ou p95 de ses latences récentes), le suivant est lancé
+en parallèle et la première réponse valide l'emporte. Un échec déclenche le
+suivant immédiatement. Chaque fournisseur a son délai maximal et son disjoncteur.
+Tant que les latences ne sont pas assez nombreuses pour estimer le p95, la
+couverture n'est pas utilisée (sauf délai par défaut configuré): un perdant
+synchrone n'est pas interrompu et ses tokens seraient payés deux fois.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from resilience import CircuitBreaker, LatencyTracker
+
+
+class Provider:
+    """Fournisseur LLM: fonction d'appel (synchrone et/ou asynchrone), délai et disjoncteur"""
+
+    def __init__(self, name: str, call: Optional[Callable] = None, acall: Optional[Callable] = None,
+                 timeout: float = 30, breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.call = call
+        self.acall = acall
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.wins = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def stats(self) -> Dict:
+        return {
+            'timeout': self.timeout,
+            'calls': self.calls,
+            'wins': self.wins,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'latency': self.latency.stats(),
+            'breaker': self.breaker.stats()
+        }
+
+
+class _Call:
+    """Appel synchrone: horodaté quand un thread du pool commence à l'exécuter, pour que
+    l'attente dans la file ne compte ni dans le délai maximal ni dans les latences"""
+
+    def __init__(self, provider: Provider):
+        self.provider = provider
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def started_or(self, now: float) -> float:
+        return self.started if self.started is not None else now
+
+
+class LLMRouter:
+    """Couverture (hedging) entre fournisseurs, dans l'ordre de priorité"""
+
+    def __init__(self, providers: List[Provider], hedge_delay: Optional[float] = None,
+                 hedge_percentile: float = 0.95, default_hedge_delay: Optional[float] = None,
+                 min_hedge_delay: float = 0.5, min_samples: int = 20, max_workers: int = 32):
+        self.providers = providers
+        self.hedge_delay = hedge_delay  # None: délai dérivé des latences du fournisseur principal
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay  # avant min_samples latences; None: pas de couverture
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+        self.hedged = 0
+        self.shed = 0
+        self._inflight = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-router')
+
+    def _hedge_after(self, provider: Provider) -> Optional[float]:
+        """Délai avant de lancer le fournisseur suivant en parallèle (None: pas de couverture)"""
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        if len(provider.latency) < self.min_samples:
+            if self.default_hedge_delay is None:
+                return None
+            return min(self.default_hedge_delay, provider.timeout)
+        delay = max(provider.latency.percentile(self.hedge_percentile), self.min_hedge_delay)
+        return min(delay, provider.timeout)
+
+    def _next_provider(self, queue: List[Provider], attr: str) -> Optional[Provider]:
+        # Saute les fournisseurs sans fonction d'appel adaptée ou dont le disjoncteur est ouvert
+        while queue:
+            provider = queue.pop(0)
+            if getattr(provider, attr) is not None and provider.breaker.allow_request():
+                return provider
+        return None
+
+    def _succeeded(self, provider: Provider, started: float, response: Dict, attempts: int, hedged: bool) -> Dict:
+        provider.breaker.record_success()
+        provider.latency.record(time.monotonic() - started)
+        provider.wins += 1
+        response['routing'] = {'provider': provider.name, 'hedged': hedged, 'attempts': attempts}
+        return response
+
+    def _record_late(self, call: _Call, future) -> None:
+        """Latence d'un perdant abandonné qui finit par répondre: ne garder que les gagnants
+        tirerait le p95 (donc le délai de couverture) vers le bas"""
+        if not future.cancelled() and future.exception() is None:
+            call.provider.latency.record(call.finished - call.started)
+
+    def _run(self, call: _Call, question: str, context: str) -> Dict:
+        call.started = time.monotonic()
+        try:
+            return call.provider.call(question, context)
+        finally:
+            call.finished = time.monotonic()
+            with self._lock:
+                self._inflight -= 1
+
+    def _failed(self, provider: Provider, errors: List[str], error: str, timed_out: bool = False) -> None:
+        provider.breaker.record_failure()
+        provider.failures += 1
+        if timed_out:
+            provider.timeouts += 1
+        errors.append(f"{provider.name}: {error}")
+
+    def ask(self, question: str, context: str) -> Dict:
+        """Appels synchrones (threads); les perdants sont abandonnés et leur résultat ignoré
+
+        Quand les max_workers threads sont tous occupés, aucun appel n'est mis en file:
+        la requête échoue tout de suite (et la couverture est sautée) plutôt que de
+        compter l'attente locale comme une lenteur du fournisseur.
+        """
+        queue = list(self.providers)
+        pending = {}  # future -> _Call
+        errors = []
+        attempts = 0
+        hedged = False
+
+        def launch() -> bool:
+            nonlocal attempts
+            with self._lock:
+                if self._inflight >= self.max_workers:
+                    self.shed += 1
+                    errors.append(f"routeur saturé ({self.max_workers} appels en cours)")
+                    return False
+                provider = self._next_provider(queue, 'call')
+                if provider is None:
+                    return False
+                self._inflight += 1
+            provider.calls += 1
+            attempts += 1
+            call = _Call(provider)
+            # Contexte copié: les mesures faites dans le thread (metrics.timed_stage) restent
+            # rattachées à la requête
+            run = contextvars.copy_context().run
+            pending[self._executor.submit(run, self._run, call, question, context)] = call
+            return True
+
+        if not launch():
+            raise Exception("; ".join(errors) or "Aucun LLM disponible")
+        delay = self._hedge_after(next(iter(pending.values())).provider)
+        hedge_at = time.monotonic() + delay if delay is not None else None
+
+        while pending:
+            now = time.monotonic()
+            wake_at = min(call.started_or(now) + call.provider.timeout for call in pending.values())
+            if hedge_at is not None and queue:
+                wake_at = min(wake_at, hedge_at)
+            done, _ = wait(list(pending), timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                call = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    self._failed(call.provider, errors, str(e))
+                    # Échec: le fournisseur suivant part tout de suite
+                    if not pending:
+                        launch()
+                    continue
+                for other, loser in pending.items():
+                    other.cancel()
+                    loser.provider.breaker.release_trial()
+                    # Déjà en cours: le thread continue, sa latence est relevée à la fin
+                    other.add_done_callback(lambda f, loser=loser: self._record_late(loser, f))
+                return self._succeeded(call.provider, call.started, response, attempts, hedged)
+
+            now = time.monotonic()
+            for future, call in list(pending.items()):
+                if now >= call.started_or(now) + call.provider.timeout:
+                    del pending[future]
+                    future.cancel()
+                    self._failed(call.provider, errors, f"délai de {call.provider.timeout}s dépassé", timed_out=True)
+            if hedge_at is not None and now >= hedge_at and queue:
+                hedge_at = None
+                if launch():
+                    hedged = True
+                    self.hedged += 1
+            if not pending:
+                launch()
+
+        raise Exception("; ".join(errors) or "Aucun LLM disponible")
+
+    async def ask_async(self, question: str, context: str) -> Dict:
+        """Appels asynchrones; le perdant est réellement annulé"""
+        queue = list(self.providers)
+        pending = {}  # tâche -> (fournisseur, début)
+        errors = []
+        attempts = 0
+        hedged = False
+
+        def launch() -> bool:
+            nonlocal attempts
+            provider = self._next_provider(queue, 'acall')
+            if provider is None:
+                return False
+            provider.calls += 1
+            attempts += 1
+            task = asyncio.ensure_future(provider.acall(question, context))
+            pending[task] = (provider, time.monotonic())
+            return True
+
+        if not launch():
+            raise Exception("Aucun LLM disponible")
+        delay = self._hedge_after(next(iter(pending.values()))[0])
+        hedge_at = time.monotonic() + delay if delay is not None else None
+
+        try:
+            while pending:
+                now = time.monotonic()
+                wake_at = min(started + provider.timeout for provider, started in pending.values())
+                if hedge_at is not None and queue:
+                    wake_at = min(wake_at, hedge_at)
+                done, _ = await asyncio.wait(list(pending), timeout=max(0.0, wake_at - now),
+                                             return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    provider, started = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        self._failed(provider, errors, str(e))
+                        if not pending:
+                            launch()
+                        continue
+                    # Perdants annulés: leur durée jusqu'ici est un minorant de leur latence,
+                    # gardé pour que le p95 ne soit pas calculé sur les seuls gagnants
+                    now = time.monotonic()
+                    for loser, loser_started in pending.values():
+                        loser.latency.record(now - loser_started)
+                    return self._succeeded(provider, started, response, attempts, hedged)
+
+                now = time.monotonic()
+                for task, (provider, started) in list(pending.items()):
+                    if now >= started + provider.timeout:
+                        del pending[task]
+                        task.cancel()
+                        self._failed(provider, errors, f"délai de {provider.timeout}s dépassé", timed_out=True)
+                if hedge_at is not None and now >= hedge_at and queue:
+                    hedge_at = None
+                    if launch():
+                        hedged = True
+                        self.hedged += 1
+                if not pending:
+                    launch()
+        finally:
+            # Annule le ou les perdants (et tout appel restant si la requête est annulée)
+            for task, (loser, _) in pending.items():
+                task.cancel()
+                loser.breaker.release_trial()
+
+        raise Exception("; ".join(errors) or "Aucun LLM disponible")
+
+    def stats(self) -> Dict:
+        return {
+            'hedge_delay': self.hedge_delay if self.hedge_delay is not None else f"p{int(self.hedge_percentile * 100)}",
+            'hedged': self.hedged,
+            'inflight': self._inflight,
+            'shed': self.shed,
+            'providers': {provider.name: provider.stats() for provider in self.providers}
+        }
+
+
+class FakeLLMProvider:
+    """Fournisseur simulé (latence, erreur) pour tester le routage hors ligne"""
+
+    def __init__(self, name: str, latency: float = 0.0, error: Optional[str] = None):
+        self.name = name
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    def _response(self, question: str, context: str) -> Dict:
+        if self.error:
+            raise Exception(self.error)
+        return {
+            "answer": f"[{self.name}] {question}",
+            "model": self.name,
+            "confidence": 0.5,
+            "sources": [context],
+            "bible_references": [],
+            "context_used": context
+        }
+
+    def __call__(self, question: str, context: str) -> Dict:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._response(question, context)
+
+    async def acall(self, question: str, context: str) -> Dict:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self._response(question, context)
@@ -0,0 +1,156 @@
+"""
+Métriques de latence au format texte Prometheus (sans dépendance)
+- histogrammes de durée par étape du traitement (cache, base, prompt, LLM, références,
+  sérialisation, scraper, proxy RAG) et par route HTTP, exportés par /metrics
+- chronomètre de requête (StageTimer) porté par un contextvar: les étapes mesurées dans
+  asyncio.to_thread ou dans les threads du routeur LLM s'ajoutent au détail de la requête
+
+Chaque processus a ses propres compteurs: avec plusieurs workers, /metrics décrit le
+worker qui répond et Prometheus agrège les séries.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Bornes en secondes: de l'accès au cache (ms) à l'appel LLM (dizaines de secondes)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """Histogramme cumulatif par combinaison d'étiquettes"""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # étiquettes -> [comptes par borne, somme, nombre]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in series:
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key))
+            prefix = f"{labels}," if labels else ''
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            suffix = f"{{{labels}}}" if labels else ''
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Histogramme existant de ce nom, sinon nouvellement enregistré"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, documentation, label_names, buckets)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'assistant_stage_duration_seconds', "Durée de chaque étape du traitement d'une requête", ('stage',))
+REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', "Durée des requêtes HTTP", ('route', 'method', 'status'))
+
+
+class StageTimer:
+    """Durées cumulées des étapes d'une requête (plusieurs threads peuvent y écrire)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def breakdown(self) -> Dict[str, float]:
+        """Durées en millisecondes par étape, et total depuis le début de la requête"""
+        with self._lock:
+            timings = {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()}
+        timings['total'] = round(self.elapsed() * 1000, 2)
+        return timings
+
+
+_current_timer: ContextVar[Optional[StageTimer]] = ContextVar('stage_timer', default=None)
+
+
+def start_timer(timer: Optional[StageTimer] = None) -> StageTimer:
+    """Chronomètre de la requête en cours: nouveau, ou timer repris (réponse en flux,
+    dont le générateur s'exécute dans un autre contexte que la vue)"""
+    timer = timer or StageTimer()
+    _current_timer.set(timer)
+    return timer
+
+
+def current_timer() -> Optional[StageTimer]:
+    return _current_timer.get()
+
+
+def stop_timer() -> None:
+    _current_timer.set(None)
+
+
+@contextmanager
+def timed_stage(stage: str):
+    """Mesure un bloc (ou une fonction, en décorateur) dans l'histogramme et la requête en cours"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        STAGE_SECONDS.observe(duration, stage=stage)
+        timer = _current_timer.get()
+        if timer is not None:
+            timer.add(stage, duration)
+
+
+def server_timing(breakdown: Dict[str, float]) -> str:
+    """En-tête Server-Timing (affiché par les outils de développement des navigateurs)"""
+    return ', '.join(f"{stage};dur={duration}" for stage, duration in breakdown.items())
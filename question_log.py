@@ -0,0 +1,107 @@
+"""
+Journal des questions posées à l'assistant
+Compte les questions par forme normalisée (et contexte) dans un fichier SQLite, pour
+retrouver les plus fréquentes (préchargement du cache, voir warmup.py). Les compteurs
+sont accumulés en mémoire et écrits par paquets pour ne pas ralentir les requêtes.
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from text_utils import normalize_question
+
+
+class QuestionLog:
+    """Compteurs de questions persistés dans SQLite, écrits tous les flush_every appels"""
+
+    def __init__(self, db_path: str, flush_every: int = 20):
+        self.db_path = db_path
+        self.flush_every = flush_every
+        self._pending = Counter()  # (forme normalisée, contexte) -> nombre
+        self._phrasing = {}  # (forme normalisée, contexte) -> question telle que posée
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connection().execute("""
+            CREATE TABLE IF NOT EXISTS question_log (
+                normalized TEXT NOT NULL,
+                context TEXT NOT NULL,
+                question TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                last_asked REAL NOT NULL,
+                PRIMARY KEY (normalized, context)
+            )
+        """)
+        atexit.register(self.flush)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def record(self, question: str, context: str = "general") -> None:
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        key = (normalized, context.strip().lower())
+        with self._lock:
+            self._pending[key] += 1
+            self._phrasing.setdefault(key, question)
+            should_flush = sum(self._pending.values()) >= self.flush_every
+        if should_flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """Écrit les compteurs en attente (une transaction)"""
+        with self._lock:
+            pending, phrasing = self._pending, self._phrasing
+            self._pending, self._phrasing = Counter(), {}
+        if not pending:
+            return
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany("""
+                INSERT INTO question_log (normalized, context, question, count, last_asked)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (normalized, context)
+                DO UPDATE SET count = count + excluded.count, last_asked = excluded.last_asked
+            """, [(normalized, context, phrasing[(normalized, context)], count, now)
+                  for (normalized, context), count in pending.items()])
+
+    def top(self, limit: int = 50) -> List[Tuple[str, str, int]]:
+        """Questions les plus fréquentes: (question, contexte, nombre)"""
+        self.flush()
+        return self._connection().execute(
+            "SELECT question, context, count FROM question_log ORDER BY count DESC, last_asked DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+
+    def stats(self) -> Dict:
+        row = self._connection().execute("SELECT count(*), coalesce(sum(count), 0) FROM question_log").fetchone()
+        return {
+            'path': self.db_path,
+            'distinct_questions': row[0],
+            'total_questions': row[1] + sum(self._pending.values())
+        }
+
+
+def create_question_log():
+    """Journal configuré par QUESTION_LOG_ENABLED / QUESTION_LOG_PATH (None si désactivé)
+
+    Désactivé par défaut: les questions des utilisateurs ne sont écrites sur disque
+    qu'avec QUESTION_LOG_ENABLED=true.
+    """
+    if os.getenv('QUESTION_LOG_ENABLED', 'false').lower() != 'true':
+        return None
+    return QuestionLog(os.getenv('QUESTION_LOG_PATH', 'question_log.db'))
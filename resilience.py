@@ -0,0 +1,150 @@
+"""
+Briques de résilience pour les appels aux services externes (LLM, RAG)
+- LatencyTracker: fenêtre glissante des latences observées et percentiles
+- CircuitBreaker: disjoncteur fermé / ouvert / semi-ouvert
+- AdaptiveTimeout: délai d'attente dérivé des latences observées
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+
+class LatencyTracker:
+    """Latences récentes (en secondes) sur une fenêtre glissante"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Percentile p (entre 0 et 1) des latences, None sans mesure"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(p * (len(samples) - 1)))))
+        return samples[index]
+
+    def stats(self) -> Dict:
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            'samples': len(self._samples),
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None
+        }
+
+
+class CircuitBreaker:
+    """Disjoncteur: s'ouvre après N échecs consécutifs, puis laisse passer un essai après un délai"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_progress = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Indique si un appel peut partir; en semi-ouvert, un seul appel d'essai à la fois"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_progress = False
+
+    def release_trial(self) -> None:
+        """Libère l'essai semi-ouvert d'un appel abandonné sans résultat"""
+        with self._lock:
+            self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            state = self._current_state()
+            if state == self.HALF_OPEN or (state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_progress = False
+                self.trips += 1
+
+    def stats(self) -> Dict:
+        return {
+            'state': self.state,
+            'consecutive_failures': self._failures,
+            'trips': self.trips,
+            'rejected': self.rejected
+        }
+
+
+class AdaptiveTimeout:
+    """Délai d'attente = multiplicateur × percentile des latences réussies, borné
+
+    Tant qu'il y a moins de min_samples mesures, le délai maximal est utilisé.
+    """
+
+    def __init__(self, max_timeout: float, min_timeout: float = 1.0, percentile: float = 0.99,
+                 multiplier: float = 2.0, min_samples: int = 20, window: int = 200):
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.latency = LatencyTracker(window)
+
+    def record(self, seconds: float) -> None:
+        self.latency.record(seconds)
+
+    def current(self) -> float:
+        if len(self.latency) < self.min_samples:
+            return self.max_timeout
+        timeout = self.latency.percentile(self.percentile) * self.multiplier
+        return min(self.max_timeout, max(self.min_timeout, timeout))
+
+    def stats(self) -> Dict:
+        return {
+            'current': round(self.current(), 3),
+            'max': self.max_timeout,
+            'min': self.min_timeout,
+            'percentile': self.percentile,
+            'multiplier': self.multiplier,
+            'latency': self.latency.stats()
+        }
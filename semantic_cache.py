@@ -0,0 +1,129 @@
+"""
+Cache sémantique des réponses de l'assistant biblique
+Les questions sont projetées en vecteurs localement (sans appel réseau) et une
+réponse déjà générée est réutilisée quand la similarité cosinus dépasse un seuil.
+"""
+
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from text_utils import normalize_question
+
+
+class HashingEmbedder:
+    """Vectorisation par hachage des mots et trigrammes de caractères (CPU, sans modèle)"""
+
+    def __init__(self, dim: int = 1024, ngram: int = 3, ngram_weight: float = 0.5):
+        self.dim = dim
+        self.ngram = ngram
+        self.ngram_weight = ngram_weight
+
+    def _features(self, question: str) -> List[Tuple[str, float]]:
+        features = []
+        for word in normalize_question(question).split():
+            # Pluriel ramené au singulier: "pardons" -> "pardon"
+            if len(word) > 4 and word[-1] in 'sx':
+                word = word[:-1]
+            features.append((f"w:{word}", 1.0))
+            # Les trigrammes rapprochent les flexions: "pardon", "pardonner", "pardonnez"
+            padded = f"<{word}>"
+            for i in range(len(padded) - self.ngram + 1):
+                features.append((f"c:{padded[i:i + self.ngram]}", self.ngram_weight))
+        return features
+
+    def embed(self, questions: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(questions), self.dim), dtype=np.float32)
+        for row, question in enumerate(questions):
+            for feature, weight in self._features(question):
+                # crc32 plutôt que hash(): identique d'un worker à l'autre
+                h = zlib.crc32(feature.encode('utf-8'))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                vectors[row, h % self.dim] += sign * weight
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class SentenceTransformerEmbedder:
+    """Modèle d'embeddings local (sentence-transformers), exécuté sur CPU"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer  # dépendance optionnelle
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, questions: List[str]) -> np.ndarray:
+        vectors = self.model.encode(questions, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class SemanticCache:
+    """Réponses indexées par vecteur de question; matrice NumPy en anneau de taille fixe"""
+
+    def __init__(self, embedder=None, threshold: float = 0.9, max_entries: int = 1000, ttl: float = 3600):
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._vectors = np.zeros((max_entries, self.embedder.dim), dtype=np.float32)
+        self._entries = [None] * max_entries  # (contexte, réponse, expiration)
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def lookup(self, question: str, context: str) -> Optional[Tuple[Dict, float]]:
+        """Retourne (réponse, similarité) de la question la plus proche au-delà du seuil"""
+        vector = self.embedder.embed([question])[0]
+        now = time.time()
+        with self._lock:
+            if self._size:
+                similarities = self._vectors[:self._size] @ vector
+                for index in np.argsort(-similarities):
+                    similarity = float(similarities[index])
+                    if similarity < self.threshold:
+                        break
+                    entry_context, response, expires_at = self._entries[index]
+                    if entry_context == context and expires_at > now:
+                        self.hits += 1
+                        return dict(response), similarity
+            self.misses += 1
+        return None
+
+    def add(self, question: str, context: str, response: Dict) -> None:
+        vector = self.embedder.embed([question])[0]
+        with self._lock:
+            # Remplace l'entrée la plus ancienne quand la matrice est pleine
+            index = self._next
+            self._vectors[index] = vector
+            self._entries[index] = (context, dict(response), time.time() + self.ttl)
+            self._next = (index + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._vectors[:] = 0
+            self._entries = [None] * self.max_entries
+            self._next = 0
+            self._size = 0
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': self._size,
+            'max_entries': self.max_entries,
+            'threshold': self.threshold,
+            'embedder': type(self.embedder).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
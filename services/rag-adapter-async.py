@@ -0,0 +1,248 @@
+"""
+Adaptateur asynchrone (ASGI) pour le système RAG FastAPI
+Mêmes routes et mêmes réponses que rag-adapter.py; les appels au RAG passent par
+un client HTTP asynchrone partagé au lieu de bloquer un thread par requête.
+
+Lancement: python3 services/rag-adapter-async.py
+"""
+
+import asyncio
+import importlib
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from quart import Quart, g, request, jsonify
+from quart_cors import cors
+
+# Réutilise la configuration et le formatage de l'adaptateur synchrone
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+rag_adapter = importlib.import_module('rag-adapter')
+from metrics import CONTENT_TYPE, REQUEST_SECONDS, registry, server_timing, start_timer, stop_timer, timed_stage
+
+RAG_API_URL = rag_adapter.RAG_API_URL
+RAG_TIMEOUT = rag_adapter.RAG_TIMEOUT
+FALLBACK_ENABLED = rag_adapter.FALLBACK_ENABLED
+
+app = cors(Quart(__name__))
+
+# Client HTTP partagé (keep-alive vers le RAG), créé au démarrage du serveur
+http_client: Optional[httpx.AsyncClient] = None
+
+@app.before_serving
+async def open_http_client():
+    global http_client
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)
+    )
+    # La sonde de santé tourne dans son propre thread (session synchrone partagée)
+    rag_adapter.health_monitor.start()
+
+@app.after_serving
+async def close_http_client():
+    await http_client.aclose()
+
+async def call_rag_api_async(question: str) -> Optional[Dict]:
+    """Appelle le système RAG FastAPI sans bloquer (même disjoncteur et délai adaptatif)"""
+    if rag_adapter.health_monitor.is_down():
+        return None
+    if not rag_adapter.rag_breaker.allow_request():
+        return None
+
+    started = time.monotonic()
+    try:
+        with timed_stage('rag'):
+            response = await http_client.post(
+                f"{RAG_API_URL}/api/v1/chatbot/query",
+                json={"question": question},
+                timeout=rag_adapter.rag_timeout.current()
+            )
+    except httpx.HTTPError as e:
+        rag_adapter.rag_breaker.record_failure()
+        print(f"❌ Erreur de connexion au RAG: {e}")
+        return None
+    except BaseException:
+        # Appel abandonné (client déconnecté, annulation): l'essai semi-ouvert du disjoncteur
+        # est libéré, sinon il resterait pris et bloquerait tous les appels suivants
+        rag_adapter.rag_breaker.release_trial()
+        raise
+
+    if response.is_success:
+        rag_adapter.rag_breaker.record_success()
+        rag_adapter.rag_timeout.record(time.monotonic() - started)
+        return response.json()
+
+    if response.status_code >= 500:
+        rag_adapter.rag_breaker.record_failure()
+    else:
+        rag_adapter.rag_breaker.record_success()
+    print(f"❌ RAG API error: {response.status_code} - {response.text}")
+    return None
+
+async def ask_rag_async(question: str) -> Tuple[Optional[Dict], Dict]:
+    """Équivalent asynchrone de ask_rag (même cache)"""
+    key = rag_adapter.get_rag_cache_key(question)
+    # Les backends SQLite et Redis sont synchrones: exécutés dans le pool de threads
+    with timed_stage('cache'):
+        rag_data = await asyncio.to_thread(rag_adapter.rag_cache.get, key)
+    if rag_data is not None:
+        return rag_data, {'hit': True, 'source': 'exact'}
+
+    rag_data = await call_rag_api_async(question)
+    if rag_data:
+        await asyncio.to_thread(rag_adapter.rag_cache.set, key, rag_data)
+    return rag_data, {'hit': False, 'source': None}
+
+@app.route('/api/assistant/query', methods=['POST'])
+async def assistant_query():
+    """Endpoint compatible avec l'app mobile - appelle le RAG FastAPI"""
+    try:
+        data = await request.get_json()
+        question = data.get('question', '').strip()
+
+        if not question:
+            return jsonify({'error': 'Question requise'}), 400
+
+        if len(question) < 5:
+            return jsonify({'error': 'Question trop courte'}), 400
+
+        rag_data, cache = await ask_rag_async(question)
+
+        if rag_data:
+            return jsonify(rag_adapter.format_response(rag_data, question, cache))
+        else:
+            return jsonify(rag_adapter.build_unavailable_response()), 503
+
+    except Exception as e:
+        return jsonify({
+            'error': 'Erreur interne du serveur',
+            'message': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+async def answer_batch_async(questions: List[str]) -> Dict:
+    """Équivalent asynchrone de answer_batch (au plus BATCH_CONCURRENCY appels au RAG à la fois)"""
+    keys, unique = rag_adapter.group_batch(questions)
+    answers = {}
+    misses = []
+    for key, question in unique.items():
+        with timed_stage('cache'):
+            rag_data = await asyncio.to_thread(rag_adapter.rag_cache.get, key)
+        if rag_data is not None:
+            answers[key] = (rag_data, {'hit': True, 'source': 'exact'})
+        else:
+            misses.append((key, question))
+
+    semaphore = asyncio.Semaphore(rag_adapter.BATCH_CONCURRENCY)
+
+    async def ask(question: str) -> Tuple[Optional[Dict], Dict]:
+        async with semaphore:
+            return await ask_rag_async(question)
+
+    responses = await asyncio.gather(*(ask(question) for _, question in misses))
+    for (key, _), answer in zip(misses, responses):
+        answers[key] = answer
+
+    return rag_adapter.build_batch_response(questions, keys, answers, len(misses))
+
+@app.route('/api/assistant/query/batch', methods=['POST'])
+async def assistant_query_batch():
+    """Plusieurs questions en une requête (outils d'administration, préchargement du cache)"""
+    try:
+        questions = rag_adapter.parse_batch_request(await request.get_json())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        return jsonify(await answer_batch_async(questions))
+    except Exception as e:
+        return jsonify({
+            'error': 'Erreur interne du serveur',
+            'message': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+@app.route('/api/assistant/suggestions', methods=['GET'])
+async def get_suggestions():
+    """Suggestions de questions - compatible avec l'app mobile"""
+    return jsonify({
+        "suggestions": rag_adapter.SUGGESTIONS,
+        "timestamp": datetime.now().isoformat()
+    })
+
+@app.route('/api/assistant/stats', methods=['GET'])
+async def get_stats():
+    """Statistiques de l'assistant (servies depuis la sonde, sans appel au RAG)"""
+    # Compte SQLite du cache (backend sqlite): dans le pool de threads
+    return jsonify(await asyncio.to_thread(rag_adapter.build_stats))
+
+@app.route('/api/text-of-the-day', methods=['GET'])
+async def text_of_the_day():
+    """Endpoint pour les textes du jour - délégué au RAG"""
+    try:
+        timezone = request.args.get('tz', 'Europe/Paris')
+        response = await http_client.get(
+            f"{RAG_API_URL}/api/v1/text-of-the-day",
+            params={"tz": timezone},
+            timeout=10
+        )
+
+        if response.is_success:
+            return jsonify(response.json())
+        return jsonify({"error": "Service de textes du jour indisponible"}), 503
+    except Exception:
+        return jsonify({"error": "Service de textes du jour indisponible"}), 503
+
+@app.route('/health', methods=['GET'])
+async def health():
+    """Health check de l'adaptateur (état du RAG lu depuis la sonde)"""
+    return jsonify({
+        "status": "ok",
+        "service": "RAG Adapter (async)",
+        "rag_status": rag_adapter.rag_status(),
+        "rag_url": RAG_API_URL,
+        "timestamp": datetime.now().isoformat()
+    })
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """Histogrammes de latence au format texte Prometheus (propres à ce worker)"""
+    return app.response_class(registry.render(), content_type=CONTENT_TYPE)
+
+def wants_timings() -> bool:
+    return request.headers.get(rag_adapter.DEBUG_TIMING_HEADER, '').lower() in ('1', 'true', 'yes')
+
+@app.before_request
+async def start_request_timer():
+    g.timer = start_timer()
+
+@app.after_request
+async def record_request_duration(response):
+    timer = getattr(g, 'timer', None)
+    if timer is not None:
+        route = request.url_rule.rule if request.url_rule else 'inconnue'
+        REQUEST_SECONDS.observe(timer.elapsed(), route=route, method=request.method, status=response.status_code)
+        if wants_timings():
+            response.headers['Server-Timing'] = server_timing(timer.breakdown())
+    return response
+
+@app.teardown_request
+async def clear_request_timer(error=None):
+    stop_timer()
+
+if __name__ == '__main__':
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    print("🚀 Adaptateur RAG asynchrone démarré")
+    print(f"📡 RAG API URL: {RAG_API_URL}")
+    print(f"⏱️  Timeout: {RAG_TIMEOUT}s")
+    print(f"🔄 Fallback: {'Activé' if FALLBACK_ENABLED else 'Désactivé'}")
+    print("\n🌐 Serveur: http://localhost:8000")
+
+    config = Config()
+    config.bind = ['0.0.0.0:8000']
+    asyncio.run(serve(app, config))
@@ -3,12 +3,26 @@ Adaptateur Flask pour le système RAG FastAPI
 Maintient la compatibilité avec l'app mobile existante
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, g, request, jsonify
 from flask_cors import CORS
 import requests
+from requests.adapters import HTTPAdapter
+import hashlib
 import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+
+# Modules partagés à la racine du dépôt (resilience, caches)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from assistant_cache import create_response_cache
+from metrics import CONTENT_TYPE, REQUEST_SECONDS, registry, server_timing, start_timer, stop_timer, timed_stage
+from resilience import AdaptiveTimeout, CircuitBreaker, LatencyTracker
+from text_utils import normalize_question
 
 app = Flask(__name__)
 CORS(app)
@@ -17,27 +31,184 @@ CORS(app)
 RAG_API_URL = os.getenv('RAG_API_URL', 'http://localhost:8001')
 RAG_TIMEOUT = int(os.getenv('RAG_TIMEOUT', '30'))
 FALLBACK_ENABLED = os.getenv('FALLBACK_ENABLED', 'true').lower() == 'true'
+RAG_POOL_SIZE = int(os.getenv('RAG_POOL_SIZE', '20'))
+
+# En-tête de requête qui ajoute le détail des durées par étape (en-tête Server-Timing)
+DEBUG_TIMING_HEADER = os.getenv('DEBUG_TIMING_HEADER', 'X-Debug-Timing')
+
+# Session partagée vers le RAG: connexions persistantes (keep-alive) au lieu d'une
+# nouvelle poignée de main TCP/TLS à chaque appel
+rag_session = requests.Session()
+rag_session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=RAG_POOL_SIZE))
+rag_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=RAG_POOL_SIZE))
+
+# Requêtes groupées (/api/assistant/query/batch)
+BATCH_MAX_QUESTIONS = int(os.getenv('BATCH_MAX_QUESTIONS', '50'))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))
+
+# Cache des réponses du RAG (backend et limites choisis par les variables RESPONSE_CACHE_*)
+rag_cache = create_response_cache()
+
+# Disjoncteur et délai adaptatif pour call_rag_api: le délai suit le p99 des appels
+# réussis (× RAG_TIMEOUT_MULTIPLIER, entre RAG_MIN_TIMEOUT et RAG_TIMEOUT), et après
+# RAG_BREAKER_THRESHOLD échecs consécutifs le fallback est renvoyé sans appeler le RAG
+# pendant RAG_BREAKER_RECOVERY secondes
+rag_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv('RAG_BREAKER_THRESHOLD', '5')),
+    recovery_timeout=float(os.getenv('RAG_BREAKER_RECOVERY', '30'))
+)
+rag_timeout = AdaptiveTimeout(
+    max_timeout=RAG_TIMEOUT,
+    min_timeout=float(os.getenv('RAG_MIN_TIMEOUT', '5')),
+    multiplier=float(os.getenv('RAG_TIMEOUT_MULTIPLIER', '2'))
+)
+
+# Sonde du health check du RAG en arrière-plan
+RAG_HEALTH_INTERVAL = float(os.getenv('RAG_HEALTH_INTERVAL', '10'))
+RAG_HEALTH_TIMEOUT = float(os.getenv('RAG_HEALTH_TIMEOUT', '5'))
+
+class RagHealthMonitor:
+    """Interroge périodiquement le health check du RAG et garde l'état en mémoire
+
+    /health et /api/assistant/stats lisent cet état au lieu d'appeler le RAG à chaque
+    requête, et call_rag_api échoue tout de suite tant que le RAG est connu hors service.
+    """
+
+    def __init__(self, url: str, interval: float = 10, timeout: float = 5, window: int = 60):
+        self.url = url
+        self.interval = interval
+        self.timeout = timeout
+        self.latency = LatencyTracker(window)
+        self._checks = deque(maxlen=window)  # disponibilité des dernières sondes
+        self._lock = threading.Lock()
+        self._pid = None
+        self.rag_health = None  # dernière réponse JSON du health check
+        self.reachable = False
+        self.available = None  # None tant qu'aucune sonde n'a abouti
+        self.consecutive_failures = 0
+        self.last_check = None
+
+    def probe(self) -> bool:
+        """Un appel au health check; met à jour l'état et retourne la disponibilité"""
+        started = time.monotonic()
+        rag_health = None
+        try:
+            response = rag_session.get(self.url, timeout=self.timeout)
+            reachable = True
+            if response.ok:
+                rag_health = response.json()
+        except ValueError:
+            reachable = True  # réponse non JSON
+        except requests.exceptions.RequestException:
+            reachable = False
+
+        if reachable:
+            self.latency.record(time.monotonic() - started)
+        available = rag_health is not None
+        self.rag_health = rag_health
+        self.reachable = reachable
+        self.available = available
+        self.consecutive_failures = 0 if available else self.consecutive_failures + 1
+        self.last_check = datetime.now().isoformat()
+        self._checks.append(available)
+        return available
+
+    def is_down(self) -> bool:
+        """Vrai seulement si la dernière sonde a échoué (inconnu = on tente l'appel)"""
+        return self.available is False
+
+    def start(self) -> None:
+        """Démarre la sonde en arrière-plan (une fois par processus, après un fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        thread = threading.Thread(target=self._run, name='rag-health-monitor', daemon=True)
+        thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self.probe()
+            time.sleep(self.interval)
+
+    def stats(self) -> Dict:
+        checks = list(self._checks)
+        return {
+            'available': self.available,
+            'reachable': self.reachable,
+            'last_check': self.last_check,
+            'interval': self.interval,
+            'consecutive_failures': self.consecutive_failures,
+            'availability': round(sum(checks) / len(checks), 3) if checks else None,
+            'latency': self.latency.stats()
+        }
+
+health_monitor = RagHealthMonitor(f"{RAG_API_URL}/api/v1/chatbot/health", RAG_HEALTH_INTERVAL, RAG_HEALTH_TIMEOUT)
+
+@app.before_request
+def start_health_monitor():
+    health_monitor.start()
 
 def call_rag_api(question: str) -> Optional[Dict]:
     """Appelle le système RAG FastAPI"""
+    if health_monitor.is_down():
+        # Inutile d'attendre RAG_TIMEOUT: la dernière sonde a trouvé le RAG hors service
+        return None
+    if not rag_breaker.allow_request():
+        return None
+
+    started = time.monotonic()
     try:
-        response = requests.post(
-            f"{RAG_API_URL}/api/v1/chatbot/query",
-            json={"question": question},
-            timeout=RAG_TIMEOUT,
-            headers={"Content-Type": "application/json"}
-        )
-        
-        if response.ok:
-            return response.json()
-        else:
-            print(f"❌ RAG API error: {response.status_code} - {response.text}")
-            return None
+        with timed_stage('rag'):
+            response = rag_session.post(
+                f"{RAG_API_URL}/api/v1/chatbot/query",
+                json={"question": question},
+                timeout=rag_timeout.current(),
+                headers={"Content-Type": "application/json"}
+            )
     except requests.exceptions.RequestException as e:
+        rag_breaker.record_failure()
         print(f"❌ Erreur de connexion au RAG: {e}")
         return None
+    except BaseException:
+        # Appel abandonné (client déconnecté, annulation): l'essai semi-ouvert du disjoncteur
+        # est libéré, sinon il resterait pris et bloquerait tous les appels suivants
+        rag_breaker.release_trial()
+        raise
+
+    if response.ok:
+        rag_breaker.record_success()
+        rag_timeout.record(time.monotonic() - started)
+        return response.json()
+
+    # Une erreur 4xx vient de la requête, pas d'un RAG défaillant
+    if response.status_code >= 500:
+        rag_breaker.record_failure()
+    else:
+        rag_breaker.record_success()
+    print(f"❌ RAG API error: {response.status_code} - {response.text}")
+    return None
+
+def get_rag_cache_key(question: str) -> str:
+    """Clé de cache: la question normalisée (casse, accents, mots vides)"""
+    return 'rag:' + hashlib.md5(normalize_question(question).encode('utf-8')).hexdigest()
 
-def format_response(rag_data: Dict, question: str) -> Dict:
+def ask_rag(question: str) -> Tuple[Optional[Dict], Dict]:
+    """Réponse du RAG depuis le cache, sinon via call_rag_api; retourne (données, statut du cache)"""
+    key = get_rag_cache_key(question)
+    with timed_stage('cache'):
+        rag_data = rag_cache.get(key)
+    if rag_data is not None:
+        return rag_data, {'hit': True, 'source': 'exact'}
+
+    rag_data = call_rag_api(question)
+    if rag_data:
+        rag_cache.set(key, rag_data)
+    return rag_data, {'hit': False, 'source': None}
+
+def format_response(rag_data: Dict, question: str, cache: Optional[Dict] = None) -> Dict:
     """Formate la réponse du RAG pour correspondre au format attendu par l'app mobile"""
     return {
         "answer": rag_data.get("answer", ""),
@@ -46,7 +217,26 @@ def format_response(rag_data: Dict, question: str) -> Dict:
         "timestamp": datetime.now().isoformat(),
         "bible_references": rag_data.get("bible_references", []),
         "model": "Google Gemini 1.5 Flash (RAG)",
-        "question": question
+        "question": question,
+        "cache": cache or {'hit': False, 'source': None}
+    }
+
+def build_unavailable_response() -> Dict:
+    """Réponse renvoyée (avec un statut 503) quand le RAG n'est pas disponible"""
+    # Fallback si le RAG n'est pas disponible
+    if FALLBACK_ENABLED:
+        return {
+            "answer": "Le service RAG n'est pas disponible pour le moment. Veuillez réessayer plus tard.",
+            "sources": [],
+            "confidence": 0.1,
+            "timestamp": datetime.now().isoformat(),
+            "bible_references": [],
+            "model": "Fallback",
+            "error": "RAG service unavailable"
+        }
+    return {
+        'error': 'Service RAG indisponible',
+        'message': 'Le système RAG ne répond pas. Vérifiez que le service est démarré.'
     }
 
 @app.route('/api/assistant/query', methods=['POST'])
@@ -63,29 +253,14 @@ def assistant_query():
         if len(question) < 5:
             return jsonify({'error': 'Question trop courte'}), 400
         
-        # Appeler le RAG FastAPI
-        rag_data = call_rag_api(question)
+        # Appeler le RAG FastAPI (sauf si la question est déjà en cache)
+        rag_data, cache = ask_rag(question)
         
         if rag_data:
-            formatted_response = format_response(rag_data, question)
+            formatted_response = format_response(rag_data, question, cache)
             return jsonify(formatted_response)
         else:
-            # Fallback si le RAG n'est pas disponible
-            if FALLBACK_ENABLED:
-                return jsonify({
-                    "answer": "Le service RAG n'est pas disponible pour le moment. Veuillez réessayer plus tard.",
-                    "sources": [],
-                    "confidence": 0.1,
-                    "timestamp": datetime.now().isoformat(),
-                    "bible_references": [],
-                    "model": "Fallback",
-                    "error": "RAG service unavailable"
-                }), 503
-            else:
-                return jsonify({
-                    'error': 'Service RAG indisponible',
-                    'message': 'Le système RAG ne répond pas. Vérifiez que le service est démarré.'
-                }), 503
+            return jsonify(build_unavailable_response()), 503
         
     except Exception as e:
         return jsonify({
@@ -94,54 +269,134 @@ def assistant_query():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+def parse_batch_request(data: Optional[Dict]) -> List[str]:
+    """Questions d'une requête groupée; ValueError si le lot est invalide"""
+    questions = (data or {}).get('questions')
+    if not isinstance(questions, list) or not questions:
+        raise ValueError('Liste de questions requise')
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise ValueError(f'Maximum {BATCH_MAX_QUESTIONS} questions par lot')
+    return [str(question).strip() for question in questions]
+
+def group_batch(questions: List[str]) -> Tuple[List[Optional[str]], Dict[str, str]]:
+    """Clé de cache de chaque question (None si trop courte) et questions uniques par clé"""
+    keys = [get_rag_cache_key(question) if len(question) >= 5 else None for question in questions]
+    unique = {}
+    for question, key in zip(questions, keys):
+        if key is not None:
+            unique.setdefault(key, question)
+    return keys, unique
+
+def build_batch_response(questions: List[str], keys: List[Optional[str]],
+                         answers: Dict[str, Tuple[Optional[Dict], Dict]], generated: int) -> Dict:
+    """Résultats dans l'ordre des questions reçues (les doublons partagent la même réponse)"""
+    results = []
+    for question, key in zip(questions, keys):
+        if key is None:
+            results.append({'question': question, 'error': 'Question requise' if not question else 'Question trop courte'})
+            continue
+        rag_data, cache = answers[key]
+        if rag_data:
+            results.append(format_response(rag_data, question, cache))
+        else:
+            unavailable = build_unavailable_response()
+            unavailable['question'] = question
+            results.append(unavailable)
+    return {
+        'results': results,
+        'count': len(results),
+        'unique': len(answers),
+        'cache_hits': len(answers) - generated,
+        'timestamp': datetime.now().isoformat()
+    }
+
+def answer_batch(questions: List[str]) -> Dict:
+    """Répond à un lot de questions: cache d'abord, puis le RAG (via ask_rag) pour les
+    questions manquantes, au plus BATCH_CONCURRENCY à la fois"""
+    keys, unique = group_batch(questions)
+    answers = {}
+    misses = []
+    for key, question in unique.items():
+        with timed_stage('cache'):
+            rag_data = rag_cache.get(key)
+        if rag_data is not None:
+            answers[key] = (rag_data, {'hit': True, 'source': 'exact'})
+        else:
+            misses.append((key, question))
+
+    if misses:
+        with ThreadPoolExecutor(max_workers=min(BATCH_CONCURRENCY, len(misses))) as pool:
+            for (key, _), answer in zip(misses, pool.map(lambda miss: ask_rag(miss[1]), misses)):
+                answers[key] = answer
+
+    return build_batch_response(questions, keys, answers, len(misses))
+
+@app.route('/api/assistant/query/batch', methods=['POST'])
+def assistant_query_batch():
+    """Plusieurs questions en une requête (outils d'administration, préchargement du cache)"""
+    try:
+        questions = parse_batch_request(request.get_json())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        return jsonify(answer_batch(questions))
+    except Exception as e:
+        return jsonify({
+            'error': 'Erreur interne du serveur',
+            'message': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+# Suggestions de questions - compatible avec l'app mobile
+SUGGESTIONS = [
+    "Qui était Moïse et quel rôle a-t-il joué dans l'histoire d'Israël?",
+    "Qu'est-ce que la Pentecôte ?",
+    "Comment prier le rosaire ?",
+    "Quel est le sens du carême ?",
+    "Qui sont les saints du Sénégal ?",
+    "Comment se préparer au baptême ?",
+    "Quelle est la signification de l'Eucharistie ?",
+    "Qu'est-ce que la Trinité ?",
+    "Comment interpréter la parabole du bon samaritain ?",
+    "Quel est le message principal de l'Évangile selon Jean ?"
+]
+
 @app.route('/api/assistant/suggestions', methods=['GET'])
 def get_suggestions():
     """Suggestions de questions - compatible avec l'app mobile"""
-    suggestions = [
-        "Qui était Moïse et quel rôle a-t-il joué dans l'histoire d'Israël?",
-        "Qu'est-ce que la Pentecôte ?",
-        "Comment prier le rosaire ?",
-        "Quel est le sens du carême ?",
-        "Qui sont les saints du Sénégal ?",
-        "Comment se préparer au baptême ?",
-        "Quelle est la signification de l'Eucharistie ?",
-        "Qu'est-ce que la Trinité ?",
-        "Comment interpréter la parabole du bon samaritain ?",
-        "Quel est le message principal de l'Évangile selon Jean ?"
-    ]
-    
     return jsonify({
-        "suggestions": suggestions,
+        "suggestions": SUGGESTIONS,
         "timestamp": datetime.now().isoformat()
     })
 
+def build_stats() -> Dict:
+    """Statistiques à partir de l'état de la sonde de santé du RAG"""
+    if health_monitor.rag_health is not None:
+        stats = {
+            "status": "active",
+            "rag_available": True,
+            "rag_health": health_monitor.rag_health
+        }
+    else:
+        stats = {
+            "status": "degraded" if health_monitor.reachable else "inactive",
+            "rag_available": False
+        }
+    stats["cache"] = rag_cache.stats()
+    stats["health_monitor"] = health_monitor.stats()
+    stats["circuit_breaker"] = rag_breaker.stats()
+    stats["rag_timeout"] = rag_timeout.stats()
+    stats["timestamp"] = datetime.now().isoformat()
+    return stats
+
+def rag_status() -> str:
+    return "available" if health_monitor.available else "unavailable"
+
 @app.route('/api/assistant/stats', methods=['GET'])
 def get_stats():
-    """Statistiques de l'assistant"""
-    try:
-        # Appeler le health check du RAG
-        response = requests.get(f"{RAG_API_URL}/api/v1/chatbot/health", timeout=5)
-        
-        if response.ok:
-            rag_health = response.json()
-            return jsonify({
-                "status": "active",
-                "rag_available": True,
-                "rag_health": rag_health,
-                "timestamp": datetime.now().isoformat()
-            })
-        else:
-            return jsonify({
-                "status": "degraded",
-                "rag_available": False,
-                "timestamp": datetime.now().isoformat()
-            })
-    except:
-        return jsonify({
-            "status": "inactive",
-            "rag_available": False,
-            "timestamp": datetime.now().isoformat()
-        })
+    """Statistiques de l'assistant (servies depuis la sonde, sans appel au RAG)"""
+    return jsonify(build_stats())
 
 @app.route('/api/text-of-the-day', methods=['GET'])
 def text_of_the_day():
@@ -149,7 +404,7 @@ def text_of_the_day():
     try:
         # Essayer d'appeler le RAG pour les textes du jour
         timezone = request.args.get('tz', 'Europe/Paris')
-        response = requests.get(
+        response = rag_session.get(
             f"{RAG_API_URL}/api/v1/text-of-the-day",
             params={"tz": timezone},
             timeout=10
@@ -168,34 +423,56 @@ def text_of_the_day():
 
 @app.route('/health', methods=['GET'])
 def health():
-    """Health check de l'adaptateur"""
-    try:
-        # Vérifier si le RAG est accessible
-        response = requests.get(f"{RAG_API_URL}/api/v1/chatbot/health", timeout=5)
-        rag_status = "available" if response.ok else "unavailable"
-    except:
-        rag_status = "unavailable"
-    
+    """Health check de l'adaptateur (état du RAG lu depuis la sonde)"""
     return jsonify({
         "status": "ok",
         "service": "RAG Adapter",
-        "rag_status": rag_status,
+        "rag_status": rag_status(),
         "rag_url": RAG_API_URL,
         "timestamp": datetime.now().isoformat()
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Histogrammes de latence au format texte Prometheus (propres à ce worker)"""
+    return app.response_class(registry.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+def wants_timings() -> bool:
+    return request.headers.get(DEBUG_TIMING_HEADER, '').lower() in ('1', 'true', 'yes')
+
+@app.before_request
+def start_request_timer():
+    g.timer = start_timer()
+
+@app.after_request
+def record_request_duration(response):
+    timer = getattr(g, 'timer', None)
+    if timer is not None:
+        route = request.url_rule.rule if request.url_rule else 'inconnue'
+        REQUEST_SECONDS.observe(timer.elapsed(), route=route, method=request.method, status=response.status_code)
+        if wants_timings():
+            response.headers['Server-Timing'] = server_timing(timer.breakdown())
+    return response
+
+@app.teardown_request
+def clear_request_timer(error=None):
+    stop_timer()
+
 if __name__ == '__main__':
     print("🚀 Adaptateur RAG Flask démarré")
     print(f"📡 RAG API URL: {RAG_API_URL}")
     print(f"⏱️  Timeout: {RAG_TIMEOUT}s")
     print(f"🔄 Fallback: {'Activé' if FALLBACK_ENABLED else 'Désactivé'}")
+    print(f"🩺 Sonde de santé du RAG: toutes les {RAG_HEALTH_INTERVAL:g}s")
     print("\n🌐 Serveur: http://localhost:8000")
     print("📚 Endpoints disponibles:")
     print("   - POST /api/assistant/query")
+    print("   - POST /api/assistant/query/batch")
     print("   - GET  /api/assistant/suggestions")
     print("   - GET  /api/assistant/stats")
     print("   - GET  /api/text-of-the-day")
     print("   - GET  /health")
+    print("   - GET  /metrics")
     
     app.run(host='0.0.0.0', port=8000, debug=True)
 
@@ -0,0 +1,90 @@
+"""
+Réponses servies depuis les caches de l'assistant (assistant_biblique_optimized.py)
+"""
+
+import os
+import tempfile
+
+import pytest
+
+# Base biblique absente: l'assistant démarre sans toucher à bible_database.db
+os.environ['BIBLE_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bible_database.db')
+
+import assistant_biblique_optimized as assistant  # noqa: E402
+from assistant_cache import ResponseCache  # noqa: E402
+from semantic_cache import HashingEmbedder, SemanticCache  # noqa: E402
+
+QUESTION = "Que dit la Bible sur le pardon ?"
+
+
+def generated_response() -> dict:
+    return {
+        'answer': "Pardonne soixante-dix fois sept fois (Matthieu 18:22).",
+        'model': "Claude 3.5 Sonnet (Optimisé)",
+        'usage': {'input_tokens': 812, 'cached_input_tokens': 600, 'cache_creation_input_tokens': 0,
+                  'output_tokens': 240, 'estimated_input_tokens': 790},
+        'routing': {'provider': 'claude', 'hedged': False, 'attempts': 1}
+    }
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    monkeypatch.setattr(assistant, 'response_cache', ResponseCache())
+    monkeypatch.setattr(assistant, 'semantic_cache', SemanticCache(HashingEmbedder(), threshold=0.7))
+
+
+def assert_no_token_spend(response: dict):
+    assert response['cache']['hit'] is True
+    assert all(count == 0 for count in response['usage'].values())
+    assert 'routing' not in response
+
+
+def test_exact_hit_reports_no_token_spend():
+    assistant.store_answer(QUESTION, 'general', generated_response())
+
+    response = assistant.lookup_cached_answer(QUESTION, 'general')
+
+    assert response['cache']['source'] == 'exact'
+    assert_no_token_spend(response)
+
+
+def test_semantic_hit_reports_no_token_spend():
+    assistant.store_answer(QUESTION, 'general', generated_response())
+
+    response = assistant.lookup_cached_answer("Que dit la Bible à propos du pardon ?", 'general')
+
+    assert response['cache']['source'] == 'semantic'
+    assert_no_token_spend(response)
+
+
+def test_hit_keeps_the_stored_usage_intact():
+    assistant.store_answer(QUESTION, 'general', generated_response())
+    assistant.lookup_cached_answer(QUESTION, 'general')
+
+    stored = assistant.response_cache.get(assistant.get_cache_key(QUESTION, 'general'))
+
+    assert stored['usage']['output_tokens'] == 240
+
+
+def test_generated_response_keeps_its_usage():
+    response = generated_response()
+    assistant.store_answer(QUESTION, 'general', response)
+
+    assert response['cache'] == {'hit': False, 'source': None}
+    assert response['usage']['output_tokens'] == 240
+
+
+def test_warmup_starts_once_per_deployment(tmp_path, monkeypatch):
+    started = []
+    monkeypatch.setattr(assistant, 'WARMUP_LOCK_PATH', str(tmp_path / 'warmup.lock'))
+    monkeypatch.setattr(assistant, 'warmup_state', {'pid': None, 'report': None})
+    monkeypatch.setattr(assistant, 'run_warmup', lambda: started.append(os.getpid()))
+
+    assistant.start_warmup()
+    # Autre worker (nouveau processus): le verrou du déploiement est déjà pris
+    monkeypatch.setattr(assistant, 'warmup_state', {'pid': None, 'report': None})
+    assistant.start_warmup()
+
+    for thread in [t for t in assistant.threading.enumerate() if t.name == 'cache-warmup']:
+        thread.join()
+    assert started == [os.getpid()]
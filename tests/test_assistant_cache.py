@@ -0,0 +1,86 @@
+"""
+Backends partagés du cache des réponses (assistant_cache.py): SQLite et Redis (fakeredis)
+"""
+
+import threading
+
+import pytest
+
+from assistant_cache import RedisResponseCache, SQLiteResponseCache
+
+RESPONSE = {'answer': "Pardonne soixante-dix fois sept fois (Matthieu 18:22).", 'model': 'test'}
+
+
+@pytest.fixture
+def redis_cache():
+    fakeredis = pytest.importorskip('fakeredis')
+    return RedisResponseCache(fakeredis.FakeRedis(), ttl=120)
+
+
+@pytest.fixture
+def sqlite_cache(tmp_path):
+    return SQLiteResponseCache(str(tmp_path / 'cache.db'), ttl=120)
+
+
+def test_redis_get_set_delete(redis_cache):
+    assert redis_cache.get('pardon') is None
+    redis_cache.set('pardon', RESPONSE)
+
+    assert redis_cache.get('pardon') == RESPONSE
+    assert len(redis_cache) == 1
+    redis_cache.delete('pardon')
+    assert redis_cache.get('pardon') is None
+
+
+def test_redis_entries_expire_with_the_ttl(redis_cache):
+    redis_cache.set('pardon', RESPONSE)
+
+    assert 0 < redis_cache.client.ttl('samaquete:response:pardon') <= 120
+
+
+def test_redis_clear_keeps_other_keys(redis_cache):
+    redis_cache.client.set('autre:cle', 'valeur')
+    redis_cache.set('pardon', RESPONSE)
+    redis_cache.set('moise', RESPONSE)
+
+    redis_cache.clear()
+
+    assert len(redis_cache) == 0
+    assert redis_cache.client.get('autre:cle') == b'valeur'
+
+
+def test_redis_stats(redis_cache):
+    redis_cache.set('pardon', RESPONSE)
+    redis_cache.get('pardon')
+    redis_cache.get('moise')
+
+    stats = redis_cache.stats()
+
+    assert (stats['backend'], stats['hits'], stats['misses'], stats['hit_rate']) == ('redis', 1, 1, 0.5)
+
+
+def test_sqlite_expired_entry_misses(sqlite_cache):
+    sqlite_cache.ttl = -1
+    sqlite_cache.set('pardon', RESPONSE)
+
+    assert sqlite_cache.get('pardon') is None
+    assert sqlite_cache.sweep() == 1
+
+
+@pytest.mark.parametrize('backend', ['sqlite_cache', 'redis_cache'])
+def test_counters_are_exact_under_concurrency(backend, request):
+    cache = request.getfixturevalue(backend)
+    cache.set('pardon', RESPONSE)
+
+    def lookups():
+        for i in range(200):
+            cache.get('pardon' if i % 2 else 'moise')
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (800, 800)
@@ -0,0 +1,45 @@
+"""
+Import d'une traduction (bible_import.build_database): remplacement de la base en place
+"""
+
+import sqlite3
+
+import pytest
+
+from bible_import import build_database
+
+VERSES = [('Genèse', 1, 1, "Au commencement, Dieu créa les cieux et la terre.")]
+
+
+def count_verses(path) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT count(*) FROM bible_verses").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_replaces_a_closed_database(tmp_path):
+    output = str(tmp_path / 'bible.db')
+    build_database(output, VERSES)
+    assert count_verses(output) == 1
+
+    build_database(output, VERSES + [('Genèse', 1, 2, "La terre était informe et vide.")])
+
+    assert count_verses(output) == 2
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['bible.db']
+
+
+def test_refuses_to_replace_an_open_database(tmp_path):
+    output = str(tmp_path / 'bible.db')
+    build_database(output, VERSES)
+    reader = sqlite3.connect(output)
+    reader.execute("SELECT count(*) FROM bible_verses").fetchone()
+
+    with pytest.raises(RuntimeError, match="en cours d'utilisation"):
+        build_database(output, VERSES * 2)
+
+    # La base ouverte et son journal sont intacts
+    assert reader.execute("SELECT count(*) FROM bible_verses").fetchone()[0] == 1
+    reader.close()
+    assert not (tmp_path / 'bible.db.tmp').exists()
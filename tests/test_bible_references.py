@@ -0,0 +1,54 @@
+"""
+Références bibliques (bible_references.py): analyse en texte libre et recherche indexée des versets
+"""
+
+import sqlite3
+
+import pytest
+
+from bible_references import BibleReference, find_references, lookup_references
+from bible_search import ensure_fts_index
+
+
+@pytest.mark.parametrize('text, labels', [
+    ("Matthieu 5:3", ["Matthieu 5:3"]),
+    ("Lisez 1 Corinthiens 13 ce soir", ["1 Corinthiens 13"]),
+    ("1Co 13, 4-7", ["1 Corinthiens 13:4-7"]),
+    ("Ép 2:8 et Éphésiens 4:32", ["Éphésiens 2:8", "Éphésiens 4:32"]),
+    ("Esaie 53:5.7", ["Isaïe 53:5", "Isaïe 53:7"]),
+    ("Jn 3, 16-18", ["Jean 3:16-18"]),
+    ("Jn 3:16-4:2", ["Jean 3:16-4:2"]),
+    ("Ps 22 (23), 1-4", ["Psaumes 22:1-4"]),
+    ("Jude 3", ["Jude 1:3"]),
+    ("Gn 1-2", ["Genèse 1-2"]),
+    ("Gn 1-2:3", ["Genèse 1:1-2:3"]),
+    ("Nombres 7", ["Nombres 7"]),
+    ("nombres 7:3", ["Nombres 7:3"]),
+    ("2 Rois 5", ["2 Rois 5"]),
+    ("actes des apôtres 2", ["Actes 2"]),
+])
+def test_finds_references(text, labels):
+    assert [reference.label for reference in find_references(text)] == labels
+
+
+@pytest.mark.parametrize('text', [
+    "Il y a les nombres 7 et 8",
+    "les deux rois 3 fois",
+    "les actes 2 et 3 du procès",
+    "un job 3 jours par semaine",
+    "Is it 5:30 ?",
+])
+def test_common_words_are_not_references(text):
+    assert find_references(text) == []
+
+
+def test_chapter_range_covers_every_chapter():
+    conn = sqlite3.connect(':memory:')
+    ensure_fts_index(conn)
+    conn.executemany("INSERT INTO bible_verses (book, chapter, verse, text, reference) VALUES (?, ?, ?, ?, ?)",
+                     [('Genèse', chapter, verse, f"v{chapter}.{verse}", f"Genèse {chapter}:{verse}")
+                      for chapter in (1, 2, 3) for verse in (1, 2)])
+
+    verses = lookup_references(conn, [BibleReference('Genèse', 1, end_chapter=2)])
+
+    assert [verse['reference'] for verse in verses] == ["Genèse 1:1", "Genèse 1:2", "Genèse 2:1", "Genèse 2:2"]
@@ -0,0 +1,97 @@
+"""
+Pool de connexions de la base biblique (bible_search.BibleConnectionPool)
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from bible_search import BibleConnectionPool, ensure_fts_index
+
+
+@pytest.fixture
+def bible_db(tmp_path):
+    path = tmp_path / 'bible.db'
+    conn = sqlite3.connect(path)
+    ensure_fts_index(conn)
+    conn.execute("INSERT INTO bible_verses (book, chapter, verse, text, reference) "
+                 "VALUES ('Jean', 3, 16, 'Car Dieu a tant aimé le monde', 'Jean 3:16')")
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+def test_same_thread_reuses_its_connection(bible_db):
+    pool = BibleConnectionPool(bible_db)
+
+    assert pool.get() is pool.get()
+    assert pool.stats()['open_connections'] == 1
+
+
+def test_short_lived_threads_do_not_leak_connections(bible_db):
+    pool = BibleConnectionPool(bible_db)
+    results = []
+
+    def query():
+        results.append(pool.get().execute("SELECT count(*) FROM bible_verses").fetchone()[0])
+
+    for _ in range(50):
+        thread = threading.Thread(target=query)
+        thread.start()
+        thread.join()
+
+    assert results == [1] * 50
+    assert pool.stats()['open_connections'] == 0
+
+
+def test_concurrent_threads_get_their_own_connection(bible_db):
+    pool = BibleConnectionPool(bible_db)
+    barrier = threading.Barrier(8)
+    connections = []
+
+    def query():
+        connections.append(pool.get())
+        barrier.wait()
+
+    threads = [threading.Thread(target=query) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(conn) for conn in connections}) == 8
+    assert pool.stats()['open_connections'] == 0
+
+
+def test_discard_closes_the_connection(bible_db):
+    pool = BibleConnectionPool(bible_db)
+    conn = pool.get()
+    pool.discard()
+
+    assert pool.stats()['open_connections'] == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert pool.get() is not conn
+
+
+def test_close_all_closes_other_threads_connections(bible_db):
+    pool = BibleConnectionPool(bible_db)
+    ready, done = threading.Event(), threading.Event()
+
+    def hold():
+        pool.get()
+        ready.set()
+        done.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    ready.wait()
+    pool.get()
+    assert pool.stats()['open_connections'] == 2
+
+    pool.close_all()
+    done.set()
+    thread.join()
+
+    assert pool.stats()['open_connections'] == 0
@@ -0,0 +1,178 @@
+"""
+Routage entre fournisseurs LLM (llm_router.py) avec FakeLLMProvider: couverture (hedging),
+bascule sur échec ou délai dépassé, disjoncteur; en mode synchrone et asynchrone
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from llm_router import FakeLLMProvider, LLMRouter, Provider
+from resilience import CircuitBreaker
+
+
+def make_router(*fakes, hedge_delay=0.05, timeout=1.0, breaker_threshold=5):
+    providers = [
+        Provider(fake.name, call=fake, acall=fake.acall, timeout=timeout,
+                 breaker=CircuitBreaker(failure_threshold=breaker_threshold, recovery_timeout=60))
+        for fake in fakes
+    ]
+    return LLMRouter(providers, hedge_delay=hedge_delay)
+
+
+def ask(router, mode):
+    if mode == 'async':
+        return asyncio.run(router.ask_async("Qui était Moïse ?", "Exode 3:14"))
+    return router.ask("Qui était Moïse ?", "Exode 3:14")
+
+
+@pytest.fixture(params=['sync', 'async'])
+def mode(request):
+    return request.param
+
+
+def test_fast_primary_answers_without_hedging(mode):
+    claude, gpt4 = FakeLLMProvider('claude', latency=0.0), FakeLLMProvider('gpt4')
+    router = make_router(claude, gpt4)
+
+    response = ask(router, mode)
+
+    assert response['routing'] == {'provider': 'claude', 'hedged': False, 'attempts': 1}
+    assert response['context_used'] == "Exode 3:14"
+    assert gpt4.calls == 0
+    assert router.hedged == 0
+
+
+def test_slow_primary_is_hedged(mode):
+    claude, gpt4 = FakeLLMProvider('claude', latency=0.3), FakeLLMProvider('gpt4', latency=0.0)
+    router = make_router(claude, gpt4, hedge_delay=0.05)
+
+    started = time.monotonic()
+    response = ask(router, mode)
+
+    assert time.monotonic() - started < 0.25
+    assert response['routing'] == {'provider': 'gpt4', 'hedged': True, 'attempts': 2}
+    assert router.hedged == 1
+    assert router.providers[1].wins == 1
+    # Le perdant ne compte pas comme un échec du fournisseur
+    assert router.providers[0].failures == 0
+    assert router.providers[0].breaker.state == CircuitBreaker.CLOSED
+
+
+def test_async_hedge_cancels_the_loser():
+    claude, gpt4 = FakeLLMProvider('claude', latency=0.3), FakeLLMProvider('gpt4', latency=0.0)
+    router = make_router(claude, gpt4)
+
+    ask(router, 'async')
+
+    assert claude.cancelled == 1
+
+
+def test_hedge_loser_latency_is_recorded(mode):
+    claude, gpt4 = FakeLLMProvider('claude', latency=0.2), FakeLLMProvider('gpt4', latency=0.0)
+    router = make_router(claude, gpt4)
+
+    ask(router, mode)
+    time.sleep(0.3)  # mode synchrone: le thread du perdant termine son appel
+
+    assert len(router.providers[0].latency) == 1
+    assert router.providers[0].latency.percentile(0.95) >= 0.05
+
+
+def test_failure_fails_over_immediately(mode):
+    claude, gpt4 = FakeLLMProvider('claude', error="overloaded"), FakeLLMProvider('gpt4')
+    router = make_router(claude, gpt4, hedge_delay=5.0)
+
+    started = time.monotonic()
+    response = ask(router, mode)
+
+    assert time.monotonic() - started < 1.0
+    assert response['routing'] == {'provider': 'gpt4', 'hedged': False, 'attempts': 2}
+    assert router.providers[0].failures == 1
+
+
+def test_timeout_fails_over(mode):
+    claude, gpt4 = FakeLLMProvider('claude', latency=0.5), FakeLLMProvider('gpt4')
+    router = make_router(claude, gpt4, hedge_delay=5.0, timeout=0.05)
+
+    response = ask(router, mode)
+
+    assert response['routing']['provider'] == 'gpt4'
+    assert router.providers[0].timeouts == 1
+
+
+def test_all_providers_failing_raises(mode):
+    router = make_router(FakeLLMProvider('claude', error="overloaded"), FakeLLMProvider('gpt4', error="quota"))
+
+    with pytest.raises(Exception) as error:
+        ask(router, mode)
+
+    assert "claude: overloaded" in str(error.value)
+    assert "gpt4: quota" in str(error.value)
+
+
+def test_open_breaker_skips_the_provider(mode):
+    claude, gpt4 = FakeLLMProvider('claude', error="overloaded"), FakeLLMProvider('gpt4')
+    router = make_router(claude, gpt4, breaker_threshold=2)
+
+    for _ in range(2):
+        ask(router, mode)
+    assert router.providers[0].breaker.state == CircuitBreaker.OPEN
+
+    response = ask(router, mode)
+
+    assert claude.calls == 2
+    assert response['routing'] == {'provider': 'gpt4', 'hedged': False, 'attempts': 1}
+    assert router.providers[0].breaker.rejected == 1
+
+
+def test_breaker_closes_after_a_successful_trial(mode):
+    claude, gpt4 = FakeLLMProvider('claude', error="overloaded"), FakeLLMProvider('gpt4')
+    router = make_router(claude, gpt4, breaker_threshold=1)
+    breaker = router.providers[0].breaker
+
+    ask(router, mode)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Délai de récupération écoulé: un appel d'essai repart vers le fournisseur principal
+    breaker.recovery_timeout = 0
+    claude.error = None
+    response = ask(router, mode)
+
+    assert response['routing']['provider'] == 'claude'
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_no_hedging_before_latencies_are_known(mode):
+    claude, gpt4 = FakeLLMProvider('claude', latency=0.1), FakeLLMProvider('gpt4')
+    router = LLMRouter([Provider('claude', call=claude, acall=claude.acall, timeout=1.0),
+                        Provider('gpt4', call=gpt4, acall=gpt4.acall, timeout=1.0)], min_samples=3)
+
+    for _ in range(3):
+        assert ask(router, mode)['routing'] == {'provider': 'claude', 'hedged': False, 'attempts': 1}
+    assert gpt4.calls == 0
+
+    # p95 connu (~0.1s, borné par min_hedge_delay): la couverture est de nouveau possible
+    router.min_hedge_delay = 0.01
+    claude.latency = 0.5
+    assert ask(router, mode)['routing']['provider'] == 'gpt4'
+
+
+def test_saturated_router_fails_fast_instead_of_queueing():
+    claude = FakeLLMProvider('claude', latency=0.3)
+    router = LLMRouter([Provider('claude', call=claude, timeout=1.0)], max_workers=1)
+    busy = threading.Thread(target=router.ask, args=("Qui était Moïse ?", ""))
+    busy.start()
+    time.sleep(0.05)
+
+    started = time.monotonic()
+    with pytest.raises(Exception, match="saturé"):
+        router.ask("Qui était Abraham ?", "")
+    assert time.monotonic() - started < 0.1
+    busy.join()
+
+    assert router.shed == 1
+    assert router.providers[0].timeouts == 0
+    assert router.stats()['inflight'] == 0
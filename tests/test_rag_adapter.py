@@ -0,0 +1,68 @@
+"""
+Adaptateurs RAG (services/rag-adapter.py et rag-adapter-async.py): disjoncteur des appels au RAG
+"""
+
+import asyncio
+import importlib
+import os
+import sys
+
+import pytest
+
+from resilience import CircuitBreaker
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'services'))
+rag_adapter = importlib.import_module('rag-adapter')
+rag_adapter_async = importlib.import_module('rag-adapter-async')
+
+
+@pytest.fixture
+def half_open_breaker(monkeypatch):
+    """Disjoncteur ouvert dont le délai de récupération est écoulé: le prochain appel est l'essai"""
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    monkeypatch.setattr(rag_adapter, 'rag_breaker', breaker)
+    monkeypatch.setattr(rag_adapter.health_monitor, 'available', None)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    return breaker
+
+
+class CancelledClient:
+    async def post(self, *args, **kwargs):
+        raise asyncio.CancelledError()
+
+
+class InterruptedSession:
+    def post(self, *args, **kwargs):
+        raise KeyboardInterrupt()
+
+
+def test_async_cancelled_trial_releases_the_breaker(half_open_breaker, monkeypatch):
+    monkeypatch.setattr(rag_adapter_async, 'http_client', CancelledClient())
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(rag_adapter_async.call_rag_api_async("Qui était Moïse ?"))
+
+    # L'essai abandonné ne bloque pas le suivant
+    assert half_open_breaker.state == CircuitBreaker.HALF_OPEN
+    assert half_open_breaker.allow_request()
+
+
+def test_sync_interrupted_trial_releases_the_breaker(half_open_breaker, monkeypatch):
+    monkeypatch.setattr(rag_adapter, 'rag_session', InterruptedSession())
+
+    with pytest.raises(KeyboardInterrupt):
+        rag_adapter.call_rag_api("Qui était Moïse ?")
+
+    assert half_open_breaker.allow_request()
+
+
+def test_abandoned_trial_without_release_blocks_calls():
+    # Contrat du disjoncteur: un essai semi-ouvert non conclu refuse les autres appels
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.release_trial()
+    assert breaker.allow_request()
@@ -0,0 +1,88 @@
+"""
+Cache sémantique (semantic_cache.py) avec l'embedder par hachage: hors ligne, sans modèle
+"""
+
+import time
+
+from semantic_cache import HashingEmbedder, SemanticCache
+
+RESPONSE = {'answer': "Pardonne soixante-dix fois sept fois (Matthieu 18:22).", 'model': 'test'}
+
+
+def make_cache(**kwargs) -> SemanticCache:
+    return SemanticCache(HashingEmbedder(), **kwargs)
+
+
+def test_same_question_reworded_hits():
+    cache = make_cache(threshold=0.9)
+    cache.add("Que dit la Bible sur le pardon ?", 'general', RESPONSE)
+
+    found = cache.lookup("que dit la bible sur le PARDON", 'general')
+
+    assert found is not None
+    response, similarity = found
+    assert response == RESPONSE
+    assert similarity >= 0.9
+    assert cache.hits == 1 and cache.misses == 0
+
+
+def test_returned_response_is_a_copy():
+    cache = make_cache()
+    cache.add("Que dit la Bible sur le pardon ?", 'general', RESPONSE)
+
+    response, _ = cache.lookup("Que dit la Bible sur le pardon ?", 'general')
+    response['cache'] = {'hit': True}
+
+    assert 'cache' not in cache.lookup("Que dit la Bible sur le pardon ?", 'general')[0]
+
+
+def test_different_question_misses():
+    cache = make_cache(threshold=0.9)
+    cache.add("Que dit la Bible sur le pardon ?", 'general', RESPONSE)
+
+    assert cache.lookup("Qui était Moïse ?", 'general') is None
+    assert cache.misses == 1
+
+
+def test_threshold_decides_close_paraphrases():
+    question, paraphrase = "Que dit la Bible sur le pardon ?", "Que dit la Bible à propos du pardon ?"
+    strict, loose = make_cache(threshold=0.95), make_cache(threshold=0.7)
+    for cache in (strict, loose):
+        cache.add(question, 'general', RESPONSE)
+
+    assert strict.lookup(paraphrase, 'general') is None
+    assert loose.lookup(paraphrase, 'general') is not None
+
+
+def test_context_must_match():
+    cache = make_cache()
+    cache.add("Que dit la Bible sur le pardon ?", 'general', RESPONSE)
+
+    assert cache.lookup("Que dit la Bible sur le pardon ?", 'catechese') is None
+
+
+def test_expired_entry_misses():
+    cache = make_cache(ttl=0.01)
+    cache.add("Que dit la Bible sur le pardon ?", 'general', RESPONSE)
+    time.sleep(0.02)
+
+    assert cache.lookup("Que dit la Bible sur le pardon ?", 'general') is None
+
+
+def test_oldest_entry_replaced_when_full():
+    cache = make_cache(max_entries=2)
+    for question in ("Que dit la Bible sur le pardon ?", "Qui était Moïse ?", "Comment prier le rosaire ?"):
+        cache.add(question, 'general', dict(RESPONSE, question=question))
+
+    assert len(cache) == 2
+    assert cache.lookup("Que dit la Bible sur le pardon ?", 'general') is None
+    assert cache.lookup("Comment prier le rosaire ?", 'general')[0]['question'] == "Comment prier le rosaire ?"
+
+
+def test_clear_empties_the_cache():
+    cache = make_cache()
+    cache.add("Que dit la Bible sur le pardon ?", 'general', RESPONSE)
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.lookup("Que dit la Bible sur le pardon ?", 'general') is None
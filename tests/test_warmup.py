@@ -0,0 +1,26 @@
+"""
+Préchargement du cache (warmup.py): un seul processus par déploiement le fait
+"""
+
+import os
+import time
+
+from warmup import claim_warmup
+
+
+def test_first_claim_wins(tmp_path):
+    lock = str(tmp_path / 'warmup.lock')
+
+    assert claim_warmup(lock, ttl=3600)
+    assert not claim_warmup(lock, ttl=3600)
+    assert open(lock).read() == str(os.getpid())
+
+
+def test_stale_claim_is_taken_again(tmp_path):
+    lock = str(tmp_path / 'warmup.lock')
+    assert claim_warmup(lock, ttl=3600)
+    old = time.time() - 7200
+    os.utime(lock, (old, old))
+
+    assert claim_warmup(lock, ttl=3600)
+    assert not claim_warmup(lock, ttl=3600)
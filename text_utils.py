@@ -0,0 +1,69 @@
+"""
+Utilitaires de normalisation du texte partagés par les assistants
+"""
+
+import re
+import unicodedata
+
+# Mots vides français ignorés lors de l'extraction des mots-clés (forme sans accents)
+STOP_WORDS = frozenset("""
+a ai au aux avec c ce ces cet cette comment d dans de des du elle elles en est et
+etre il ils j je l la le les leur leurs lui m ma mais me mes moi mon n ne nos notre
+nous on ont ou par pas pour qu quand que quel quelle quelles quels qui s sa sans se
+ses son sont sur t ta te tes toi ton tu un une vos votre vous y dit dire fait faire
+quoi selon bible
+""".split())
+
+# Mots qui changent le sens d'une question: conservés dans la forme canonique
+MEANINGFUL_WORDS = frozenset("""
+comment quand que qu quel quelle quelles quels qui quoi ou ne pas sans
+""".split())
+
+QUESTION_STOP_WORDS = STOP_WORDS - MEANINGFUL_WORDS
+
+_WORD_RE = re.compile(r'\w+')
+
+# Motifs compilés une fois pour toutes (clean_text)
+_SPACE_BEFORE_PUNCTUATION_RE = re.compile(r' (?=[.,;:!?])')
+_PUNCTUATION_WITHOUT_SPACE_RE = re.compile(r'([.,;:!?])(\S)')
+
+
+def fold_accents(text: str) -> str:
+    """Supprime les accents (même repliement que le tokenizer FTS)"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def normalize_question(question: str) -> str:
+    """Forme canonique d'une question: minuscules, sans accents, ponctuation ni mots vides
+
+    "Que dit la Bible sur le pardon ?" et "que dit la bible sur le pardon?"
+    donnent tous deux "que pardon".
+    """
+    words = _WORD_RE.findall(fold_accents(question.casefold()))
+    return ' '.join(word for word in words if word not in QUESTION_STOP_WORDS)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation locale du nombre de tokens (environ 4 caractères par token en français)"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def collapse_whitespace(text: str) -> str:
+    """Remplace chaque suite d'espaces (insécables, sauts de ligne, tabulations) par une espace"""
+    # str.split() sans argument découpe sur les mêmes espaces Unicode que \s, en une passe C
+    return ' '.join(text.split())
+
+
+def clean_text(text: str, space_after_punctuation: bool = False) -> str:
+    """Nettoie un texte extrait ou généré: espaces regroupés, pas d'espace avant la ponctuation
+
+    space_after_punctuation ajoute une espace après la ponctuation qui en manque
+    (comportement de l'assistant « enhanced »).
+    """
+    if not text:
+        return ''
+    text = _SPACE_BEFORE_PUNCTUATION_RE.sub('', collapse_whitespace(text))
+    if space_after_punctuation:
+        text = _PUNCTUATION_WITHOUT_SPACE_RE.sub(r'\1 \2', text)
+    return text
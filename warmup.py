@@ -0,0 +1,217 @@
+"""
+Préchargement du cache de l'assistant biblique
+Fait passer les suggestions et les questions les plus fréquentes du journal
+(question_log.py) par ask_llm_optimized, quelques-unes à la fois, pour que le premier
+utilisateur après un redémarrage ne paie pas l'appel au LLM. Un rapport donne la durée,
+les tokens et le coût estimé.
+
+Au démarrage du serveur (WARMUP_ON_STARTUP), un seul processus par machine fait le
+préchargement: le premier qui crée le fichier WARMUP_LOCK_PATH (voir claim_warmup).
+
+Lancement: python warmup.py [--top 50] [--concurrency 4]
+       ou: python warmup.py --url http://localhost:8000   (serveur déjà démarré)
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from question_log import QuestionLog
+from text_utils import estimate_tokens, normalize_question
+
+# Prix en dollars par million de tokens (entrée, sortie), par fournisseur du routeur LLM
+MODEL_PRICES = {
+    'claude': (3.0, 15.0),
+    'gpt4': (2.5, 10.0)
+}
+
+# Prix des tokens d'entrée lus / écrits dans le cache de prompt, relativement au prix normal
+CACHE_READ_PRICE_RATIO = {'claude': 0.1, 'gpt4': 0.5}
+CACHE_WRITE_PRICE_RATIO = {'claude': 1.25, 'gpt4': 1.0}
+
+def claim_warmup(lock_path: str, ttl: float) -> bool:
+    """Vrai pour le premier processus qui réclame le préchargement (fichier créé en
+    exclusif); les autres workers et les redémarrages pendant ttl secondes l'ignorent"""
+    try:
+        if time.time() - os.path.getmtime(lock_path) < ttl:
+            return False
+        os.remove(lock_path)  # verrou d'un déploiement précédent
+    except FileNotFoundError:
+        pass
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w') as f:
+        f.write(str(os.getpid()))
+    return True
+
+
+def collect_questions(suggestions: List[str], question_log: Optional[QuestionLog] = None,
+                      top_n: int = 50, context: str = "general") -> List[Tuple[str, str]]:
+    """Suggestions puis questions les plus fréquentes, sans doublons: (question, contexte)"""
+    candidates = [(question, context) for question in suggestions]
+    if question_log is not None and top_n > 0:
+        candidates += [(question, ctx) for question, ctx, _ in question_log.top(top_n)]
+
+    seen = set()
+    questions = []
+    for question, ctx in candidates:
+        key = (normalize_question(question), ctx.strip().lower())
+        if key not in seen:
+            seen.add(key)
+            questions.append((question, ctx))
+    return questions
+
+
+def response_cost(question: str, response: Dict, instructions: str = '') -> Tuple[int, int, float]:
+    """Tokens d'entrée, de sortie et coût d'une réponse générée (usage réel si disponible,
+    sinon estimé avec les instructions du prompt; tokens lus ou écrits dans le cache de
+    prompt au prix correspondant)"""
+    usage = response.get('usage') or {}
+    input_tokens = usage.get('input_tokens')
+    if input_tokens is None:
+        input_tokens = (estimate_tokens(instructions) + estimate_tokens(question)
+                        + estimate_tokens(response.get('context_used', '')))
+    output_tokens = usage.get('output_tokens')
+    if output_tokens is None:
+        output_tokens = estimate_tokens(response.get('answer', ''))
+
+    cached = usage.get('cached_input_tokens') or 0
+    cache_creation = usage.get('cache_creation_input_tokens') or 0
+
+    provider = (response.get('routing') or {}).get('provider')
+    price_in, price_out = MODEL_PRICES.get(provider, (0.0, 0.0))
+    input_cost = price_in * (
+        input_tokens - cached - cache_creation
+        + cached * CACHE_READ_PRICE_RATIO.get(provider, 1.0)
+        + cache_creation * CACHE_WRITE_PRICE_RATIO.get(provider, 1.0)
+    )
+    return input_tokens, output_tokens, (input_cost + output_tokens * price_out) / 1_000_000
+
+
+def build_report(questions: List[Tuple[str, str]], responses: List[Optional[Dict]], duration: float,
+                 instructions: str = '') -> Dict:
+    """Rapport de préchargement: questions générées, déjà en cache, en échec, tokens et coût"""
+    report = {
+        'questions': len(questions),
+        'generated': 0,
+        'already_cached': 0,
+        'failed': 0,
+        'duration_s': round(duration, 2),
+        'input_tokens': 0,
+        'output_tokens': 0,
+        'cached_input_tokens': 0,
+        'estimated_cost_usd': 0.0,
+        'by_provider': {}
+    }
+    for (question, _), response in zip(questions, responses):
+        if response is None or response.get('error'):
+            report['failed'] += 1
+        elif (response.get('cache') or {}).get('hit'):
+            report['already_cached'] += 1
+        else:
+            report['generated'] += 1
+            input_tokens, output_tokens, cost = response_cost(question, response, instructions)
+            report['input_tokens'] += input_tokens
+            report['output_tokens'] += output_tokens
+            report['cached_input_tokens'] += (response.get('usage') or {}).get('cached_input_tokens') or 0
+            report['estimated_cost_usd'] += cost
+            provider = (response.get('routing') or {}).get('provider') or response.get('model', 'inconnu')
+            report['by_provider'][provider] = report['by_provider'].get(provider, 0) + 1
+    report['estimated_cost_usd'] = round(report['estimated_cost_usd'], 4)
+    return report
+
+
+def warm_up(ask: Callable[[str, str], Dict], questions: List[Tuple[str, str]], concurrency: int = 4,
+            instructions: str = '') -> Dict:
+    """Pose chaque question via ask (ex: ask_llm_optimized), au plus concurrency à la fois;
+    instructions (prompt système) sert à estimer les tokens des réponses sans usage"""
+    def ask_one(item: Tuple[str, str]) -> Optional[Dict]:
+        question, context = item
+        try:
+            return ask(question, context)
+        except Exception as e:
+            print(f"❌ Préchargement '{question}': {e}")
+            return None
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        responses = list(pool.map(ask_one, questions))
+    return build_report(questions, responses, time.monotonic() - started, instructions)
+
+
+def warm_up_remote(url: str, questions: List[Tuple[str, str]], batch_size: int = 50, timeout: float = 600) -> Dict:
+    """Préchargement d'un serveur démarré via /api/assistant/query/batch (un lot par contexte)"""
+    started = time.monotonic()
+    answers = {}
+    by_context = {}
+    for question, context in questions:
+        by_context.setdefault(context, []).append(question)
+
+    with requests.Session() as session:
+        for context, context_questions in by_context.items():
+            for i in range(0, len(context_questions), batch_size):
+                batch = context_questions[i:i + batch_size]
+                try:
+                    resp = session.post(f"{url.rstrip('/')}/api/assistant/query/batch",
+                                        json={'questions': batch, 'context': context}, timeout=timeout)
+                    resp.raise_for_status()
+                    results = resp.json()['results']
+                except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                    print(f"❌ Préchargement du lot ({context}): {e}")
+                    continue
+                for question, result in zip(batch, results):
+                    answers[(question, context)] = result
+
+    responses = [answers.get(item) for item in questions]
+    return build_report(questions, responses, time.monotonic() - started)
+
+
+def format_report(report: Dict) -> str:
+    providers = ', '.join(f"{name}: {count}" for name, count in report['by_provider'].items()) or '-'
+    return (
+        f"🔥 Préchargement: {report['questions']} questions en {report['duration_s']}s\n"
+        f"   - générées: {report['generated']} ({providers})\n"
+        f"   - déjà en cache: {report['already_cached']}\n"
+        f"   - en échec: {report['failed']}\n"
+        f"   - tokens (entrée/sortie): {report['input_tokens']}/{report['output_tokens']}"
+        f" (dont {report['cached_input_tokens']} lus en cache)\n"
+        f"   - coût estimé: ${report['estimated_cost_usd']:.4f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--top', type=int, default=int(os.getenv('WARMUP_TOP_N', '50')),
+                        help="nombre de questions fréquentes du journal à précharger")
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('WARMUP_CONCURRENCY', '4')))
+    parser.add_argument('--context', default='general', help="contexte des suggestions")
+    parser.add_argument('--url', help="serveur à précharger (sinon: dans ce processus)")
+    parser.add_argument('--log', default=os.getenv('QUESTION_LOG_PATH', 'question_log.db'),
+                        help="journal des questions (mode --url)")
+    args = parser.parse_args()
+
+    if args.url:
+        suggestions = requests.get(f"{args.url.rstrip('/')}/api/assistant/suggestions", timeout=10).json()['suggestions']
+        question_log = QuestionLog(args.log) if os.path.exists(args.log) else None
+        questions = collect_questions(suggestions, question_log, args.top, args.context)
+        report = warm_up_remote(args.url, questions)
+    else:
+        import assistant_biblique_optimized as assistant
+
+        if assistant.response_cache.stats().get('backend') == 'memory':
+            print("⚠️  Cache en mémoire: seul ce processus en profite. Utilisez --url, ou "
+                  "RESPONSE_CACHE_BACKEND=sqlite/redis pour un cache partagé.")
+        questions = collect_questions(assistant.SUGGESTIONS, assistant.question_log, args.top, args.context)
+        report = warm_up(assistant.ask_llm_optimized, questions, args.concurrency, assistant.CLAUDE_INSTRUCTIONS)
+
+    print(format_report(report))
+
+
+if __name__ == '__main__':
+    main()